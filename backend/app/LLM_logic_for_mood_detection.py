@@ -1,55 +1,58 @@
-import requests
 import json
-import os
+import time
 from typing import Optional, Dict
-from dotenv import load_dotenv
 from prompt_for_mood_detection import system_prompt
-
-# Load environment variables from .env
-load_dotenv()
-
-MODEL = "gpt-oss:20b-cloud"  # e.g., "llama3.1:latest"
-OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/chat")
-
-def query_mood_model(answers: Dict[str, str], system_prompt: str) -> Optional[str]:
+from database import DB_PATH
+from utils.admission import HIGH
+from utils.config import settings
+from utils.metrics import prompt_build_seconds, response_parse_seconds
+from utils.mood_cache import MoodResultCache, cache_db_path
+from utils.ollama_client import post_chat
+
+MODEL = settings.MODEL_NAME  # e.g., "llama3.1:latest"
+
+# Requests are deterministic (fixed seed, low temperature), so identical
+# questionnaires can reuse a previous answer.
+mood_cache = MoodResultCache(
+    max_entries=settings.MOOD_CACHE_SIZE,
+    ttl_seconds=settings.MOOD_CACHE_TTL,
+    db_path=cache_db_path(DB_PATH) if settings.MOOD_CACHE_PERSIST else None
+)
+
+async def query_mood_model(answers: Dict[str, str], system_prompt: str,
+                           user_key: Optional[str] = None) -> Optional[str]:
     """
     Sends the 10-question answers to your Ollama model and returns ONE WORD (mood).
+    Results are served from mood_cache when the same answers were seen before.
+    user_key identifies the caller for per-user fair scheduling.
     """
 
+    cached = await mood_cache.aget(answers, system_prompt, MODEL)
+    if cached is not None:
+        return cached
+
     # Prepare messages for Ollama
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": json.dumps(answers)}
-    ]
-
-    # Headers with API key
-    headers = {
-        "Content-Type": "application/json"
-    }
-    if OLLAMA_API_KEY:
-        headers["Authorization"] = f"Bearer {OLLAMA_API_KEY}"
-
-    try:
-        response = requests.post(
-            OLLAMA_URL,
-            headers=headers,
-            json={
-                "model": MODEL,
-                "messages": messages,
-                "options": {
-                    "seed": 42,
-                    "temperature": 0.1
-                }
-            },
-            stream=False
-        )
-    except Exception as e:
-        print(f"Error connecting to Ollama: {e}")
+    with prompt_build_seconds.labels("mood").time():
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": json.dumps(answers)}
+        ]
+
+    response_text = await post_chat({
+        "model": MODEL,
+        "messages": messages,
+        "options": {
+            "seed": 42,
+            "temperature": 0.1
+        }
+    }, kind="mood", priority=HIGH, user_key=user_key)
+    if response_text is None:
         return None
 
+    parse_start = time.perf_counter()
+
     # Raw streaming-like output (Ollama returns JSON lines)
-    raw_lines = response.text.strip().split("\n")
+    raw_lines = response_text.strip().split("\n")
     full_output = ""
 
     for line in raw_lines:
@@ -89,9 +92,12 @@ def query_mood_model(answers: Dict[str, str], system_prompt: str) -> Optional[st
             mood = allowed
             break
 
+    response_parse_seconds.labels("mood").observe(time.perf_counter() - parse_start)
+
     # Ensure output is an allowed mood
     if mood is None:
         print(f"Unexpected response from model: {full_output}")
         return None
 
+    await mood_cache.aset(answers, system_prompt, MODEL, mood)
     return mood
@@ -1,43 +1,62 @@
-import requests
 import json
-import os
-from typing import Optional, List, Dict
-from dotenv import load_dotenv
-from prompt_for_psychiatrist import get_psychiatrist_prompt
+from typing import AsyncIterator, Optional, List, Dict
+from services.prompt_cache import session_prompts
+from utils.admission import HIGH, LOW, NORMAL
+from utils.config import settings
+from utils.metrics import prompt_build_seconds, response_parse_seconds
+from utils.ollama_client import post_chat, stream_chat
 
-# Load environment variables from .env
-load_dotenv()
+MODEL = settings.MODEL_NAME
 
-MODEL = "gpt-oss:20b-cloud"
-OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/chat")
+SUMMARY_PROMPT = """You keep running notes for a therapist. Update the summary of the conversation so far with the new messages.
+Keep what matters for continuing the conversation: the user's concerns, feelings, events they mentioned, advice already given and anything they asked to come back to.
+Write 3-6 short sentences in the third person. Reply with the summary only."""
 
 
-def chat_with_psychiatrist(
-    user_message: str,
-    current_mood: str,
-    mood_history: List[Dict],
-    conversation_history: List[Dict]
-) -> Optional[str]:
-    """
-    Send a message to the psychiatrist chatbot and get a response.
+def parse_chat_response(response_text: str) -> Optional[str]:
+    """Join the message content of Ollama's JSON-lines chat response."""
+    raw_lines = response_text.strip().split("\n")
+    full_output = ""
 
-    Args:
-        user_message: The user's current message
-        current_mood: The user's detected mood for this session
-        mood_history: List of previous mood logs
-        conversation_history: List of previous messages in this session
+    for line in raw_lines:
+        if not line.strip():
+            continue
 
-    Returns:
-        The psychiatrist's response or None if error
-    """
+        try:
+            data = json.loads(line)
+            msg = data.get("message", {})
+            content = msg.get("content", "")
 
-    # Generate system prompt with mood context
-    system_prompt = get_psychiatrist_prompt(current_mood, mood_history)
+            if content:
+                full_output += content
+
+            if data.get("done", False):
+                break
+
+        except json.JSONDecodeError:
+            continue
+
+    return full_output.strip() if full_output else None
+
+
+def build_chat_messages(
+    user_message: str,
+    system_prompt: str,
+    conversation_history: List[Dict],
+    summary: Optional[str] = None
+) -> List[Dict]:
+    """
+    Build the Ollama messages array for one psychiatrist chat turn.
+    conversation_history holds only the recent turns; anything older is
+    carried by the session summary.
+    """
 
     # Build messages array
     messages = [{"role": "system", "content": system_prompt}]
 
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+
     # Add conversation history
     for msg in conversation_history:
         messages.append({
@@ -47,113 +66,151 @@ def chat_with_psychiatrist(
 
     # Add current user message
     messages.append({"role": "user", "content": user_message})
+    return messages
 
-    # Headers with API key
-    headers = {"Content-Type": "application/json"}
-    if OLLAMA_API_KEY:
-        headers["Authorization"] = f"Bearer {OLLAMA_API_KEY}"
-
-    try:
-        response = requests.post(
-            OLLAMA_URL,
-            headers=headers,
-            json={
-                "model": MODEL,
-                "messages": messages,
-                "options": {
-                    "temperature": 0.5,
-                    "num_predict": 150
-                }
-            },
-            stream=False,
-            timeout=60
-        )
-    except Exception as e:
-        print(f"Error connecting to Ollama: {e}")
-        return None
-
-    # Parse response (Ollama returns JSON lines)
-    raw_lines = response.text.strip().split("\n")
-    full_output = ""
 
-    for line in raw_lines:
-        if not line.strip():
-            continue
+async def chat_with_psychiatrist(
+    user_message: str,
+    session_id: int,
+    conversation_history: List[Dict],
+    summary: Optional[str] = None,
+    user_key: Optional[str] = None,
+    keep_alive: Optional[str] = None
+) -> Optional[str]:
+    """
+    Send a message to the psychiatrist chatbot and get a response.
 
-        try:
-            data = json.loads(line)
-            msg = data.get("message", {})
-            content = msg.get("content", "")
+    Args:
+        user_message: The user's current message
+        session_id: The chat session; its system prompt comes from the session prompt cache
+        conversation_history: Recent messages in this session
+        summary: Rolling summary of the older messages, if any
+        user_key: Who is asking, for per-user fair scheduling (e.g. the username)
+        keep_alive: The session's Ollama keep_alive (default CHAT_KEEP_ALIVE)
 
-            if content:
-                full_output += content
+    Returns:
+        The psychiatrist's response or None if error
+    """
 
-            if data.get("done", False):
-                break
+    system_prompt = await session_prompts.aget(session_id)
+    if system_prompt is None:
+        return None
+    with prompt_build_seconds.labels("chat").time():
+        messages = build_chat_messages(user_message, system_prompt, conversation_history, summary)
+
+    response_text = await post_chat({
+        "model": MODEL,
+        "messages": messages,
+        "options": {
+            "temperature": 0.5,
+            "num_predict": 150
+        },
+        "keep_alive": keep_alive or settings.CHAT_KEEP_ALIVE
+    }, kind="chat", priority=NORMAL, user_key=user_key)
+    if response_text is None:
+        return None
 
-        except json.JSONDecodeError:
-            continue
+    # Parse response (Ollama returns JSON lines)
+    with response_parse_seconds.labels("chat").time():
+        return parse_chat_response(response_text)
 
-    return full_output.strip() if full_output else None
 
+async def stream_psychiatrist_reply(
+    user_message: str,
+    session_id: int,
+    conversation_history: List[Dict],
+    summary: Optional[str] = None,
+    user_key: Optional[str] = None,
+    keep_alive: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    Same as chat_with_psychiatrist, but yields response tokens as Ollama
+    produces them instead of waiting for the full reply.
+    """
 
-def get_initial_greeting(current_mood: str, mood_history: List[Dict]) -> Optional[str]:
+    system_prompt = await session_prompts.aget(session_id)
+    if system_prompt is None:
+        return
+    with prompt_build_seconds.labels("chat_stream").time():
+        messages = build_chat_messages(user_message, system_prompt, conversation_history, summary)
+
+    async for data in stream_chat({
+        "model": MODEL,
+        "messages": messages,
+        "options": {
+            "temperature": 0.5,
+            "num_predict": 150
+        },
+        "keep_alive": keep_alive or settings.CHAT_KEEP_ALIVE
+    }, kind="chat_stream", priority=NORMAL, user_key=user_key):
+        content = data.get("message", {}).get("content", "")
+        if content:
+            yield content
+
+
+async def get_initial_greeting(session_id: int, user_key: Optional[str] = None,
+                               keep_alive: Optional[str] = None) -> Optional[str]:
     """
     Get the initial greeting from the psychiatrist when starting a session.
     """
 
-    # Create a prompt for initial greeting
-    system_prompt = get_psychiatrist_prompt(current_mood, mood_history)
-
-    initial_prompt = """Say hi and ask how they're doing. 2-3 sentences MAX. One question only."""
-
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": initial_prompt}
-    ]
-
-    headers = {"Content-Type": "application/json"}
-    if OLLAMA_API_KEY:
-        headers["Authorization"] = f"Bearer {OLLAMA_API_KEY}"
-
-    try:
-        response = requests.post(
-            OLLAMA_URL,
-            headers=headers,
-            json={
-                "model": MODEL,
-                "messages": messages,
-                "options": {
-                    "temperature": 0.5,
-                    "num_predict": 150
-                }
-            },
-            stream=False,
-            timeout=60
-        )
-    except Exception as e:
-        print(f"Error connecting to Ollama: {e}")
+    # Same cached system prompt the session's chat turns will use
+    system_prompt = await session_prompts.aget(session_id)
+    if system_prompt is None:
         return None
 
-    raw_lines = response.text.strip().split("\n")
-    full_output = ""
+    with prompt_build_seconds.labels("greeting").time():
+        initial_prompt = """Say hi and ask how they're doing. 2-3 sentences MAX. One question only."""
+
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": initial_prompt}
+        ]
+
+    response_text = await post_chat({
+        "model": MODEL,
+        "messages": messages,
+        "options": {
+            "temperature": 0.5,
+            "num_predict": 150
+        },
+        "keep_alive": keep_alive or settings.CHAT_KEEP_ALIVE
+    }, kind="greeting", priority=HIGH, user_key=user_key)
+    if response_text is None:
+        return None
 
-    for line in raw_lines:
-        if not line.strip():
-            continue
+    with response_parse_seconds.labels("greeting").time():
+        return parse_chat_response(response_text)
 
-        try:
-            data = json.loads(line)
-            msg = data.get("message", {})
-            content = msg.get("content", "")
 
-            if content:
-                full_output += content
+async def summarize_conversation(previous_summary: Optional[str], messages: List[Dict]) -> Optional[str]:
+    """
+    Fold older chat messages into the session's rolling summary.
+    Returns the new summary, or None if the model gave no answer.
+    """
 
-            if data.get("done", False):
-                break
+    with prompt_build_seconds.labels("summary").time():
+        transcript = "\n".join(
+            f"{'User' if msg['role'] == 'user' else 'Therapist'}: {msg['content']}" for msg in messages
+        )
+        user_prompt = (
+            f"Current summary:\n{previous_summary or '(none yet)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
 
-        except json.JSONDecodeError:
-            continue
+    response_text = await post_chat({
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ],
+        "options": {
+            "temperature": 0.2,
+            "num_predict": settings.CHAT_SUMMARY_MAX_TOKENS
+        }
+    }, kind="summary", priority=LOW)
+    if response_text is None:
+        return None
 
-    return full_output.strip() if full_output else None
+    with response_parse_seconds.labels("summary").time():
+        return parse_chat_response(response_text)
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for database.py: inserts/sec and lookups/sec with a fresh
+connection per call (the old get_connection) versus the persistent,
+WAL-mode per-thread connections.
+
+    python -m benchmarks.db_bench --inserts 2000 --lookups 20000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def legacy_connection_factory(db_path):
+    """The previous get_connection(): new connection per call, default pragmas."""
+    def get_connection():
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+    return get_connection
+
+
+def run_mode(database, mode: str, args) -> dict:
+    db_path = os.path.join(tempfile.mkdtemp(prefix=f"db-bench-{mode}-"), "bench.db")
+    database.close_all_connections()
+    database.DB_PATH = db_path
+
+    original = database.get_connection
+    if mode == "before":
+        database.get_connection = legacy_connection_factory(db_path)
+    try:
+        database.init_db()
+        user_id = database.create_user("bench")
+        log_id = database.save_mood_log(user_id, "Neutral", "{}")
+        session_id = database.create_chat_session(user_id, log_id)
+
+        start = time.perf_counter()
+        for i in range(args.inserts):
+            database.save_chat_message(session_id, "user", f"message {i}")
+        insert_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(args.lookups):
+            database.get_user("bench")
+        lookup_time = time.perf_counter() - start
+    finally:
+        database.get_connection = original
+        database.close_all_connections()
+
+    return {
+        "inserts_per_sec": round(args.inserts / insert_time, 1),
+        "lookups_per_sec": round(args.lookups / lookup_time, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--inserts", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    # Keep the first connection's schema setup away from the real database
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="db-bench-"), "import.db")
+    sys.path.insert(0, APP_DIR)
+    import database
+
+    results = {mode: run_mode(database, mode, args) for mode in ("before", "after")}
+    results["speedup"] = {
+        key: round(results["after"][key] / results["before"][key], 2)
+        for key in ("inserts_per_sec", "lookups_per_sec")
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
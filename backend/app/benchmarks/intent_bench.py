@@ -0,0 +1,115 @@
+"""
+Per-message latency of classify_chatbot_intent: the old loop over every
+intent and pattern versus the combined IntentMatcher, as the intent table
+grows. Also checks that both return identical results.
+
+    python -m benchmarks.intent_bench --sizes 24 120 480 --messages 2000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = [
+    "work", "family", "exam", "money", "friend", "night", "morning", "panic", "calm", "lonely",
+    "angry", "happy", "tired", "hope", "future", "school", "job", "sleepy", "heart", "sick",
+    "weekend", "partner", "breath", "focus", "deadline", "party", "rain", "music", "walk", "home",
+]
+
+
+def legacy_classify(message: str, intents: dict) -> (str, float):
+    """The previous classify_chatbot_intent, parameterised on the intent table."""
+    message = message.lower()
+
+    for intent_name, data in intents.items():
+        for pattern in data["patterns"]:
+            if re.search(pattern, message, re.IGNORECASE):
+                return intent_name, 0.9
+
+    for intent_name, data in intents.items():
+        for pattern in data["patterns"]:
+            keyword = re.sub(r"[^\w\s]", "", pattern)
+            if keyword and keyword.strip() and keyword.strip() in message:
+                return intent_name, 0.6
+
+    return "general", 0.3
+
+
+def grow_intents(base: dict, total_patterns: int, rng: random.Random) -> dict:
+    """The real intents plus synthetic ones (4 patterns each) up to total_patterns."""
+    intents = dict(base)
+    count = sum(len(data["patterns"]) for data in intents.values())
+    n = 0
+    while count < total_patterns:
+        patterns = []
+        for _ in range(4):
+            a, b = rng.sample(WORDS, 2)
+            patterns.append(rf"\b{a}{n}\b" if rng.random() < 0.5 else rf"\b{a} {b}{n}\b")
+        intents[f"synthetic_{n}"] = {"patterns": patterns, "responses": ["..."]}
+        count += len(patterns)
+        n += 1
+    return intents
+
+
+def make_messages(intents: dict, count: int, rng: random.Random) -> list:
+    keywords = [re.sub(r"[^\w\s]", "", p).strip() for data in intents.values() for p in data["patterns"]]
+    plain = [re.sub(r"\\b", "", p) for data in intents.values() for p in data["patterns"]]
+    messages = []
+    for _ in range(count):
+        words = rng.sample(WORDS, rng.randint(4, 14))
+        roll = rng.random()
+        if roll < 0.4:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(plain))
+        elif roll < 0.5:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        messages.append(" ".join(words).capitalize() + rng.choice([".", "!", "?", ""]))
+    return messages
+
+
+def time_per_message(fn, messages) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        fn(message)
+    return (time.perf_counter() - start) / len(messages) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[24, 120, 480],
+                        help="total pattern counts to test")
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, APP_DIR)
+    from services.intent_service import CHATBOT_INTENTS, IntentMatcher
+
+    rng = random.Random(7)
+    results = {}
+    for size in args.sizes:
+        intents = grow_intents(CHATBOT_INTENTS, size, rng)
+        matcher = IntentMatcher(intents)
+        messages = make_messages(intents, args.messages, rng)
+
+        mismatches = [m for m in messages if matcher.classify(m) != legacy_classify(m, intents)]
+        if mismatches:
+            print(f"Results differ for {len(mismatches)} messages, e.g. {mismatches[0]!r}")
+            sys.exit(1)
+
+        legacy_us = time_per_message(lambda m: legacy_classify(m, intents), messages)
+        matcher_us = time_per_message(matcher.classify, messages)
+        results[f"{matcher.pattern_count}_patterns"] = {
+            "legacy_us_per_message": round(legacy_us, 2),
+            "matcher_us_per_message": round(matcher_us, 2),
+            "speedup": round(legacy_us / matcher_us, 2),
+        }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,343 @@
+"""
+Capacity benchmark: throughput and p50/p95/p99 latency per route at fixed concurrency.
+
+Starts the stub Ollama server (benchmarks.stub_ollama) and the app under
+uvicorn in separate processes, against a throwaway database, then runs each
+scenario as a closed loop of N concurrent clients for a fixed number of
+requests per concurrency level. Results are written as JSON tagged with the
+git commit, so runs can be compared across commits:
+
+    python -m benchmarks.load_test --concurrency 1 8 32 --requests 300 --output before.json
+    python -m benchmarks.load_test --concurrency 1 8 32 --requests 300 --output after.json --compare before.json
+    python -m benchmarks.load_test --compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.stub_ollama import add_stub_arguments, config_from_args, serve
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHAT_LINES = [
+    "I have been feeling stressed about exams",
+    "I can't sleep well lately",
+    "Work has been overwhelming this week",
+    "I had a good day with friends",
+]
+
+
+def random_answers() -> Dict[str, str]:
+    return {f"q{i}": random.choice("ABCDE") for i in range(1, 11)}
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_revision() -> Dict:
+    def git(*args):
+        result = subprocess.run(["git", *args], cwd=APP_DIR, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {"commit": git("rev-parse", "--short", "HEAD"), "dirty": bool(status) if status is not None else None}
+
+
+# ============== SCENARIOS ==============
+
+class Fixtures:
+    """Users, mood logs and chat sessions created once before the timed runs."""
+
+    def __init__(self):
+        self.usernames: List[str] = []
+        self.mood_logs: List[tuple] = []  # (username, log_id)
+        self.sessions: List[int] = []
+
+    async def create(self, client, users: int):
+        for i in range(users):
+            username = f"load-{i}"
+            r = await client.post("/signup", json={"username": username})
+            if r.status_code not in (200, 400):
+                raise RuntimeError(f"signup failed: {r.status_code} {r.text}")
+            self.usernames.append(username)
+            for _ in range(3):
+                r = await client.post("/detect-mood", json={"username": username, "answers": random_answers()})
+                r.raise_for_status()
+                self.mood_logs.append((username, r.json()["log_id"]))
+            r = await client.post("/chat/start", json={"username": username, "mood_log_id": self.mood_logs[-1][1]})
+            r.raise_for_status()
+            self.sessions.append(r.json()["session_id"])
+
+
+async def detect_mood(client, fx: Fixtures):
+    return await client.post("/detect-mood", json={"username": random.choice(fx.usernames), "answers": random_answers()})
+
+
+async def chatbot_message(client, fx: Fixtures):
+    return await client.post("/chatbot/message", json={"user_id": random.choice(fx.usernames),
+                                                       "message": random.choice(CHAT_LINES)})
+
+
+async def chat_start(client, fx: Fixtures):
+    username, log_id = random.choice(fx.mood_logs)
+    return await client.post("/chat/start", json={"username": username, "mood_log_id": log_id})
+
+
+async def chat_message(client, fx: Fixtures):
+    return await client.post("/chat/message", json={"session_id": random.choice(fx.sessions),
+                                                    "message": random.choice(CHAT_LINES)})
+
+
+async def chat_stream(client, fx: Fixtures):
+    body = {"session_id": random.choice(fx.sessions), "message": random.choice(CHAT_LINES)}
+    async with client.stream("POST", "/chat/message/stream", json=body) as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return response
+
+
+async def weekly_report(client, fx: Fixtures):
+    return await client.get(f"/weekly-report/{random.choice(fx.usernames)}", params={"days": 30})
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "detect_mood": detect_mood,
+    "chatbot_message": chatbot_message,
+    "chat_start": chat_start,
+    "chat_message": chat_message,
+    "chat_stream": chat_stream,
+    "weekly_report": weekly_report,
+}
+
+
+async def run_level(client, fx: Fixtures, scenario: Callable, concurrency: int, requests: int) -> Dict:
+    """Closed loop: `concurrency` clients issue `requests` requests in total, back to back."""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                response = await scenario(client, fx)
+                key = str(response.status_code)
+            except Exception as e:
+                key = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[key] = statuses.get(key, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    return {
+        "requests": len(latencies),
+        "errors": len(latencies) - ok,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(latencies[-1] * 1000, 1),
+    }
+
+
+async def run_all(args, base_url: str) -> Dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 10, max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        fx = Fixtures()
+        await fx.create(client, args.users)
+
+        results = {}
+        for name in args.scenarios:
+            scenario = SCENARIOS[name]
+            await run_level(client, fx, scenario, min(args.concurrency), args.warmup)
+            results[name] = {}
+            for concurrency in args.concurrency:
+                level = await run_level(client, fx, scenario, concurrency, args.requests)
+                results[name][str(concurrency)] = level
+                print(f"{name:16} c={concurrency:<4} {level['throughput_rps']:>8} req/s  "
+                      f"p50 {level['p50_ms']:>8}ms  p95 {level['p95_ms']:>8}ms  "
+                      f"p99 {level['p99_ms']:>8}ms  errors {level['errors']}", file=sys.stderr)
+        return results
+
+
+def wait_for(url: str, proc: subprocess.Popen, timeout: float):
+    deadline = time.perf_counter() + timeout
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError("app server exited during startup")
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"{url} did not answer in time")
+        try:
+            with urllib.request.urlopen(url, timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+
+
+def stub_stats(stub_url: str) -> Optional[Dict]:
+    try:
+        with urllib.request.urlopen(stub_url + "/stats", timeout=2) as response:
+            return json.load(response)
+    except OSError:
+        return None
+
+
+def run_benchmark(args) -> Dict:
+    port_queue = multiprocessing.Queue()
+    stub = multiprocessing.Process(target=serve, args=(port_queue, config_from_args(args)), daemon=True)
+    stub.start()
+    stub_url = f"http://127.0.0.1:{port_queue.get(timeout=10)}"
+
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="load-test-"), "bench.db"),
+        OLLAMA_URL=stub_url + "/api/chat",
+        MOOD_DETECTION_MODE="llm",
+    )
+    env.update(dict(pair.split("=", 1) for pair in args.env))
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        wait_for(base_url + "/health", app, args.startup_timeout)
+        results = asyncio.run(run_all(args, base_url))
+        upstream = stub_stats(stub_url)
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        stub.terminate()
+
+    return {
+        "meta": {
+            **git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests_per_level": args.requests,
+            "users": args.users,
+            "stub": config_from_args(args).as_dict(),
+            "env": args.env,
+        },
+        "results": results,
+        "upstream": upstream,
+    }
+
+
+# ============== COMPARISON ==============
+
+def compare(old: Dict, new: Dict) -> List[Dict]:
+    """Per scenario and concurrency: throughput and latency change from old to new, in percent."""
+    def change(before, after):
+        return round((after - before) / before * 100, 1) if before else None
+
+    rows = []
+    for scenario, levels in new["results"].items():
+        for concurrency, after in levels.items():
+            before = old["results"].get(scenario, {}).get(concurrency)
+            if before is None:
+                continue
+            rows.append({
+                "scenario": scenario,
+                "concurrency": int(concurrency),
+                "throughput_rps": [before["throughput_rps"], after["throughput_rps"],
+                                   change(before["throughput_rps"], after["throughput_rps"])],
+                **{key: [before[key], after[key], change(before[key], after[key])]
+                   for key in ("p50_ms", "p95_ms", "p99_ms")},
+                "errors": [before["errors"], after["errors"]],
+            })
+    return rows
+
+
+def print_comparison(old: Dict, new: Dict):
+    label = lambda run: f"{run['meta'].get('commit')}{'+dirty' if run['meta'].get('dirty') else ''}"
+    print(f"{label(old)} -> {label(new)}  (old, new, change %)")
+    rows = compare(old, new)
+    if not rows:
+        print("no scenario / concurrency level in common")
+    for row in rows:
+        cells = "  ".join(
+            f"{key} {row[key][0]} -> {row[key][1]} ({row[key][2]:+}%)" if row[key][2] is not None
+            else f"{key} {row[key][0]} -> {row[key][1]}"
+            for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")
+        )
+        print(f"{row['scenario']:16} c={row['concurrency']:<4} {cells}  errors {row['errors'][0]} -> {row['errors'][1]}")
+
+
+def load_result(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests before each scenario")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    parser.add_argument("--env", nargs="*", default=[], metavar="NAME=VALUE",
+                        help="extra app settings, e.g. DB_WRITE_BEHIND=true")
+    parser.add_argument("--output", help="write the results JSON here (default: stdout)")
+    parser.add_argument("--compare", nargs="+", metavar="RESULT.json",
+                        help="baseline to compare this run against, or two result files to compare without running")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        print_comparison(load_result(args.compare[0]), load_result(args.compare[1]))
+        return
+
+    sys.path.insert(0, APP_DIR)
+    result = run_benchmark(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+    else:
+        print(json.dumps(result, indent=2))
+
+    if args.compare:
+        print_comparison(load_result(args.compare[0]), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Event-loop lag check under concurrent /detect-mood load.
+
+Runs the app in-process against a stub Ollama server (in a separate process,
+so its threads do not compete for the GIL) that answers after a fixed delay, fires concurrent /detect-mood requests in LLM mode and samples
+event-loop lag the whole time. Exits non-zero if the worst lag exceeds the
+limit, so it can be used as a CI gate.
+
+    python -m benchmarks.loop_lag --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.stub_ollama import StubConfig, serve
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def random_answers():
+    return {f"q{i}": random.choice("ABCDE") for i in range(1, 11)}
+
+
+async def run(args):
+    import httpx
+    import main
+    from utils.executor import LoopLagMonitor
+    from utils.ollama_client import connection_stats
+
+    monitor = LoopLagMonitor(interval=0.005, warn_threshold=args.max_lag_ms / 1000)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await client.post("/signup", json={"username": "lag-bench"})
+        monitor.start()
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                r = await client.post("/detect-mood", json={"username": "lag-bench", "answers": random_answers()})
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - start
+        await monitor.stop()
+
+    latencies.sort()
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "stub_delay_ms": args.delay_ms,
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "loop_lag": monitor.stats(),
+        "ollama_pool": connection_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay-ms", type=float, default=200)
+    parser.add_argument("--max-lag-ms", type=float, default=100)
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    stub_config = StubConfig(latency_ms=args.delay_ms, tokens=1, tokens_per_sec=0, stream="never")
+    stub = multiprocessing.Process(target=serve, args=(port_queue, stub_config), daemon=True)
+    stub.start()
+    port = port_queue.get(timeout=10)
+
+    tmp_dir = tempfile.mkdtemp(prefix="loop-lag-")
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tmp_dir, "bench.db")
+    os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{port}/api/chat"
+    os.environ.setdefault("MOOD_DETECTION_MODE", "llm")
+    sys.path.insert(0, APP_DIR)
+
+    result = asyncio.run(run(args))
+    print(json.dumps(result, indent=2))
+    stub.terminate()
+
+    if result["loop_lag"]["max_lag_ms"] > args.max_lag_ms:
+        print(f"FAIL: event loop lag {result['loop_lag']['max_lag_ms']}ms > {args.max_lag_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
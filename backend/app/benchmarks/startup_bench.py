@@ -0,0 +1,178 @@
+"""
+Cold-start cost of the app: import time per module and time to first response.
+
+Starts uvicorn in a fresh process, polls /health until it answers, then
+times the first hit on a few routes whose dependencies load on first use
+(static files, intent model, DB) and notes which modules those hits
+import. A separate `python -X importtime -c "import main"` gives the
+per-module import breakdown. Reports medians over several runs.
+
+    python -m benchmarks.startup_bench --runs 5
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+APP_PREFIXES = ("main", "database", "migrations", "services", "utils", "models", "LLM_", "prompt_")
+
+FIRST_USE_ROUTES = [
+    ("GET", "/", None),
+    ("POST", "/chatbot/message", {"message": "I feel stressed about my exams"}),
+    ("POST", "/signup", {"username": "startup-bench"}),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def request(method: str, url: str, body=None, timeout: float = 10.0) -> int:
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def parse_importtime(stderr: str) -> dict:
+    """{module: (self_us, cumulative_us)}, keeping the first import of each module."""
+    modules = {}
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            modules.setdefault(name, (int(self_us), int(cumulative_us)))
+    return modules
+
+
+def run_once(timeout: float) -> dict:
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="startup-bench-"), "bench.db"),
+        OLLAMA_URL="http://127.0.0.1:9/api/chat",  # never contacted by the routes below
+    )
+    base = f"http://127.0.0.1:{port}"
+    # -X importtime output can fill a pipe and stall the server, so it goes to a file
+    log = tempfile.TemporaryFile(mode="w+")
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-m", "uvicorn", "main:app",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log, text=True
+    )
+    try:
+        while True:
+            if proc.poll() is not None:
+                log.seek(0)
+                raise RuntimeError(f"server exited early:\n{log.read()[-2000:]}")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError("server did not answer /health in time")
+            try:
+                if request("GET", base + "/health", timeout=0.5) == 200:
+                    break
+            except OSError:
+                time.sleep(0.005)
+        first_response_ms = (time.perf_counter() - start) * 1000
+        startup_log_bytes = os.fstat(log.fileno()).st_size
+
+        first_use = {}
+        for method, path, body in FIRST_USE_ROUTES:
+            timings = []
+            for _ in range(2):
+                t = time.perf_counter()
+                request(method, base + path, body)
+                timings.append((time.perf_counter() - t) * 1000)
+            first_use[f"{method} {path}"] = {"first_ms": timings[0], "second_ms": timings[1]}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+    with log:
+        log.seek(0)
+        output = log.read()
+    # Imports logged after /health answered were triggered by the first-use routes
+    deferred = parse_importtime(output[startup_log_bytes:])
+
+    # uvicorn loads main through importlib.import_module, which -X importtime
+    # does not log, so the breakdown of main's own import comes from a plain import
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    modules = parse_importtime(result.stderr)
+    return {
+        "time_to_first_response_ms": first_response_ms,
+        "import_main_ms": modules["main"][1] / 1000,
+        "modules": modules,
+        "deferred_modules": deferred,
+        "first_use": first_use,
+    }
+
+
+def summarize(runs: list, top: int) -> dict:
+    def median(values):
+        return round(statistics.median(values), 1)
+
+    def cumulative_ms(key):
+        names = set.intersection(*(set(run[key]) for run in runs))
+        return {name: median([run[key][name][1] / 1000 for run in runs]) for name in names}
+
+    def is_app_module(name):
+        return name.startswith(APP_PREFIXES) and name != "main"
+
+    def is_package(name):
+        return "." not in name and not name.startswith(APP_PREFIXES)
+
+    def slowest(table, app: bool):
+        keep = is_app_module if app else is_package
+        table = {name: ms for name, ms in table.items() if keep(name)}
+        return dict(sorted(table.items(), key=lambda item: item[1], reverse=True)[:top])
+
+    startup = cumulative_ms("modules")
+    deferred = cumulative_ms("deferred_modules")
+
+    return {
+        "runs": len(runs),
+        "time_to_first_response_ms": median([run["time_to_first_response_ms"] for run in runs]),
+        "import_main_ms": median([run["import_main_ms"] for run in runs]),
+        "startup_imports_ms": {"app": slowest(startup, True), "packages": slowest(startup, False)},
+        "first_use_imports_ms": {"app": slowest(deferred, True), "packages": slowest(deferred, False)},
+        "first_use_ms": {
+            route: {key: median([run["first_use"][route][key] for run in runs]) for key in ("first_ms", "second_ms")}
+            for route in runs[0]["first_use"]
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="modules to list per table")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    runs = [run_once(args.timeout) for _ in range(args.runs)]
+    print(json.dumps(summarize(runs, args.top), indent=2))
+
+
+if __name__ == "__main__":
+    main()
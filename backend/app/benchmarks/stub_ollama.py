@@ -0,0 +1,242 @@
+"""
+Local stand-in for Ollama's /api/chat, for benchmarks that must not touch a real model.
+
+Answers after a fixed latency (plus optional jitter), then emits the reply
+at a fixed token rate, either as streamed JSON lines (Ollama's default) or
+as one JSON object when the request sets "stream": false. A fraction of
+requests can be failed on purpose, and streams can be cut off part-way. The reply starts with a valid mood label
+so the same stub serves mood detection and chat. GET /stats returns request
+counters; POST /stats/reset clears them.
+
+    python -m benchmarks.stub_ollama --port 11435 --latency-ms 150 --tokens-per-sec 80 --error-rate 0.02
+"""
+import argparse
+import http.server
+import json
+import random
+import threading
+import time
+from typing import Dict, List
+
+REPLY_WORDS = (
+    "Neutral thanks for telling me how you feel it sounds like a lot is on your mind right now "
+    "and that makes sense what part of today felt the heaviest for you"
+).split()
+
+
+class StubConfig:
+    """Behaviour of the stub, shared by all handler threads."""
+
+    def __init__(self, latency_ms: float = 100.0, jitter_ms: float = 0.0, tokens: int = 24,
+                 tokens_per_sec: float = 200.0, stream: str = "auto", error_rate: float = 0.0,
+                 error_status: int = 500, seed=None, drop_after=None, omit_done: bool = False):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.tokens = tokens
+        self.token_interval = 1 / tokens_per_sec if tokens_per_sec > 0 else 0.0
+        self.stream = stream  # "auto" follows the request, "always" / "never" override it
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.drop_after = drop_after  # close streamed replies after this many tokens, without a done frame
+        self.omit_done = omit_done  # end streamed replies cleanly, but without the done frame
+
+    def as_dict(self) -> Dict:
+        return {
+            "latency_ms": self.latency * 1000,
+            "jitter_ms": self.jitter * 1000,
+            "tokens": self.tokens,
+            "tokens_per_sec": round(1 / self.token_interval, 1) if self.token_interval else 0,
+            "stream": self.stream,
+            "error_rate": self.error_rate,
+            "error_status": self.error_status,
+            "drop_after": self.drop_after,
+            "omit_done": self.omit_done,
+        }
+
+
+class StubStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = {"requests": 0, "streamed": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+
+    def add(self, key: str, amount: int = 1):
+        with self._lock:
+            self.counts[key] += amount
+            if key == "in_flight":
+                self.counts["max_in_flight"] = max(self.counts["max_in_flight"], self.counts["in_flight"])
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+def reply_tokens(count: int) -> List[str]:
+    words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(max(count, 1))]
+    return [words[0]] + [" " + word for word in words[1:]]
+
+
+class StubOllamaHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wbufsize = 64 * 1024  # send headers and body in one segment (avoids Nagle stalls)
+    config = StubConfig()
+    stats = StubStats()
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (timeout, cancelled hedge); not an error for the stub
+
+    def finish(self):
+        try:
+            super().finish()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._send_json(200, {**self.stats.snapshot(), "config": self.config.as_dict()})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/stats/reset":
+            self.stats.reset()
+            self._send_json(200, {"status": "reset"})
+            return
+        if self.path != "/api/chat":
+            self._send_json(404, {"error": "not found"})
+            return
+
+        try:
+            payload = json.loads(body or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+
+        config = self.config
+        self.stats.add("requests")
+        self.stats.add("in_flight")
+        try:
+            time.sleep(config.latency + config.jitter * config.random.random())
+            if config.error_rate and config.random.random() < config.error_rate:
+                self.stats.add("errors")
+                self._send_json(config.error_status, {"error": "injected failure"})
+                return
+
+            num_predict = (payload.get("options") or {}).get("num_predict")
+            count = min(config.tokens, num_predict) if num_predict else config.tokens
+            tokens = reply_tokens(count)
+            prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+            done = {
+                "model": payload.get("model", "stub"),
+                "message": {"role": "assistant", "content": ""},
+                "done": True,
+                "prompt_eval_count": prompt_chars // 4,
+                "eval_count": len(tokens),
+            }
+
+            stream = config.stream == "always" or (config.stream == "auto" and payload.get("stream", True))
+            if stream:
+                self.stats.add("streamed")
+                self._send_stream(payload, tokens, done)
+            else:
+                time.sleep(config.token_interval * len(tokens))
+                done["message"]["content"] = "".join(tokens)
+                self._send_json(200, done)
+        finally:
+            self.stats.add("in_flight", -1)
+
+    def _send_stream(self, payload: Dict, tokens: List[str], done: Dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, token in enumerate(tokens):
+            if self.config.drop_after is not None and i >= self.config.drop_after:
+                self.close_connection = True  # hang up mid-body, like a crashed node
+                return
+            frame = {"model": done["model"], "message": {"role": "assistant", "content": token}, "done": False}
+            self._write_chunk((json.dumps(frame) + "\n").encode())
+            time.sleep(self.config.token_interval)
+        if not self.config.omit_done:
+            self._write_chunk((json.dumps(done) + "\n").encode())
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _send_json(self, status: int, data: Dict):
+        body = (json.dumps(data) + "\n").encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> http.server.ThreadingHTTPServer:
+    StubOllamaHandler.config = config
+    http.server.ThreadingHTTPServer.request_queue_size = 1024
+    return http.server.ThreadingHTTPServer((host, port), StubOllamaHandler)
+
+
+def serve(port_queue, config: StubConfig, port: int = 0):
+    """multiprocessing target: serve forever, reporting the bound port on port_queue."""
+    server = make_server(config, port=port)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="delay before the first token")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform extra delay, 0..jitter")
+    parser.add_argument("--tokens", type=int, default=24, help="reply length, capped by options.num_predict")
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0)
+    parser.add_argument("--stream", choices=("auto", "always", "never"), default="auto",
+                        help="auto follows the request's stream flag (Ollama streams by default)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failed on purpose")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--drop-after", type=int, default=None,
+                        help="cut streamed replies off after this many tokens")
+    parser.add_argument("--omit-done", action="store_true",
+                        help="end streamed replies without the final done frame")
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, tokens=args.tokens,
+        tokens_per_sec=args.tokens_per_sec, stream=args.stream, error_rate=args.error_rate,
+        error_status=args.error_status, seed=args.seed, drop_after=args.drop_after,
+        omit_done=args.omit_done
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(config_from_args(args), args.host, args.port)
+    print(f"Stub Ollama on http://{args.host}:{server.server_address[1]}/api/chat")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
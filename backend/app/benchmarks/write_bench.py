@@ -0,0 +1,82 @@
+"""
+Concurrent write benchmark for database.py: chat-message inserts/sec from
+N threads with one commit per insert versus the group-commit write-behind
+writer (DB_WRITE_BEHIND).
+
+    python -m benchmarks.write_bench --threads 1 8 32 --writes 200 --synchronous FULL
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_mode(database, settings, write_behind: bool, threads: int, writes: int) -> dict:
+    database.close_all_connections()
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="write-bench-"), "bench.db")
+    settings.DB_WRITE_BEHIND = write_behind
+    database.open_writes()
+    try:
+        database.init_db()
+        user_id = database.create_user("bench")
+        log_id = database.save_mood_log(user_id, "Neutral", "{}")
+        session_id = database.create_chat_session(user_id, log_id)
+
+        def worker():
+            for i in range(writes):
+                database.save_chat_message(session_id, "user", f"message {i}")
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        stats = database.write_stats()
+        rows = database.get_connection().execute("SELECT COUNT(*) FROM chat_messages").fetchone()[0]
+        assert rows == threads * writes, f"expected {threads * writes} rows, found {rows}"
+    finally:
+        database.flush_writes()
+        database.close_all_connections()
+
+    result = {"writes_per_sec": round(threads * writes / elapsed, 1)}
+    if stats:
+        result["avg_batch_size"] = stats["avg_batch_size"]
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--writes", type=int, default=200, help="inserts per thread")
+    parser.add_argument("--synchronous", default="FULL",
+                        help="PRAGMA synchronous for the run (FULL makes every commit fsync)")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="write-bench-"), "import.db")
+    sys.path.insert(0, APP_DIR)
+    from utils.config import settings
+    settings.DB_SYNCHRONOUS = args.synchronous
+    import database
+
+    results = {}
+    for threads in args.threads:
+        before = run_mode(database, settings, False, threads, args.writes)
+        after = run_mode(database, settings, True, threads, args.writes)
+        results[f"{threads}_threads"] = {
+            "per_insert_commit": before,
+            "write_behind": after,
+            "speedup": round(after["writes_per_sec"] / before["writes_per_sec"], 2),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
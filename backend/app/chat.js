@@ -1,7 +1,7 @@
 // Enhanced NeuroCare AI Chat with fallback to chatbot
 class ChatSession {
     constructor() {
-        this.sessionId = Date.now();
+        this.sessionId = null;
         this.username = localStorage.getItem('currentUser') || 'User';
         this.currentMood = localStorage.getItem('currentMood') || 'Neutral';
         this.isLoading = false;
@@ -44,19 +44,52 @@ class ChatSession {
         });
     }
 
-    startChat() {
+    async startChat() {
         console.log('Starting NeuroCare AI chat session...');
         
         if (this.welcomeMessage) {
             this.welcomeMessage.remove();
         }
 
-        const greeting = this.getGreeting();
+        let greeting;
+        try {
+            greeting = await this.startMainChat();
+        } catch (error) {
+            console.log('🔄 Chat session unavailable, using chatbot:', error.message);
+            this.useChatbot = true;
+            greeting = this.getGreeting();
+        }
         this.addMessage('assistant', greeting);
         
         this.enableInput();
     }
 
+    async startMainChat() {
+        const moodLogId = parseInt(localStorage.getItem('currentMoodLogId'), 10);
+        if (!moodLogId) {
+            throw new Error('No mood log ID available');
+        }
+
+        const response = await fetch('/chat/start', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({
+                username: this.username,
+                mood_log_id: moodLogId
+            })
+        });
+
+        if (!response.ok) {
+            throw new Error(`Chat start HTTP ${response.status}`);
+        }
+
+        const data = await response.json();
+        this.sessionId = data.session_id;
+        return data.greeting;
+    }
+
     getGreeting() {
         const moodGreetings = {
             'Happy/Calm': "Hello! I'm NeuroCare AI. I can see you're feeling positive and balanced today - that's wonderful! What would you like to talk about?",
@@ -92,10 +125,11 @@ class ChatSession {
             let response;
             
             if (!this.useChatbot) {
-                // Try main chat system first
+                // Try main chat system first; it renders tokens as they stream in
                 try {
-                    response = await this.tryMainChat(message);
+                    await this.streamMainChat(message);
                     console.log('✅ Main chat response received');
+                    return;
                 } catch (mainError) {
                     console.log('🔄 Main chat failed, trying chatbot...');
                     this.useChatbot = true;
@@ -120,14 +154,12 @@ class ChatSession {
         }
     }
 
-    async tryMainChat(message) {
-        const moodLogId = localStorage.getItem('currentMoodLogId');
-        
-        if (!moodLogId) {
-            throw new Error('No mood log ID available');
+    async streamMainChat(message) {
+        if (!this.sessionId) {
+            throw new Error('No chat session available');
         }
 
-        const response = await fetch('/chat/message', {
+        const response = await fetch('/chat/message/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
@@ -138,12 +170,69 @@ class ChatSession {
             })
         });
 
-        if (!response.ok) {
+        if (!response.ok || !response.body) {
             throw new Error(`Main chat HTTP ${response.status}`);
         }
 
-        const data = await response.json();
-        return data.response;
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let text = '';
+        let messageDiv = null;
+
+        try {
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const event = this.parseServerEvent(buffer.slice(0, boundary));
+                    buffer = buffer.slice(boundary + 2);
+
+                    if (event.type === 'error') {
+                        throw new Error(event.data.detail || 'Stream error');
+                    }
+                    if (event.type === 'done') {
+                        if (!messageDiv) {
+                            this.removeTypingIndicator();
+                            this.addMessage('assistant', event.data.response);
+                        }
+                        return;
+                    }
+                    if (event.data.token) {
+                        if (!messageDiv) {
+                            this.removeTypingIndicator();
+                            messageDiv = this.addMessage('assistant', '');
+                        }
+                        text += event.data.token;
+                        messageDiv.textContent = text;
+                        this.scrollToBottom();
+                    }
+                }
+            }
+            throw new Error('Stream ended before completion');
+        } catch (error) {
+            if (messageDiv) {
+                messageDiv.remove();
+                this.showTypingIndicator();
+            }
+            throw error;
+        }
+    }
+
+    parseServerEvent(rawEvent) {
+        let type = 'message';
+        let data = '';
+        rawEvent.split('\n').forEach(line => {
+            if (line.startsWith('event:')) {
+                type = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data += line.slice(5).trim();
+            }
+        });
+        return { type, data: data ? JSON.parse(data) : {} };
     }
 
     async tryChatbot(message) {
@@ -214,6 +303,7 @@ class ChatSession {
         
         this.chatContainer.appendChild(messageDiv);
         this.scrollToBottom();
+        return messageDiv;
     }
 
     showTypingIndicator() {
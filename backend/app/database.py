@@ -1,7 +1,13 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timezone, timedelta
 from typing import Optional, List, Dict
 import os
+from utils.config import settings
+from migrations import run_migrations
+from utils.group_commit import GroupCommitWriter, WriterStopped
+from utils.metrics import instrument_db_functions
 
 # Pakistan Standard Time (UTC+5)
 PKT = timezone(timedelta(hours=5))
@@ -22,16 +28,179 @@ def get_pkt_now():
 
 DB_PATH = os.path.join(os.path.dirname(__file__), "mood_tracker.db")
 
+# DATABASE_URL=sqlite:///path overrides the file (relative paths resolve here)
+if os.environ.get("DATABASE_URL", "").startswith("sqlite:///"):
+    DB_PATH = os.path.join(os.path.dirname(__file__), os.environ["DATABASE_URL"][len("sqlite:///"):])
 
-def get_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DB_PATH)
+
+# ============== CONNECTION MANAGER ==============
+# Each thread keeps one persistent connection (the DB thread pool has a fixed
+# number of threads, so this is a bounded pool). Connections are opened in WAL
+# mode with tuned pragmas, and sqlite3's per-connection statement cache means
+# repeated queries skip re-parsing.
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+
+def _open_connection() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_PATH,
+        check_same_thread=False,  # only closed from another thread, never shared
+        cached_statements=settings.DB_STATEMENT_CACHE_SIZE
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {settings.DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = -{settings.DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {settings.DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout = {settings.DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store = MEMORY")
     return conn
 
 
+def get_connection():
+    """Get this thread's persistent database connection."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _generation:
+        conn = _open_connection()
+        _local.conn = conn
+        _local.generation = _generation
+        with _connections_lock:
+            _connections.append(conn)
+        ensure_db()
+    return conn
+
+
+# The schema is set up once per process, by the app's lifespan handler or
+# by whichever caller opens the first connection, instead of on import.
+_db_ready = False
+_db_ready_lock = threading.Lock()
+_db_setup_thread: Optional[int] = None
+
+
+def ensure_db():
+    """Create tables and apply migrations if this process has not done so yet."""
+    global _db_ready, _db_setup_thread
+    if _db_ready or _db_setup_thread == threading.get_ident():
+        return  # done, or called back from init_db's own get_connection()
+    with _db_ready_lock:
+        if not _db_ready:
+            _db_setup_thread = threading.get_ident()
+            try:
+                init_db()
+                _db_ready = True
+            finally:
+                _db_setup_thread = None
+
+
+def close_all_connections():
+    """Close every thread's connection; threads reconnect on next use."""
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        for conn in _connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+
+
+# ============== WRITE-BEHIND ==============
+# With DB_WRITE_BEHIND on, hot-path inserts (chat messages, mood logs) go to a
+# single writer thread that commits them in batches. Callers still block until
+# their row is committed and get its id back. After flush_writes() (shutdown)
+# writes commit directly until open_writes() turns write-behind back on.
+
+_writer: Optional[GroupCommitWriter] = None
+_writer_lock = threading.Lock()
+_writes_closed = False
+
+
+def _get_writer() -> Optional[GroupCommitWriter]:
+    global _writer
+    if not settings.DB_WRITE_BEHIND or _writes_closed:
+        return None
+    if _writer is None:
+        ensure_db()
+        with _writer_lock:
+            if _writer is None and not _writes_closed:
+                _writer = GroupCommitWriter(
+                    _open_connection,
+                    max_batch=settings.DB_WRITE_BATCH_SIZE,
+                    window_ms=settings.DB_WRITE_WINDOW_MS
+                )
+                _writer.start()
+    return _writer
+
+
+def _write(op):
+    """Run op(cursor) in a committed transaction, via the writer when enabled."""
+    writer = _get_writer()
+    if writer is not None:
+        try:
+            return writer.submit(op)
+        except WriterStopped:
+            pass  # stopped under us (shutdown) or failed; the op has not run, commit it here
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        result = op(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()  # never leave a transaction open on this thread's shared connection
+        raise
+    return result
+
+
+def open_writes():
+    """Allow write-behind again after flush_writes() (app startup)."""
+    global _writes_closed
+    with _writer_lock:
+        _writes_closed = False
+
+
+def flush_writes():
+    """Stop the write-behind writer after committing everything queued; later writes commit directly."""
+    global _writer, _writes_closed
+    with _writer_lock:
+        writer, _writer = _writer, None
+        _writes_closed = True
+    if writer is not None:
+        writer.stop()
+
+
+def write_stats() -> Optional[Dict]:
+    """Batching stats for the write-behind writer (None when disabled)."""
+    return _writer.stats() if _writer is not None else None
+
+
+@contextmanager
+def use_database_file(path: str):
+    """
+    Point this process at another database file for the block (tools such as
+    the query plan check). Writes inside it commit directly, not write-behind.
+    """
+    global DB_PATH, _db_ready
+    saved = DB_PATH, _db_ready, _writes_closed
+    flush_writes()
+    close_all_connections()
+    DB_PATH, _db_ready = path, False
+    try:
+        yield
+    finally:
+        close_all_connections()
+        DB_PATH, _db_ready = saved[0], saved[1]
+        if not saved[2]:
+            open_writes()
+
+
 def init_db():
-    """Initialize the database with required tables."""
+    """Initialize the database with required tables, then apply migrations."""
     conn = get_connection()
     cursor = conn.cursor()
 
@@ -82,7 +251,9 @@ def init_db():
     """)
 
     conn.commit()
-    conn.close()
+
+    create_appointment_table()
+    run_migrations(conn)
 
 
 def create_user(username: str) -> Optional[int]:
@@ -97,11 +268,13 @@ def create_user(username: str) -> Optional[int]:
         )
         conn.commit()
         user_id = cursor.lastrowid
-        conn.close()
         return user_id
     except sqlite3.IntegrityError:
-        conn.close()
+        conn.rollback()
         return None
+    except Exception:
+        conn.rollback()
+        raise
 
 
 def get_user(username: str) -> Optional[Dict]:
@@ -111,13 +284,31 @@ def get_user(username: str) -> Optional[Dict]:
 
     cursor.execute("SELECT * FROM users WHERE username = ?", (username,))
     row = cursor.fetchone()
-    conn.close()
 
     if row:
         return {"id": row["id"], "username": row["username"], "created_at": row["created_at"]}
     return None
 
 
+def get_users(usernames: List[str]) -> Dict[str, Dict]:
+    """Look up many users at once. Returns {username: user} for those that exist."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    names = list(dict.fromkeys(usernames))
+    users = {}
+
+    # Stay under SQLite's bound-parameter limit
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        cursor.execute(
+            f"SELECT * FROM users WHERE username IN ({', '.join('?' * len(chunk))})",
+            chunk
+        )
+        for row in cursor.fetchall():
+            users[row["username"]] = {"id": row["id"], "username": row["username"], "created_at": row["created_at"]}
+    return users
+
+
 def user_exists(username: str) -> bool:
     """Check if username exists."""
     return get_user(username) is not None
@@ -125,17 +316,129 @@ def user_exists(username: str) -> bool:
 
 def save_mood_log(user_id: int, mood: str, answers: str) -> int:
     """Save a mood log entry. Returns the log id."""
+    created_at = get_pkt_now()
+
+    def insert(cursor):
+        cursor.execute(
+            "INSERT INTO mood_logs (user_id, mood, answers, created_at) VALUES (?, ?, ?, ?)",
+            (user_id, mood, answers, created_at)
+        )
+        log_id = cursor.lastrowid
+        _count_daily_mood(cursor, user_id, created_at[:10], mood)
+        return log_id
+
+    return _write(insert)
+
+
+def save_mood_logs_bulk(entries: List[tuple]) -> List[int]:
+    """
+    Save many (user_id, mood, answers) mood logs in one transaction, with
+    their daily aggregates. Returns the log ids in the same order.
+    """
+    if not entries:
+        return []
+    created_at = get_pkt_now()
+
+    def insert(cursor):
+        log_ids = []
+        for user_id, mood, answers in entries:
+            cursor.execute(
+                "INSERT INTO mood_logs (user_id, mood, answers, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, mood, answers, created_at)
+            )
+            log_ids.append(cursor.lastrowid)
+            _count_daily_mood(cursor, user_id, created_at[:10], mood)
+        return log_ids
+
+    return _write(insert)
+
+
+# ============== DAILY MOOD AGGREGATES ==============
+# mood_daily_agg holds one row per (user, day, mood) with the number of mood
+# logs, kept in step with mood_logs inside the same transaction. Reports read
+# only the days they need instead of a user's whole history.
+
+def _count_daily_mood(cursor: sqlite3.Cursor, user_id: int, day: str, mood: str):
+    cursor.execute("""
+        INSERT INTO mood_daily_agg (user_id, day, mood, count) VALUES (?, ?, ?, 1)
+        ON CONFLICT (user_id, day, mood) DO UPDATE SET count = count + 1
+    """, (user_id, day, mood))
+
+
+def get_mood_daily_counts(user_id: int, since_day: str, until_day: str) -> List[Dict]:
+    """Per-day mood counts for a user between two YYYY-MM-DD days (inclusive)."""
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute(
-        "INSERT INTO mood_logs (user_id, mood, answers, created_at) VALUES (?, ?, ?, ?)",
-        (user_id, mood, answers, get_pkt_now())
-    )
-    conn.commit()
-    log_id = cursor.lastrowid
-    conn.close()
-    return log_id
+    cursor.execute("""
+        SELECT day, mood, count
+        FROM mood_daily_agg
+        WHERE user_id = ? AND day BETWEEN ? AND ?
+        ORDER BY day
+    """, (user_id, since_day, until_day))
+
+    return [{"day": row["day"], "mood": row["mood"], "count": row["count"]} for row in cursor.fetchall()]
+
+
+_DAILY_MOOD_COUNTS_SQL = """
+    SELECT user_id, substr(created_at, 1, 10) AS day, mood, COUNT(*) AS count
+    FROM mood_logs
+    {where}
+    GROUP BY user_id, day, mood
+"""
+
+
+def rebuild_mood_daily_agg(user_id: Optional[int] = None) -> int:
+    """Recompute aggregates from mood_logs (all users or one). Returns rows written."""
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+
+    def rebuild(cursor):
+        if user_id is not None:
+            cursor.execute("DELETE FROM mood_daily_agg WHERE user_id = ?", params)
+        else:
+            cursor.execute("DELETE FROM mood_daily_agg")
+        cursor.execute(
+            "INSERT INTO mood_daily_agg (user_id, day, mood, count) "
+            + _DAILY_MOOD_COUNTS_SQL.format(where=where),
+            params
+        )
+        return cursor.rowcount
+
+    return _write(rebuild)
+
+
+def check_mood_daily_agg() -> List[Dict]:
+    """Compare aggregates against mood_logs. Returns the rows that disagree."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    expected_sql = _DAILY_MOOD_COUNTS_SQL.format(where="")
+    cursor.execute(f"""
+        WITH expected AS ({expected_sql})
+        SELECT e.user_id, e.day, e.mood, e.count AS expected, COALESCE(a.count, 0) AS actual
+        FROM expected e
+        LEFT JOIN mood_daily_agg a
+            ON a.user_id = e.user_id AND a.day = e.day AND a.mood = e.mood
+        WHERE a.count IS NULL OR a.count != e.count
+        UNION ALL
+        SELECT a.user_id, a.day, a.mood, 0, a.count
+        FROM mood_daily_agg a
+        WHERE NOT EXISTS (
+            SELECT 1 FROM mood_logs ml
+            WHERE ml.user_id = a.user_id AND substr(ml.created_at, 1, 10) = a.day AND ml.mood = a.mood
+        )
+    """)
+
+    return [
+        {
+            "user_id": row["user_id"],
+            "day": row["day"],
+            "mood": row["mood"],
+            "expected": row["expected"],
+            "actual": row["actual"]
+        }
+        for row in cursor.fetchall()
+    ]
 
 
 def get_user_mood_history(username: str) -> List[Dict]:
@@ -152,7 +455,6 @@ def get_user_mood_history(username: str) -> List[Dict]:
     """, (username,))
 
     rows = cursor.fetchall()
-    conn.close()
 
     return [
         {
@@ -165,49 +467,189 @@ def get_user_mood_history(username: str) -> List[Dict]:
     ]
 
 
-# ============== CHAT SESSION FUNCTIONS ==============
-
-def create_chat_session(user_id: int, mood_log_id: int) -> int:
-    """Create a new chat session. Returns session id."""
+def get_mood_log(user_id: int, log_id: int) -> Optional[Dict]:
+    """Get one of a user's mood logs by id."""
     conn = get_connection()
     cursor = conn.cursor()
 
     cursor.execute(
-        "INSERT INTO chat_sessions (user_id, mood_log_id, started_at) VALUES (?, ?, ?)",
-        (user_id, mood_log_id, get_pkt_now())
+        "SELECT id, mood, answers, created_at FROM mood_logs WHERE id = ? AND user_id = ?",
+        (log_id, user_id)
     )
-    conn.commit()
-    session_id = cursor.lastrowid
-    conn.close()
-    return session_id
+    row = cursor.fetchone()
 
+    if row:
+        return {
+            "id": row["id"],
+            "mood": row["mood"],
+            "answers": row["answers"],
+            "created_at": row["created_at"]
+        }
+    return None
 
-def end_chat_session(session_id: int):
-    """Mark a chat session as ended."""
+
+def get_session_latest_mood_log_id(session_id: int) -> Optional[int]:
+    """
+    Id of the newest mood log of a chat session's user (0 if they have none),
+    or None if the session does not exist. One index probe per table.
+    """
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute(
-        "UPDATE chat_sessions SET ended_at = ? WHERE id = ?",
-        (get_pkt_now(), session_id)
-    )
-    conn.commit()
-    conn.close()
+    cursor.execute("""
+        SELECT (
+            SELECT id FROM mood_logs
+            WHERE user_id = cs.user_id
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1
+        ) AS latest_log_id
+        FROM chat_sessions cs
+        WHERE cs.id = ?
+    """, (session_id,))
+    row = cursor.fetchone()
 
+    if row:
+        return row["latest_log_id"] or 0
+    return None
 
-def save_chat_message(session_id: int, role: str, content: str) -> int:
-    """Save a chat message. Returns message id."""
+
+def get_mood_history_page(user_id: int, limit: int, before_id: Optional[int] = None,
+                          since: Optional[str] = None, until: Optional[str] = None) -> List[Dict]:
+    """
+    One page of a user's mood logs, newest first (created_at, then id).
+    before_id is the last id of the previous page; since/until bound
+    created_at inclusively. Rows come straight off the (user_id, created_at)
+    index, so a page costs the same however long the history is.
+    """
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute(
-        "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
-        (session_id, role, content, get_pkt_now())
-    )
-    conn.commit()
-    message_id = cursor.lastrowid
-    conn.close()
-    return message_id
+    conditions = ["user_id = ?"]
+    params = [user_id]
+    if before_id is not None:
+        conditions.append("(created_at, id) < (SELECT created_at, id FROM mood_logs WHERE id = ?)")
+        params.append(before_id)
+    if since is not None:
+        conditions.append("created_at >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("created_at <= ?")
+        params.append(until)
+    params.append(limit)
+
+    cursor.execute(f"""
+        SELECT id, mood, answers, created_at
+        FROM mood_logs
+        WHERE {" AND ".join(conditions)}
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """, params)
+
+    return [
+        {
+            "id": row["id"],
+            "mood": row["mood"],
+            "answers": row["answers"],
+            "created_at": row["created_at"]
+        }
+        for row in cursor.fetchall()
+    ]
+
+
+# ============== CHAT SESSION FUNCTIONS ==============
+
+def create_chat_session(user_id: int, mood_log_id: int, keep_alive: Optional[str] = None) -> int:
+    """Create a new chat session. keep_alive overrides CHAT_KEEP_ALIVE for it. Returns session id."""
+    started_at = get_pkt_now()
+
+    def insert(cursor):
+        cursor.execute(
+            "INSERT INTO chat_sessions (user_id, mood_log_id, started_at, keep_alive) VALUES (?, ?, ?, ?)",
+            (user_id, mood_log_id, started_at, keep_alive)
+        )
+        return cursor.lastrowid
+
+    return _write(insert)
+
+
+def get_chat_session(session_id: int) -> Optional[Dict]:
+    """Get a chat session with its owner and the mood it was started from."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT cs.id, cs.user_id, cs.mood_log_id, cs.started_at, cs.ended_at,
+               cs.summary, cs.summary_upto_message_id, cs.keep_alive, u.username, ml.mood
+        FROM chat_sessions cs
+        JOIN users u ON cs.user_id = u.id
+        JOIN mood_logs ml ON cs.mood_log_id = ml.id
+        WHERE cs.id = ?
+    """, (session_id,))
+
+    row = cursor.fetchone()
+
+    if row:
+        return {
+            "id": row["id"],
+            "user_id": row["user_id"],
+            "username": row["username"],
+            "mood_log_id": row["mood_log_id"],
+            "mood": row["mood"],
+            "started_at": row["started_at"],
+            "ended_at": row["ended_at"],
+            "summary": row["summary"],
+            "summary_upto_message_id": row["summary_upto_message_id"],
+            "keep_alive": row["keep_alive"]
+        }
+    return None
+
+
+def save_session_summary(session_id: int, summary: str, upto_message_id: int) -> bool:
+    """
+    Store a session's rolling summary covering messages up to upto_message_id.
+    Never moves the summary backwards; returns False if a newer one is stored.
+    """
+    def update(cursor):
+        cursor.execute("""
+            UPDATE chat_sessions SET summary = ?, summary_upto_message_id = ?
+            WHERE id = ? AND summary_upto_message_id < ?
+        """, (summary, upto_message_id, session_id, upto_message_id))
+        return cursor.rowcount > 0
+
+    return _write(update)
+
+
+def end_chat_session(session_id: int):
+    """Mark a chat session as ended."""
+    ended_at = get_pkt_now()
+
+    def update(cursor):
+        cursor.execute("UPDATE chat_sessions SET ended_at = ? WHERE id = ?", (ended_at, session_id))
+
+    _write(update)
+
+
+def save_chat_message(session_id: int, role: str, content: str) -> int:
+    """Save a chat message. Returns message id."""
+    created_at = get_pkt_now()
+
+    def insert(cursor):
+        cursor.execute(
+            "INSERT INTO chat_messages (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+            (session_id, role, content, created_at)
+        )
+        return cursor.lastrowid
+
+    return _write(insert)
+
+
+def delete_chat_message(message_id: int) -> bool:
+    """Delete a chat message (a user turn the model never answered). Returns True if it existed."""
+    def delete(cursor):
+        cursor.execute("DELETE FROM chat_messages WHERE id = ?", (message_id,))
+        return cursor.rowcount > 0
+
+    return _write(delete)
 
 
 def get_session_messages(session_id: int) -> List[Dict]:
@@ -223,7 +665,56 @@ def get_session_messages(session_id: int) -> List[Dict]:
     """, (session_id,))
 
     rows = cursor.fetchall()
-    conn.close()
+
+    return [
+        {
+            "id": row["id"],
+            "role": row["role"],
+            "content": row["content"],
+            "created_at": row["created_at"]
+        }
+        for row in rows
+    ]
+
+def get_recent_session_messages(session_id: int, after_id: int, limit: int) -> List[Dict]:
+    """The newest `limit` messages with id > after_id, returned oldest first."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT id, role, content, created_at
+        FROM chat_messages
+        WHERE session_id = ? AND id > ?
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    """, (session_id, after_id, limit))
+
+    rows = cursor.fetchall()
+
+    return [
+        {
+            "id": row["id"],
+            "role": row["role"],
+            "content": row["content"],
+            "created_at": row["created_at"]
+        }
+        for row in reversed(rows)
+    ]
+
+
+def get_session_messages_after(session_id: int, after_id: int) -> List[Dict]:
+    """All messages with id > after_id, oldest first."""
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        SELECT id, role, content, created_at
+        FROM chat_messages
+        WHERE session_id = ? AND id > ?
+        ORDER BY created_at ASC, id ASC
+    """, (session_id, after_id))
+
+    rows = cursor.fetchall()
 
     return [
         {
@@ -257,23 +748,20 @@ def create_appointment_table():
     """)
 
     conn.commit()
-    conn.close()
 
 def create_appointment(user_id: int, appointment_date: str, appointment_time: str, 
                       appointment_type: str = 'General Consultation', notes: str = '') -> int:
     """Create a new appointment. Returns appointment id."""
-    conn = get_connection()
-    cursor = conn.cursor()
+    created_at = get_pkt_now()
 
-    cursor.execute("""
-        INSERT INTO appointments (user_id, appointment_date, appointment_time, appointment_type, notes, created_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (user_id, appointment_date, appointment_time, appointment_type, notes, get_pkt_now()))
+    def insert(cursor):
+        cursor.execute("""
+            INSERT INTO appointments (user_id, appointment_date, appointment_time, appointment_type, notes, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_id, appointment_date, appointment_time, appointment_type, notes, created_at))
+        return cursor.lastrowid
 
-    conn.commit()
-    appointment_id = cursor.lastrowid
-    conn.close()
-    return appointment_id
+    return _write(insert)
 
 def get_user_appointments(username: str) -> List[Dict]:
     """Get all appointments for a user"""
@@ -289,7 +777,6 @@ def get_user_appointments(username: str) -> List[Dict]:
     """, (username,))
 
     rows = cursor.fetchall()
-    conn.close()
 
     return [
         {
@@ -304,9 +791,6 @@ def get_user_appointments(username: str) -> List[Dict]:
         for row in rows
     ]
 
-# Initialize appointments table
-create_appointment_table()
-
 def get_user_chat_sessions(username: str) -> List[Dict]:
     """Get all chat sessions for a user."""
     conn = get_connection()
@@ -322,7 +806,6 @@ def get_user_chat_sessions(username: str) -> List[Dict]:
     """, (username,))
 
     rows = cursor.fetchall()
-    conn.close()
 
     return [
         {
@@ -351,7 +834,6 @@ def get_latest_mood_log(username: str) -> Optional[Dict]:
     """, (username,))
 
     row = cursor.fetchone()
-    conn.close()
 
     if row:
         return {
@@ -363,5 +845,10 @@ def get_latest_mood_log(username: str) -> Optional[Dict]:
     return None
 
 
-# Initialize database on import
-init_db()
+# Time every public function above (db_call_duration_seconds{function=...}).
+# Connection plumbing and lifecycle calls are not queries; keep them out of
+# the latency histogram.
+instrument_db_functions(globals(), __name__, exclude=(
+    "get_pkt_now", "get_connection", "ensure_db", "write_stats",
+    "init_db", "close_all_connections", "flush_writes", "open_writes", "use_database_file"
+))
@@ -1,35 +1,48 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, List, Any  
 import json
 import os
-import re 
-import random  
+import secrets
+from contextlib import asynccontextmanager
 from datetime import datetime  
+from utils.admission import AdmissionRejected
+from utils.config import settings
+from utils.executor import run_db, run_blocking, shutdown_executors, loop_lag_monitor
+from utils.static_cache import StaticFileCache
+from utils.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics
+from utils.profiler import ProfileStore, SamplingProfilerMiddleware
+from services.intent_service import CHATBOT_INTENTS, classify_chatbot_intent, generate_chatbot_reply, triage_messages
+from models.mood_models import (
+    StartChatRequest, StartChatResponse, ChatMessageRequest, ChatMessageResponse
+)
 
 # Safe imports that won't crash Vercel
 try:
     # Try local imports first
     from services.report_service import generate_weekly_report
-    from LLM_logic_for_mood_detection import query_mood_model
-    from LLM_logic_for_psychiatrist import chat_with_psychiatrist, get_initial_greeting
-    from prompt_for_mood_detection import system_prompt
+    from services.mood_service import resolve_mood, serialize_answers
+    from services.mood_batch import ingest_questionnaires, parse_csv, parse_jsonl
+    from services.chat_service import load_conversation, schedule_summary_refresh, cancel_summary_refreshes
+    from services.prompt_cache import prompt_cache_stats
+    from LLM_logic_for_mood_detection import mood_cache
+    from LLM_logic_for_psychiatrist import (
+        chat_with_psychiatrist, get_initial_greeting, stream_psychiatrist_reply
+    )
+    from utils.ollama_client import StreamInterrupted, close_client, connection_stats, start_backend_probes
     from database import (
-        create_user, get_user, user_exists, save_mood_log,
-        get_user_mood_history, create_chat_session, end_chat_session,
-        save_chat_message, get_session_messages, get_user_chat_sessions,
-        get_latest_mood_log
+        create_user, get_user, user_exists, save_mood_log, create_chat_session,
+        save_chat_message, delete_chat_message, get_chat_session, get_mood_log, get_mood_history_page,
+        close_all_connections, flush_writes, open_writes, write_stats, ensure_db
     )
-    print("✅ Using local import paths")
 except ImportError:
     # Fallback - create dummy functions so app doesn't crash
     print("⚠️  Some imports failed - using fallback functions")
     
     # Create dummy functions for missing imports
-    def generate_weekly_report(username):
+    def generate_weekly_report(username, days=7):
         return {
             "username": username,
             "period": "Weekly Report",
@@ -40,14 +53,62 @@ except ImportError:
             "mood_trend": "Unknown"
         }
     
-    def query_mood_model(answers, prompt):
-        return "Neutral"  # Fallback mood
+    class _NoMoodCache:
+        def stats(self):
+            return {}
+
+        def close(self):
+            pass
+
+    mood_cache = _NoMoodCache()
+
+    async def resolve_mood(answers, mode=None, user_key=None):
+        return "Neutral", "fallback"
+
+    def serialize_answers(answers):
+        return json.dumps(answers)
+
+    async def ingest_questionnaires(rows, concurrency=None, dry_run=False):
+        yield {"summary": {"rows": len(rows), "saved": 0, "error": "Mood service not available"}}
+
+    def parse_csv(text):
+        return []
+
+    def parse_jsonl(lines):
+        return []
     
-    def chat_with_psychiatrist(*args, **kwargs):
+    async def chat_with_psychiatrist(*args, **kwargs):
         return "I'm here to listen and support you. How are you feeling today?"
     
-    def get_initial_greeting(*args, **kwargs):
+    async def get_initial_greeting(*args, **kwargs):
         return "Hello! I'm NeuroCare AI. I'm here to support your mental wellness journey."
+
+    def load_conversation(session):
+        return {"summary": None, "messages": [], "needs_summary": False}
+
+    def schedule_summary_refresh(session_id):
+        pass
+
+    async def cancel_summary_refreshes():
+        pass
+
+    async def stream_psychiatrist_reply(*args, **kwargs):
+        yield "I'm here to listen and support you. How are you feeling today?"
+
+    class StreamInterrupted(Exception):
+        pass
+
+    async def close_client():
+        pass
+
+    def start_backend_probes():
+        pass
+
+    def prompt_cache_stats():
+        return {}
+
+    def connection_stats():
+        return {}
     
     # Dummy database functions
     def create_user(username):
@@ -62,28 +123,83 @@ except ImportError:
     def save_mood_log(user_id, mood, answers):
         return 1
     
-    def get_user_mood_history(username):
-        return []
-    
-    def create_chat_session(user_id, mood_log_id):
+    def create_chat_session(user_id, mood_log_id, keep_alive=None):
         return 1
     
-    def end_chat_session(session_id):
-        pass
-    
     def save_chat_message(session_id, role, content):
         return 1
     
-    def get_session_messages(session_id):
-        return []
+    def delete_chat_message(message_id):
+        return False
     
-    def get_user_chat_sessions(username):
+    def get_chat_session(session_id):
+        return None
+
+    def get_mood_history_page(user_id, limit, before_id=None, since=None, until=None):
         return []
-    
-    def get_latest_mood_log():
-        return {"id": 1, "mood": "Neutral"}
 
-app = FastAPI(title="Mental Health Analyzer API")
+    def get_mood_log(user_id, log_id):
+        return None
+
+    def close_all_connections():
+        pass
+
+    def flush_writes():
+        pass
+
+    def open_writes():
+        pass
+
+    def write_stats():
+        return None
+
+    def ensure_db():
+        pass
+
+# Safe path handling - don't crash if paths don't exist
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+HTML_PAGES = ["login", "results", "report", "chat"]
+JS_FILES = ["questions", "results", "report", "chat"]
+
+static_files = StaticFileCache(
+    BASE_DIR,
+    files=[f"{name}.html" for name in HTML_PAGES] + [f"{name}.js" for name in JS_FILES] + ["styles.css"],
+    dirs=["assets"],
+    max_age=settings.STATIC_MAX_AGE,
+    html_max_age=settings.STATIC_HTML_MAX_AGE
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Startup: set up the DB schema, load static files and start Ollama
+    backend health probes. Nothing heavy
+    runs at import time, and the Ollama client, intent model and NumPy are
+    loaded on first use. Shutdown: close pooled Ollama connections, worker
+    pools, the mood cache file and DB connections.
+    """
+    print(f"🚀 Starting Mental Health Analyzer API from {BASE_DIR}")
+    loop_lag_monitor.start()
+    await run_db(ensure_db)
+    open_writes()
+    await run_blocking(static_files.load)
+    if settings.STATIC_WATCH:
+        static_files.watch()
+    start_backend_probes()
+
+    yield
+
+    await loop_lag_monitor.stop()
+    static_files.stop()
+    await cancel_summary_refreshes()
+    await close_client()
+    shutdown_executors()
+    mood_cache.close()
+    flush_writes()  # commit anything still queued for the write-behind writer
+    close_all_connections()
+
+app = FastAPI(title="Mental Health Analyzer API", lifespan=lifespan)
 
 # CORS middleware for frontend
 app.add_middleware(
@@ -93,22 +209,18 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Safe path handling - don't crash if paths don't exist
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-print(f"🚀 Starting Mental Health Analyzer API")
-print(f"📁 BASE_DIR: {BASE_DIR}")
-
-# Safe file listing - don't crash if directory doesn't exist
-try:
-    files_in_dir = os.listdir(BASE_DIR)
-    print(f"📄 Files in directory: {len(files_in_dir)} files")
-    # Only show first few files to avoid log spam
-    print(f"📄 Sample files: {files_in_dir[:10]}")
-except FileNotFoundError as e:
-    print(f"⚠️  Warning: Could not list directory {BASE_DIR}: {e}")
-    files_in_dir = []
+app.add_middleware(MetricsMiddleware)
+
+profile_store = ProfileStore(settings.PROFILE_DIR, settings.PROFILE_MAX_FILES)
+if settings.PROFILE_ENABLED:
+    app.add_middleware(
+        SamplingProfilerMiddleware,
+        store=profile_store,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        paths=settings.PROFILE_PATHS,
+        header_token=settings.ADMIN_TOKEN,
+        interval_ms=settings.PROFILE_INTERVAL_MS
+    )
 
 # ============== CATCH-ALL ROUTES TO PREVENT CRASHES ==============
 
@@ -157,6 +269,7 @@ class MoodHistoryResponse(BaseModel):
     username: str
     total_entries: int
     history: List[MoodHistoryItem]
+    next_before_id: Optional[int] = None  # pass as before_id for the next page
 
 class WeeklyReportResponse(BaseModel):
     username: str
@@ -176,10 +289,10 @@ async def signup(request: SignupRequest):
         if not username:
             raise HTTPException(status_code=400, detail="Username cannot be empty")
 
-        if user_exists(username):
+        if await run_db(user_exists, username):
             raise HTTPException(status_code=409, detail="Username already exists")
 
-        user_id = create_user(username)
+        user_id = await run_db(create_user, username)
         if user_id is None:
             raise HTTPException(status_code=500, detail="Failed to create user")
 
@@ -199,7 +312,7 @@ async def login(request: LoginRequest):
         if not username:
             raise HTTPException(status_code=400, detail="Username cannot be empty")
 
-        user = get_user(username)
+        user = await run_db(get_user, username)
         if user is None:
             raise HTTPException(status_code=404, detail="User not found. Please signup first.")
 
@@ -218,72 +331,245 @@ async def detect_mood(request: MoodDetectRequest):
         username = request.username.strip()
         answers = request.answers
 
-        user = get_user(username)
+        user = await run_db(get_user, username)
         if user is None:
             raise HTTPException(status_code=404, detail="User not found")
 
-        mood = query_mood_model(answers, system_prompt)
+        mood, _source = await resolve_mood(answers, user_key=username)
         if mood is None:
             mood = "Neutral"  # Fallback
 
-        log_id = save_mood_log(user["id"], mood, json.dumps(answers))
+        log_id = await run_db(save_mood_log, user["id"], mood, serialize_answers(answers))
 
         return MoodResponse(mood=mood, status="success", log_id=log_id)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Mood detection error: {str(e)}")
 
-# ============== CHATBOT ENDPOINTS ==============
+@app.post("/detect-mood/batch")
+async def detect_mood_batch(request: Request, concurrency: Optional[int] = None, dry_run: bool = False):
+    """
+    Bulk questionnaire ingestion. Accepts JSONL (application/x-ndjson),
+    CSV (text/csv, a username column plus q1..q10) or a JSON array of
+    {"username": ..., "answers": {...}} rows. Streams one NDJSON result per
+    row as moods resolve, then a summary line once all mood logs have been
+    written in one transaction.
+    """
+    if concurrency is not None and not 1 <= concurrency <= 64:
+        raise HTTPException(status_code=400, detail="concurrency must be between 1 and 64")
+
+    content_type = request.headers.get("content-type", "")
+    body = await request.body()
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Body must be UTF-8")
+
+    if "csv" in content_type:
+        rows = parse_csv(text)
+    elif "ndjson" in content_type or "jsonl" in content_type:
+        rows = parse_jsonl(text.splitlines())
+    else:
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array, JSONL or CSV")
+
+    async def results():
+        async for result in ingest_questionnaires(rows, concurrency, dry_run):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+def parse_history_bound(value: Optional[str], name: str, end_of_day: bool = False) -> Optional[str]:
+    """Validate a since/until bound (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS) for created_at comparisons"""
+    if value is None:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(value.strip(), fmt)
+        except ValueError:
+            continue
+        if fmt == "%Y-%m-%d" and end_of_day:
+            parsed = parsed.replace(hour=23, minute=59, second=59)
+        return parsed.strftime("%Y-%m-%d %H:%M:%S")
+    raise HTTPException(status_code=400, detail=f"{name} must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS")
+
+def load_mood_history_page(username: str, limit: int, before_id: Optional[int],
+                           since: Optional[str], until: Optional[str]) -> Optional[Dict]:
+    """Resolve the user and fetch one history page (sync, run via run_db)"""
+    user = get_user(username)
+    if user is None:
+        return None
+    # One extra row tells us whether there is another page
+    rows = get_mood_history_page(user["id"], limit + 1, before_id, since, until)
+    return {"rows": rows[:limit], "has_more": len(rows) > limit}
+
+@app.get("/mood-history/{username}", response_model=MoodHistoryResponse)
+async def mood_history(username: str, limit: int = 20, before_id: Optional[int] = None,
+                       since: Optional[str] = None, until: Optional[str] = None):
+    """Page through a user's mood logs, newest first"""
+    if limit < 1 or limit > 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    since = parse_history_bound(since, "since")
+    until = parse_history_bound(until, "until", end_of_day=True)
+
+    page = await run_db(load_mood_history_page, username.strip(), limit, before_id, since, until)
+    if page is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    # Only the returned rows have their answers decoded
+    history = [
+        MoodHistoryItem(
+            id=row["id"],
+            mood=row["mood"],
+            answers=json.loads(row["answers"]),
+            created_at=row["created_at"]
+        )
+        for row in page["rows"]
+    ]
+    return MoodHistoryResponse(
+        username=username.strip(),
+        total_entries=len(history),
+        history=history,
+        next_before_id=history[-1].id if page["has_more"] else None
+    )
 
-CHATBOT_INTENTS = {
-    "greeting": {
-        "patterns": [r"\bhi\b", r"\bhello\b", r"\bhey\b", r"assalam"],
-        "responses": [
-            "Hello! How can I support you today?",
-            "Hey there! What's on your mind?",
-            "Hi! I'm here to help whenever you're ready."
-        ]
-    },
-    "sadness": {
-        "patterns": [r"\bsad\b", r"\bdepressed\b", r"\bdown\b", r"\bunhappy\b"],
-        "responses": [
-            "I'm really sorry you're feeling this way. Want to share what's troubling you?",
-            "That sounds hard… I'm here for you. What happened?",
-            "It's okay to feel this way. Tell me more, I'm listening."
-        ]
-    },
-    "anxiety": {
-        "patterns": [r"\banxious\b", r"\banxiety\b", r"\bscared\b", r"\bworried\b"],
-        "responses": [
-            "Anxiety can be overwhelming. Do you know what triggered it?",
-            "You're safe. Let's work through this. What are you worried about?",
-            "Take a breath… I'm right here. Want to talk about what's making you anxious?"
-        ]
-    },
-    "stress": {
-        "patterns": [r"\bstress\b", r"\bstressed\b", r"\boverwhelmed\b", r"\bpressure\b"],
-        "responses": [
-            "Stress can feel overwhelming. Let's break this down together.",
-            "I hear you're feeling stressed. What's causing the most pressure right now?",
-            "Stress is tough. Would it help to talk about what's overwhelming you?"
-        ]
-    },
-    "sleep": {
-        "patterns": [r"\bsleep\b", r"\btired\b", r"\binsomnia\b", r"\bexhausted\b"],
-        "responses": [
-            "Sleep issues can really affect your wellbeing. How's your sleep been lately?",
-            "Feeling tired can make everything harder. Are you getting enough rest?",
-            "Sleep is so important for mental health. What's your sleep pattern been like?"
-        ]
-    },
-    "goodbye": {
-        "patterns": [r"\bbye\b", r"\bgoodbye\b", r"\bsee you\b", r"\bgood night\b"],
-        "responses": [
-            "Take care! I'm always here if you need me.",
-            "Goodbye! Remember, you're doing your best.",
-            "See you soon. Stay strong!"
-        ]
-    }
-}
+@app.get("/weekly-report/{username}", response_model=WeeklyReportResponse)
+async def weekly_report(username: str, days: int = 7):
+    """Mood report for the last `days` days"""
+    if days < 1 or days > 366:
+        raise HTTPException(status_code=400, detail="days must be between 1 and 366")
+    try:
+        return await run_db(generate_weekly_report, username.strip(), days)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+# ============== PSYCHIATRIST CHAT ENDPOINTS ==============
+
+def load_chat_context(session_id: int):
+    """Fetch a session and its summary plus recent messages (sync, run via run_db)"""
+    session = get_chat_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    if session["ended_at"]:
+        raise HTTPException(status_code=409, detail="Chat session has ended")
+
+    return session, load_conversation(session)
+
+@app.post("/chat/start", response_model=StartChatResponse)
+async def start_chat(request: StartChatRequest):
+    """Start a psychiatrist chat session for a mood log"""
+    try:
+        username = request.username.strip()
+        user = await run_db(get_user, username)
+        if user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        mood_log = await run_db(get_mood_log, user["id"], request.mood_log_id)
+        if mood_log is None:
+            raise HTTPException(status_code=404, detail="Mood log not found")
+
+        session_id = await run_db(create_chat_session, user["id"], mood_log["id"], request.keep_alive)
+        try:
+            greeting = await get_initial_greeting(session_id, user_key=username, keep_alive=request.keep_alive)
+        except AdmissionRejected:
+            greeting = None  # the session already exists; use the canned greeting rather than fail
+        if not greeting:
+            greeting = "Hello! I'm NeuroCare AI. I'm here to listen. How are you feeling today?"
+        await run_db(save_chat_message, session_id, "assistant", greeting)
+
+        return StartChatResponse(session_id=session_id, greeting=greeting, mood=mood_log["mood"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Chat start error: {str(e)}")
+
+@app.post("/chat/message", response_model=ChatMessageResponse)
+async def chat_message(request: ChatMessageRequest):
+    """Send a message in a chat session and wait for the full reply"""
+    try:
+        session, conversation = await run_db(load_chat_context, request.session_id)
+
+        user_message_id = await run_db(save_chat_message, request.session_id, "user", request.message)
+        try:
+            reply = await chat_with_psychiatrist(
+                request.message, session["id"], conversation["messages"], conversation["summary"],
+                user_key=session["username"], keep_alive=session["keep_alive"]
+            )
+        except AdmissionRejected:
+            # Turned away before the model saw it; the client retries the same message
+            await run_db(delete_chat_message, user_message_id)
+            raise
+        if not reply:
+            raise HTTPException(status_code=502, detail="No response from model")
+
+        message_id = await run_db(save_chat_message, request.session_id, "assistant", reply)
+        if conversation["needs_summary"]:
+            schedule_summary_refresh(request.session_id)
+        return ChatMessageResponse(response=reply, message_id=message_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Chat error: {str(e)}")
+
+def sse_event(data: Dict, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/chat/message/stream")
+async def chat_message_stream(request: ChatMessageRequest):
+    """
+    Send a message in a chat session and stream the reply as Server-Sent
+    Events: one "data" event per token, then a "done" event carrying the
+    saved message id. The reply is saved once, after the stream completes;
+    a stream that breaks off ends with an "error" event and saves nothing,
+    and a call turned away by admission control also removes the user turn.
+    """
+    session, conversation = await run_db(load_chat_context, request.session_id)
+    user_message_id = await run_db(save_chat_message, request.session_id, "user", request.message)
+
+    async def event_stream():
+        parts = []
+        try:
+            async for token in stream_psychiatrist_reply(
+                request.message, session["id"], conversation["messages"], conversation["summary"],
+                user_key=session["username"], keep_alive=session["keep_alive"]
+            ):
+                parts.append(token)
+                yield sse_event({"token": token})
+        except AdmissionRejected as e:
+            # Turned away before the model saw it; the client retries the same message.
+            # Headers are already sent, so the 503 / 429 travels as an error event
+            await run_db(delete_chat_message, user_message_id)
+            yield sse_event({"detail": e.detail, "retry_after": e.retry_after}, event="error")
+            return
+        except StreamInterrupted:
+            # The tokens already sent are only part of the reply; don't store it as complete
+            yield sse_event({"detail": "Model response was interrupted"}, event="error")
+            return
+
+        reply = "".join(parts).strip()
+        if not reply:
+            yield sse_event({"detail": "No response from model"}, event="error")
+            return
+
+        message_id = await run_db(save_chat_message, request.session_id, "assistant", reply)
+        if conversation["needs_summary"]:
+            schedule_summary_refresh(request.session_id)
+        yield sse_event({"message_id": message_id, "response": reply}, event="done")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============== CHATBOT ENDPOINTS ==============
 
 class ChatbotRequest(BaseModel):
     user_id: Optional[str] = None
@@ -298,35 +584,6 @@ class ChatbotResponse(BaseModel):
     bot_reply: str
     confidence: float
 
-def classify_chatbot_intent(message: str) -> (str, float):
-    """Simple regex-based intent classification"""
-    message = message.lower()
-    
-    for intent_name, data in CHATBOT_INTENTS.items():
-        for pattern in data["patterns"]:
-            if re.search(pattern, message, re.IGNORECASE):
-                return intent_name, 0.9
-    
-    for intent_name, data in CHATBOT_INTENTS.items():
-        for pattern in data["patterns"]:
-            keyword = re.sub(r"[^\w\s]", "", pattern)
-            if keyword and keyword.strip() and keyword.strip() in message:
-                return intent_name, 0.6
-    
-    return "general", 0.3
-
-def generate_chatbot_reply(intent: str, user_message: str) -> str:
-    """Generate response based on intent"""
-    if intent in CHATBOT_INTENTS:
-        return random.choice(CHATBOT_INTENTS[intent]["responses"])
-    
-    fallback_responses = [
-        "I understand... please tell me more about how you're feeling.",
-        "Thank you for sharing that with me. Would you like to explore this further?",
-        "I'm listening carefully. Could you tell me more about what's on your mind?",
-    ]
-    return random.choice(fallback_responses)
-
 @app.post("/chatbot/message", response_model=ChatbotResponse)
 async def chatbot_message(request: ChatbotRequest):
     """Simple chatbot endpoint"""
@@ -334,7 +591,8 @@ async def chatbot_message(request: ChatbotRequest):
         if not request.message or not request.message.strip():
             raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-        intent, confidence = classify_chatbot_intent(request.message)
+        # First use loads NumPy and the intent model; keep that off the event loop
+        intent, confidence = await run_blocking(classify_chatbot_intent, request.message)
         bot_reply = generate_chatbot_reply(intent, request.message)
         timestamp = datetime.utcnow().isoformat()
 
@@ -349,6 +607,95 @@ async def chatbot_message(request: ChatbotRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chatbot error: {str(e)}")
 
+def parse_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return ValueError(f"Invalid JSON line: {e}")
+
+async def read_ndjson_items(request: Request):
+    """Yield (index, item) from an NDJSON body as lines arrive; bad lines yield a ValueError item"""
+    index = 0
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, parse_ndjson_line(line)
+                index += 1
+    if buffer.strip():
+        yield index, parse_ndjson_line(buffer)
+
+async def iterate_items(items: List):
+    for index, item in enumerate(items):
+        yield index, item
+
+def classify_result_line(index: int, item_id, result: Dict) -> str:
+    line = {"index": index, **result}
+    if item_id is not None:
+        line["id"] = item_id
+    return json.dumps(line) + "\n"
+
+@app.post("/chatbot/classify")
+async def chatbot_classify(request: Request):
+    """
+    Bulk triage: classify many messages in one request. Accepts a JSON
+    array or streamed NDJSON (Content-Type: application/x-ndjson). Items
+    are message strings or {"id": ..., "message": ...} objects. It
+    streams back one NDJSON line per message with intent, confidence and
+    reply, in input order. Messages are classified in batches on the
+    worker pool.
+    """
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        # Parse lines as the body arrives, but finish before responding:
+        # StreamingResponse listens for disconnects on the same receive channel
+        items = iterate_items([item async for _, item in read_ndjson_items(request)])
+    else:
+        try:
+            body = json.loads(await request.body())
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+        items = iterate_items(body)
+
+    async def results():
+        batch = []  # (index, id, message, error) in input order
+
+        async def flush():
+            messages = [message for _, _, message, error in batch if error is None]
+            triaged = iter(await run_blocking(triage_messages, messages) if messages else [])
+            lines = []
+            for index, item_id, _, error in batch:
+                if error is not None:
+                    lines.append(classify_result_line(index, item_id, {"error": error}))
+                else:
+                    intent, confidence, reply = next(triaged)
+                    lines.append(classify_result_line(
+                        index, item_id, {"intent": intent, "confidence": confidence, "reply": reply}
+                    ))
+            batch.clear()
+            return "".join(lines)
+
+        async for index, item in items:
+            item_id = item.get("id") if isinstance(item, dict) else None
+            message = item.get("message") if isinstance(item, dict) else item
+            if isinstance(item, ValueError):
+                batch.append((index, None, None, str(item)))
+            elif not isinstance(message, str) or not message.strip():
+                batch.append((index, item_id, None, "Expected a non-empty message string"))
+            else:
+                batch.append((index, item_id, message, None))
+
+            if len(batch) >= settings.CHATBOT_CLASSIFY_BATCH:
+                yield await flush()
+        if batch:
+            yield await flush()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
 @app.get("/chatbot/intents")
 async def get_chatbot_intents():
     """Get list of available intents"""
@@ -356,74 +703,106 @@ async def get_chatbot_intents():
 
 # ============== STATIC FILE ROUTES ==============
 
-def safe_file_response(file_path):
-    """Safe file serving that won't crash if file doesn't exist"""
-    if os.path.exists(file_path):
-        return FileResponse(file_path)
-    else:
-        print(f"⚠️  File not found: {file_path}")
+async def cached_file_response(request: Request, rel_path: str):
+    """Serve a front-end file from the in-memory static cache, honouring conditional GETs"""
+    await static_files.ensure_loaded()
+    response = static_files.response(rel_path, request.headers)
+    if response is None:
+        print(f"⚠️  File not found: {rel_path}")
         raise HTTPException(status_code=404, detail="File not found")
+    return response
 
 @app.get("/")
-async def serve_login():
-    return safe_file_response(os.path.join(BASE_DIR, "login.html"))
+async def serve_login(request: Request):
+    return await cached_file_response(request, "login.html")
 
 @app.get("/login")
-async def serve_login_page():
-    return safe_file_response(os.path.join(BASE_DIR, "login.html"))
+async def serve_login_page(request: Request):
+    return await cached_file_response(request, "login.html")
 
 @app.get("/questions")
-async def serve_questions():
-    return safe_file_response(os.path.join(BASE_DIR, "login.html"))
+async def serve_questions(request: Request):
+    return await cached_file_response(request, "login.html")
 
 @app.get("/results")
-async def serve_results():
-    return safe_file_response(os.path.join(BASE_DIR, "results.html"))
+async def serve_results(request: Request):
+    return await cached_file_response(request, "results.html")
 
 @app.get("/report")
-async def serve_report():
-    return safe_file_response(os.path.join(BASE_DIR, "report.html"))
+async def serve_report(request: Request):
+    return await cached_file_response(request, "report.html")
 
 @app.get("/chat")
-async def serve_chat():
-    return safe_file_response(os.path.join(BASE_DIR, "chat.html"))
+async def serve_chat(request: Request):
+    return await cached_file_response(request, "chat.html")
 
 @app.get("/{filename}.js")
-async def serve_js(filename: str):
-    js_files = ["questions", "results", "report", "chat"]
-    if filename in js_files:
-        return safe_file_response(os.path.join(BASE_DIR, f"{filename}.js"))
+async def serve_js(filename: str, request: Request):
+    if filename in JS_FILES:
+        return await cached_file_response(request, f"{filename}.js")
     raise HTTPException(status_code=404, detail="File not found")
 
 @app.get("/styles.css")
-async def serve_css():
-    return safe_file_response(os.path.join(BASE_DIR, "styles.css"))
+async def serve_css(request: Request):
+    return await cached_file_response(request, "styles.css")
 
 @app.get("/assets/{asset_path:path}")
-async def serve_assets(asset_path: str):
-    asset_file_path = os.path.join(BASE_DIR, "assets", asset_path)
-    return safe_file_response(asset_file_path)
+async def serve_assets(asset_path: str, request: Request):
+    # Only files cached from assets/ can be served, so "../" cannot escape it
+    return await cached_file_response(request, f"assets/{asset_path}")
 
 @app.get("/{filename}.html")
-async def serve_html(filename: str):
-    html_files = ["login", "results", "report", "chat"]
-    if filename in html_files:
-        return safe_file_response(os.path.join(BASE_DIR, f"{filename}.html"))
+async def serve_html(filename: str, request: Request):
+    if filename in HTML_PAGES:
+        return await cached_file_response(request, f"{filename}.html")
     raise HTTPException(status_code=404, detail="File not found")
 
-# ============== CATCH-ALL ROUTE ==============
-
-@app.get("/{full_path:path}")
-async def catch_all(full_path: str):
-    """Catch-all route to serve login page for any unknown routes"""
-    print(f"🔄 Catch-all route triggered: /{full_path}")
-    return safe_file_response(os.path.join(BASE_DIR, "login.html"))
-
 # ============== HEALTH CHECK ==============
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.utcnow().isoformat(),
+        "event_loop": loop_lag_monitor.stats(),
+        "write_behind": write_stats(),
+        "static_files": static_files.stats()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """Latency histograms and counters in the Prometheus text format"""
+    from fastapi.responses import Response
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+def require_admin(request: Request):
+    """Check the admin token (Authorization: Bearer <ADMIN_TOKEN> or X-Admin-Token)"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    auth = request.headers.get("authorization", "")
+    token = auth[len("Bearer "):] if auth.startswith("Bearer ") else request.headers.get("x-admin-token", "")
+    if not secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request):
+    """Collapsed-stack profiles written by the sampling profiler, newest first"""
+    require_admin(request)
+    return {
+        "enabled": settings.PROFILE_ENABLED,
+        "directory": profile_store.directory,
+        "profiles": await run_blocking(profile_store.list)
+    }
+
+@app.get("/admin/profiles/{name}")
+async def download_profile(name: str, request: Request):
+    """Download one profile (open it in speedscope.app or feed it to flamegraph.pl)"""
+    from fastapi.responses import FileResponse
+    require_admin(request)
+    path = profile_store.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
 
 @app.get("/debug/paths")
 async def debug_paths():
@@ -437,6 +816,19 @@ async def debug_paths():
         }
     return {"base_dir": BASE_DIR, "files": files}
 
+@app.get("/debug/ollama")
+async def debug_ollama():
+    """Connection reuse stats for the shared Ollama client, plus system-prompt and mood cache hits"""
+    return {**connection_stats(), "prompt_cache": prompt_cache_stats(), "mood_cache": mood_cache.stats()}
+
+# ============== CATCH-ALL ROUTE ==============
+
+@app.get("/{full_path:path}")
+async def catch_all(full_path: str, request: Request):
+    """Catch-all route to serve login page for any unknown routes"""
+    print(f"🔄 Catch-all route triggered: /{full_path}")
+    return await cached_file_response(request, "login.html")
+
 if __name__ == "__main__":
     import uvicorn
     if os.environ.get('VERCEL'):
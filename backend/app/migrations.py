@@ -0,0 +1,183 @@
+"""
+Versioned schema migrations for the SQLite database.
+
+init_db() creates the base tables, then run_migrations() applies every
+migration newer than the version recorded in schema_version, in order,
+each in its own transaction. Append new migrations to MIGRATIONS; never
+edit or reorder ones that have shipped.
+"""
+import sqlite3
+import sys
+from typing import Dict, List, Optional
+
+# (version, description, statements)
+MIGRATIONS = [
+    (1, "index mood_logs by user and time", [
+        "CREATE INDEX IF NOT EXISTS idx_mood_logs_user_created ON mood_logs (user_id, created_at)"
+    ]),
+    (2, "index chat_messages by session and time", [
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created ON chat_messages (session_id, created_at)"
+    ]),
+    (3, "index chat_sessions by user and start time", [
+        "CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_started ON chat_sessions (user_id, started_at)"
+    ]),
+    (4, "index appointments by user, date and time", [
+        "CREATE INDEX IF NOT EXISTS idx_appointments_user_date_time "
+        "ON appointments (user_id, appointment_date, appointment_time)"
+    ]),
+    (5, "per-user daily mood counts, backfilled from mood_logs", [
+        """
+        CREATE TABLE IF NOT EXISTS mood_daily_agg (
+            user_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            mood TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, day, mood)
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR REPLACE INTO mood_daily_agg (user_id, day, mood, count)
+        SELECT user_id, substr(created_at, 1, 10), mood, COUNT(*)
+        FROM mood_logs
+        GROUP BY user_id, substr(created_at, 1, 10), mood
+        """
+    ]),
+    (6, "rolling conversation summary per chat session", [
+        "ALTER TABLE chat_sessions ADD COLUMN summary TEXT",
+        "ALTER TABLE chat_sessions ADD COLUMN summary_upto_message_id INTEGER NOT NULL DEFAULT 0"
+    ]),
+    (7, "per-session Ollama keep_alive (NULL = CHAT_KEEP_ALIVE)", [
+        "ALTER TABLE chat_sessions ADD COLUMN keep_alive TEXT"
+    ]),
+]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    """Highest applied migration version (0 for a fresh database)."""
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn: sqlite3.Connection) -> List[int]:
+    """
+    Apply pending migrations in order. Returns the versions applied.
+
+    Each migration runs in an explicit BEGIN IMMEDIATE transaction (sqlite3's
+    default mode would autocommit the DDL), so a failed statement rolls the
+    whole migration back. The version is read again once the write lock is
+    held: of several workers starting together, only one applies a migration.
+    """
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None  # autocommit; the transactions below are explicit
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        applied = []
+        version = current_version(conn)
+
+        for migration_version, description, statements in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = current_version(conn)
+                if migration_version <= version:
+                    conn.execute("ROLLBACK")  # another worker got there first
+                    continue
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (migration_version, description)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"Applied migration {migration_version}: {description}")
+            applied.append(migration_version)
+            version = migration_version
+
+        return applied
+    finally:
+        conn.isolation_level = previous_isolation
+
+
+# ============== QUERY PLAN CHECK ==============
+
+def find_full_scans(conn: sqlite3.Connection, statements: List[str]) -> Dict[str, List[str]]:
+    """
+    Run EXPLAIN QUERY PLAN on each statement and return the ones that scan
+    a whole table or need a temporary B-tree to sort, with their plans.
+    """
+    problems = {}
+    for statement in statements:
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+        if any(step.startswith("SCAN ") or "TEMP B-TREE" in step for step in plan):
+            problems[statement] = plan
+    return problems
+
+
+def check_query_plans(db_path: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Exercise every read path in database.py against a scratch database
+    (db_path, or a new temporary file), capture the SQL it runs and check
+    each statement's query plan. Any new query that falls back to a full
+    scan shows up here.
+    """
+    import os
+    import tempfile
+
+    import database
+
+    db_path = db_path or os.path.join(tempfile.mkdtemp(prefix="plan-check-"), "plan.db")
+    with database.use_database_file(db_path):
+        user = database.get_user("plan-check")
+        user_id = user["id"] if user else database.create_user("plan-check")
+        latest = database.get_latest_mood_log("plan-check")
+        log_id = latest["id"] if latest else database.save_mood_log(user_id, "Neutral", "{}")
+        session_id = database.create_chat_session(user_id, log_id)
+        database.save_chat_message(session_id, "user", "hello")
+        database.create_appointment(user_id, "2025-01-01", "10:00")
+
+        conn = database.get_connection()
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            database.get_user("plan-check")
+            database.get_user_mood_history("plan-check")
+            database.get_mood_history_page(user_id, 20)
+            database.get_mood_history_page(user_id, 20, before_id=log_id, since="2025-01-01", until="2025-12-31")
+            database.get_latest_mood_log("plan-check")
+            database.get_mood_log(user_id, log_id)
+            database.get_chat_session(session_id)
+            database.get_session_latest_mood_log_id(session_id)
+            database.get_session_messages(session_id)
+            database.get_recent_session_messages(session_id, 0, 12)
+            database.get_session_messages_after(session_id, 0)
+            database.save_session_summary(session_id, "summary", 1)
+            database.get_user_chat_sessions("plan-check")
+            database.get_user_appointments("plan-check")
+            database.get_mood_daily_counts(user_id, "2025-01-01", "2025-01-07")
+            database.end_chat_session(session_id)
+        finally:
+            conn.set_trace_callback(None)
+
+        queries = [s for s in statements if s.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE"))]
+        return find_full_scans(conn, queries)
+
+
+if __name__ == "__main__":
+    # python migrations.py --check-plans
+    if "--check-plans" in sys.argv:
+        problems = check_query_plans()
+        for statement, plan in problems.items():
+            print(f"Full scan or sort in:\n{statement.strip()}\n  plan: {plan}\n")
+        if problems:
+            sys.exit(1)
+        print("All hot-path queries use indexes.")
@@ -1,9 +1,13 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 
+# Ollama keep_alive: a duration ("30m", "1h30m", "90s") or seconds ("-1" keeps the model loaded)
+KEEP_ALIVE_PATTERN = r"^(-?\d+|(\d+(\.\d+)?(ms|s|m|h))+)$"
+
 class StartChatRequest(BaseModel):
     username: str
     mood_log_id: int
+    keep_alive: Optional[str] = Field(None, pattern=KEEP_ALIVE_PATTERN)  # default: CHAT_KEEP_ALIVE
 
 class StartChatResponse(BaseModel):
     session_id: int
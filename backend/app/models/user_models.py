@@ -30,4 +30,5 @@ class MoodHistoryItem(BaseModel):
 class MoodHistoryResponse(BaseModel):
     username: str
     total_entries: int
-    history: List[MoodHistoryItem]
\ No newline at end of file
+    history: List[MoodHistoryItem]
+    next_before_id: Optional[int] = None  # pass as before_id for the next page
\ No newline at end of file
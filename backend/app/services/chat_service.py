@@ -0,0 +1,114 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from database import get_chat_session, get_recent_session_messages, get_session_messages_after, save_session_summary
+from LLM_logic_for_psychiatrist import summarize_conversation
+from utils.config import settings
+from utils.executor import run_db
+
+# Conversation context for psychiatrist chats. Each turn sends the session's
+# rolling summary plus the most recent messages verbatim, within
+# CHAT_CONTEXT_TOKEN_BUDGET and CHAT_RECENT_TURNS. Older messages are folded
+# into the summary in the background, so prompt size stays flat however long
+# a session runs, and resuming a session only reads the recent rows.
+
+_refresh_tasks: Dict[int, asyncio.Task] = {}
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Rough token count, about four characters per token."""
+    return len(text) // 4 + 1 if text else 0
+
+
+def select_recent(messages: List[Dict], token_budget: int, max_messages: int) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Split messages (oldest first) into the newest ones that fit the budget
+    and the older rest. The newest message is always kept.
+    """
+    kept = []
+    used = 0
+    for msg in reversed(messages):
+        cost = estimate_tokens(msg["content"])
+        if kept and (len(kept) >= max_messages or used + cost > token_budget):
+            break
+        kept.append(msg)
+        used += cost
+    kept.reverse()
+    return kept, messages[:len(messages) - len(kept)]
+
+
+def load_conversation(session: Dict) -> Dict:
+    """
+    Summary and recent messages for a session's next turn (sync, run via
+    run_db). Messages past the window that the summary does not cover yet
+    are left out until the background refresh folds them in.
+    """
+    summary = session.get("summary")
+    budget = settings.CHAT_CONTEXT_TOKEN_BUDGET - estimate_tokens(summary)
+    max_messages = settings.CHAT_RECENT_TURNS * 2
+
+    # One extra row tells us whether anything older is still unsummarized
+    messages = get_recent_session_messages(session["id"], session["summary_upto_message_id"], max_messages + 1)
+    recent, older = select_recent(messages, budget, max_messages)
+
+    return {
+        "summary": summary,
+        "messages": recent,
+        # This turn adds a user message and a reply
+        "needs_summary": bool(older) or len(recent) + 2 > max_messages
+    }
+
+
+async def refresh_summary(session_id: int) -> bool:
+    """
+    Fold everything but the newest half-window of messages into the session
+    summary. Folding down to half the window means a refresh is needed only
+    every few turns. Returns True if a new summary was stored.
+    """
+    session = await run_db(get_chat_session, session_id)
+    if session is None:
+        return False
+
+    messages = await run_db(get_session_messages_after, session_id, session["summary_upto_message_id"])
+    budget = settings.CHAT_CONTEXT_TOKEN_BUDGET - estimate_tokens(session["summary"])
+    _, older = select_recent(messages, budget // 2, max(settings.CHAT_RECENT_TURNS, 1))
+    if not older:
+        return False
+
+    summary = await summarize_conversation(session["summary"], older)
+    if not summary:
+        return False
+    return await run_db(save_session_summary, session_id, summary, older[-1]["id"])
+
+
+async def _run_refresh(session_id: int):
+    try:
+        await refresh_summary(session_id)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        print(f"⚠️  Summary refresh failed for session {session_id}: {e}")
+
+
+def schedule_summary_refresh(session_id: int):
+    """Refresh a session's summary in the background, one refresh per session at a time."""
+    task = _refresh_tasks.get(session_id)
+    if task is not None and not task.done():
+        return
+
+    task = asyncio.get_running_loop().create_task(_run_refresh(session_id))
+    _refresh_tasks[session_id] = task
+
+    def forget(done: asyncio.Task):
+        if _refresh_tasks.get(session_id) is done:
+            del _refresh_tasks[session_id]
+
+    task.add_done_callback(forget)
+
+
+async def cancel_summary_refreshes():
+    """Cancel pending refreshes on shutdown; they are redone on the next turn."""
+    tasks = list(_refresh_tasks.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _refresh_tasks.clear()
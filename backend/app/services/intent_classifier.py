@@ -0,0 +1,260 @@
+"""
+Lightweight intent classifier for the chatbot, in pure NumPy.
+
+Messages are hashed into a fixed number of character n-gram and word
+features, plus one-hot features for the intent the keyword matcher picks
+in its pattern pass and in its keyword pass. A softmax (multinomial
+logistic regression) layer trained from the CHATBOT_INTENTS patterns plus
+data/intent_corpus.json scores a whole batch with one matrix multiply. A temperature fitted on held-out examples
+calibrates the probabilities, which are what the chatbot reports as
+confidence.
+
+The model is saved as an uncompressed .npz and memory-mapped on load.
+
+    python -m services.intent_classifier train
+    python -m services.intent_classifier predict "I can't sleep at night"
+"""
+import json
+import os
+import re
+import zipfile
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_MODEL_PATH = os.path.join(APP_DIR, "data", "intent_model.npz")
+DEFAULT_CORPUS_PATH = os.path.join(APP_DIR, "data", "intent_corpus.json")
+
+GENERAL_INTENT = "general"
+HASH_DIM = 2048
+NGRAM_SIZES = (2, 3, 4)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def message_features(message: str, dim: int = HASH_DIM) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed feature columns and log-scaled, L2-normalised weights for one message."""
+    text = f" {' '.join(message.lower().split())} "
+    grams = [text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)]
+    grams.extend("w:" + word for word in _WORD_RE.findall(text))
+    if not grams:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+    columns = np.fromiter((zlib.crc32(g.encode("utf-8")) % dim for g in grams), dtype=np.int64, count=len(grams))
+    columns, counts = np.unique(columns, return_counts=True)
+    weights = np.log1p(counts).astype(np.float32)
+    weights /= np.linalg.norm(weights)
+    return columns, weights
+
+
+def featurize(messages: List[str], matcher, dim: int = HASH_DIM) -> np.ndarray:
+    """
+    Dense feature matrix for a batch: dim hashed columns, then one column
+    per intent for a pattern-pass hit and one per intent for a keyword-pass
+    hit from the IntentMatcher.
+    """
+    n_intents = len(matcher.intent_names)
+    features = np.zeros((len(messages), dim + 2 * n_intents), dtype=np.float32)
+    for row, message in enumerate(messages):
+        columns, weights = message_features(message, dim)
+        features[row, columns] = weights
+        pattern_index, keyword_index = matcher.match(message)
+        if pattern_index is not None:
+            features[row, dim + pattern_index] = 1.0
+        elif keyword_index is not None:
+            features[row, dim + n_intents + keyword_index] = 1.0
+    return features
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class IntentClassifier:
+    """Softmax regression over hashed and matcher features with a calibration temperature."""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray, classes: List[str],
+                 temperature: float, match_intents: List[str], matcher):
+        self.weights = weights          # (features, classes)
+        self.bias = bias                # (classes,)
+        self.classes = list(classes)
+        self.temperature = float(temperature)
+        self.match_intents = list(match_intents)  # matcher intent order at training time
+        self.matcher = matcher
+        self.dim = weights.shape[0] - 2 * len(self.match_intents)
+
+    def predict_proba(self, messages: List[str]) -> np.ndarray:
+        """Calibrated class probabilities, shape (len(messages), len(classes))."""
+        logits = featurize(messages, self.matcher, self.dim) @ self.weights + self.bias
+        return softmax(logits / self.temperature)
+
+    def classify_batch(self, messages: List[str]) -> List[Tuple[str, float]]:
+        probs = self.predict_proba(messages)
+        best = probs.argmax(axis=1)
+        return [(self.classes[i], float(probs[row, i])) for row, i in enumerate(best)]
+
+    def save(self, path: str):
+        """Write an uncompressed .npz so load() can memory-map the arrays."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(
+            path,
+            weights=self.weights.astype(np.float32),
+            bias=self.bias.astype(np.float32),
+            classes=np.array(self.classes),
+            temperature=np.array(self.temperature, dtype=np.float32),
+            match_intents=np.array(self.match_intents)
+        )
+
+    @classmethod
+    def load(cls, path: str, matcher) -> "IntentClassifier":
+        arrays = load_npz_mmap(path)
+        return cls(arrays["weights"], arrays["bias"], [str(c) for c in arrays["classes"]],
+                   float(arrays["temperature"]), [str(i) for i in arrays["match_intents"]], matcher)
+
+
+def load_npz_mmap(path: str) -> Dict[str, np.ndarray]:
+    """
+    Memory-map every array in an uncompressed .npz. np.load(mmap_mode=...)
+    ignores the mode for .npz files, so this finds each member's offset in
+    the zip and maps the .npy payload directly.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {info.filename} is compressed and cannot be memory-mapped")
+            # Local file header: 30 fixed bytes, then the name and extra field
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = np.frombuffer(f.read(4), dtype="<u2")
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+
+            version = np.lib.format.read_magic(f)
+            read_header = (np.lib.format.read_array_header_1_0 if version == (1, 0)
+                           else np.lib.format.read_array_header_2_0)
+            shape, fortran_order, dtype = read_header(f)
+            name = info.filename[:-len(".npy")]
+            if dtype.hasobject:
+                raise ValueError(f"{path}: {name} holds Python objects")
+            if not shape:
+                arrays[name] = np.frombuffer(f.read(dtype.itemsize), dtype=dtype)[0]
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                     order="F" if fortran_order else "C")
+    return arrays
+
+
+# ============== TRAINING ==============
+
+def pattern_examples(intents: Dict[str, Dict]) -> List[Tuple[str, str]]:
+    """Turn regex patterns into plain training phrases (\\bhi\\b -> "hi")."""
+    examples = []
+    for intent, data in intents.items():
+        for pattern in data["patterns"]:
+            text = re.sub(r"\\b", "", pattern)
+            text = re.sub(r"[^\w\s']", "", text).strip()
+            if text:
+                examples.append((text, intent))
+    return examples
+
+
+def load_training_data(intents: Dict[str, Dict], corpus_path: str = DEFAULT_CORPUS_PATH) -> List[Tuple[str, str]]:
+    examples = pattern_examples(intents)
+    with open(corpus_path, encoding="utf-8") as f:
+        corpus = json.load(f)
+    for intent, messages in corpus.items():
+        examples.extend((message, intent) for message in messages)
+    return examples
+
+
+def fit_softmax(features: np.ndarray, labels: np.ndarray, n_classes: int,
+                epochs: int = 400, learning_rate: float = 2.0, l2: float = 1e-4) -> Tuple[np.ndarray, np.ndarray]:
+    """Full-batch gradient descent on cross-entropy with L2 regularisation."""
+    n, dim = features.shape
+    weights = np.zeros((dim, n_classes), dtype=np.float32)
+    bias = np.zeros(n_classes, dtype=np.float32)
+    targets = np.eye(n_classes, dtype=np.float32)[labels]
+
+    for _ in range(epochs):
+        probs = softmax(features @ weights + bias)
+        error = (probs - targets) / n
+        weights -= learning_rate * (features.T @ error + l2 * weights)
+        bias -= learning_rate * error.sum(axis=0)
+    return weights, bias
+
+
+def fit_temperature(logits: np.ndarray, labels: np.ndarray) -> float:
+    """Temperature minimising held-out negative log-likelihood (grid search)."""
+    best_t, best_nll = 1.0, np.inf
+    for t in np.linspace(0.25, 5.0, 96):
+        probs = softmax(logits / t)
+        nll = -np.log(probs[np.arange(len(labels)), labels] + 1e-12).mean()
+        if nll < best_nll:
+            best_t, best_nll = float(t), nll
+    return best_t
+
+
+def train(intents: Dict[str, Dict], matcher, corpus_path: str = DEFAULT_CORPUS_PATH,
+          holdout_every: int = 5) -> Tuple[IntentClassifier, Dict]:
+    """
+    Train on the patterns and corpus. Every holdout_every-th example is held
+    out to fit the temperature and report accuracy, then the final weights
+    are trained on everything.
+    """
+    examples = load_training_data(intents, corpus_path)
+    classes = list(intents) + [GENERAL_INTENT]
+    index = {name: i for i, name in enumerate(classes)}
+
+    features = featurize([text for text, _ in examples], matcher)
+    labels = np.array([index[intent] for _, intent in examples])
+    holdout = np.arange(len(examples)) % holdout_every == holdout_every - 1
+
+    weights, bias = fit_softmax(features[~holdout], labels[~holdout], len(classes))
+    holdout_logits = features[holdout] @ weights + bias
+    temperature = fit_temperature(holdout_logits, labels[holdout])
+    holdout_accuracy = float((holdout_logits.argmax(axis=1) == labels[holdout]).mean())
+
+    weights, bias = fit_softmax(features, labels, len(classes))
+    report = {
+        "examples": len(examples),
+        "classes": classes,
+        "holdout_accuracy": round(holdout_accuracy, 4),
+        "temperature": round(temperature, 4),
+    }
+    return IntentClassifier(weights, bias, classes, temperature, matcher.intent_names, matcher), report
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    sys.path.insert(0, APP_DIR)
+    parser = argparse.ArgumentParser(description="Train or query the chatbot intent classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train_cmd = commands.add_parser("train", help="train from CHATBOT_INTENTS and the corpus")
+    train_cmd.add_argument("--corpus", default=DEFAULT_CORPUS_PATH)
+    train_cmd.add_argument("--out", default=DEFAULT_MODEL_PATH)
+    predict_cmd = commands.add_parser("predict", help="classify messages with the saved model")
+    predict_cmd.add_argument("messages", nargs="+")
+    predict_cmd.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        from services.intent_service import CHATBOT_INTENTS, intent_matcher
+        model, report = train(CHATBOT_INTENTS, intent_matcher, args.corpus)
+        model.save(args.out)
+        print(json.dumps(report, indent=2))
+        print(f"Saved {args.out} ({os.path.getsize(args.out)} bytes)")
+    else:
+        from services.intent_service import intent_matcher
+        model = IntentClassifier.load(args.model, intent_matcher)
+        start = time.perf_counter()
+        results = model.classify_batch(args.messages)
+        elapsed = time.perf_counter() - start
+        for message, (intent, confidence) in zip(args.messages, results):
+            print(f"{intent:10s} {confidence:.3f}  {message}")
+        print(f"{elapsed / len(args.messages) * 1e6:.1f}us per message")
@@ -0,0 +1,316 @@
+import random
+import re
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from utils.config import settings
+
+if TYPE_CHECKING:
+    from services.intent_classifier import IntentClassifier
+
+CHATBOT_INTENTS = {
+    "greeting": {
+        "patterns": [r"\bhi\b", r"\bhello\b", r"\bhey\b", r"assalam"],
+        "responses": [
+            "Hello! How can I support you today?",
+            "Hey there! What's on your mind?",
+            "Hi! I'm here to help whenever you're ready."
+        ]
+    },
+    "sadness": {
+        "patterns": [r"\bsad\b", r"\bdepressed\b", r"\bdown\b", r"\bunhappy\b"],
+        "responses": [
+            "I'm really sorry you're feeling this way. Want to share what's troubling you?",
+            "That sounds hard… I'm here for you. What happened?",
+            "It's okay to feel this way. Tell me more, I'm listening."
+        ]
+    },
+    "anxiety": {
+        "patterns": [r"\banxious\b", r"\banxiety\b", r"\bscared\b", r"\bworried\b"],
+        "responses": [
+            "Anxiety can be overwhelming. Do you know what triggered it?",
+            "You're safe. Let's work through this. What are you worried about?",
+            "Take a breath… I'm right here. Want to talk about what's making you anxious?"
+        ]
+    },
+    "stress": {
+        "patterns": [r"\bstress\b", r"\bstressed\b", r"\boverwhelmed\b", r"\bpressure\b"],
+        "responses": [
+            "Stress can feel overwhelming. Let's break this down together.",
+            "I hear you're feeling stressed. What's causing the most pressure right now?",
+            "Stress is tough. Would it help to talk about what's overwhelming you?"
+        ]
+    },
+    "sleep": {
+        "patterns": [r"\bsleep\b", r"\btired\b", r"\binsomnia\b", r"\bexhausted\b"],
+        "responses": [
+            "Sleep issues can really affect your wellbeing. How's your sleep been lately?",
+            "Feeling tired can make everything harder. Are you getting enough rest?",
+            "Sleep is so important for mental health. What's your sleep pattern been like?"
+        ]
+    },
+    "goodbye": {
+        "patterns": [r"\bbye\b", r"\bgoodbye\b", r"\bsee you\b", r"\bgood night\b"],
+        "responses": [
+            "Take care! I'm always here if you need me.",
+            "Goodbye! Remember, you're doing your best.",
+            "See you soon. Stay strong!"
+        ]
+    }
+}
+
+
+_REGEX_SPECIAL = set(".^$*+?{}[]\\|()")
+
+
+class _Automaton:
+    """
+    Aho-Corasick automaton over literal strings. scan() yields
+    (end_index, payload) for every occurrence in one left-to-right pass,
+    so the cost depends on the text length, not the number of literals.
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List] = [[]]
+
+    def add(self, literal: str, payload):
+        node = 0
+        for ch in literal:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(payload)
+
+    def build(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+        return self
+
+    def scan(self, text: str):
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for payload in out[node]:
+                    yield i, payload
+
+
+def _is_word(text: str, i: int) -> bool:
+    return 0 <= i < len(text) and (text[i].isalnum() or text[i] == "_")
+
+
+def _split_literal(pattern: str) -> Optional[Tuple[str, bool, bool]]:
+    """(literal, leading \\b, trailing \\b) for plain ASCII patterns, else None."""
+    lead = pattern.startswith(r"\b")
+    trail = pattern.endswith(r"\b") and len(pattern) > 2 + 2 * lead
+    literal = pattern[2 if lead else 0:len(pattern) - 2 if trail else len(pattern)]
+    if not literal or not literal.isascii() or any(ch in _REGEX_SPECIAL for ch in literal):
+        return None
+    return literal.lower(), lead, trail
+
+
+class IntentMatcher:
+    """
+    CHATBOT_INTENTS compiled once into matchers that find the winning
+    intent in a single scan of the message.
+
+    Plain patterns (a literal with optional \\b at either end) go into an
+    Aho-Corasick automaton, with the word boundaries checked at each hit;
+    anything else goes into one combined regex where each intent is a named
+    group inside a zero-width lookahead, in intent order. The lowest intent
+    index found is exactly what looping intents then patterns with re.search
+    returns. Non-ASCII messages use a combined regex of every pattern so
+    IGNORECASE keeps its Unicode case folding. The keyword pass runs the
+    punctuation-stripped patterns through a second automaton as literal,
+    case-sensitive substrings.
+    """
+
+    def __init__(self, intents: Dict[str, Dict]):
+        self.intent_names = list(intents)
+        self.pattern_count = sum(len(data["patterns"]) for data in intents.values())
+
+        self._literals = _Automaton()
+        self._keywords = _Automaton()
+        all_groups = []
+        residual_groups = []
+
+        for index, data in enumerate(intents.values()):
+            residual = []
+            for pattern in data["patterns"]:
+                split = _split_literal(pattern)
+                if split is None:
+                    residual.append(pattern)
+                else:
+                    literal, lead, trail = split
+                    self._literals.add(literal, (index, len(literal), lead, trail))
+
+                keyword = re.sub(r"[^\w\s]", "", pattern).strip()
+                if keyword:
+                    self._keywords.add(keyword, index)
+
+            if data["patterns"]:
+                all_groups.append(self._group(index, data["patterns"]))
+            if residual:
+                residual_groups.append(self._group(index, residual))
+
+        self._literals.build()
+        self._keywords.build()
+        self._residual_regex = self._combine(residual_groups)
+        self._unicode_regex = self._combine(all_groups)
+
+    @staticmethod
+    def _group(index: int, patterns: List[str]) -> str:
+        return f"(?P<i{index}>{'|'.join(f'(?:{pattern})' for pattern in patterns)})"
+
+    @staticmethod
+    def _combine(groups: List[str]) -> Optional["re.Pattern"]:
+        if not groups:
+            return None
+        return re.compile(f"(?=(?:{'|'.join(groups)}))", re.IGNORECASE)
+
+    @staticmethod
+    def _earliest_regex(regex: Optional["re.Pattern"], message: str, best: Optional[int]) -> Optional[int]:
+        if regex is None:
+            return best
+        for match in regex.finditer(message):
+            index = int(match.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return best
+
+    def _earliest_pattern(self, message: str) -> Optional[int]:
+        if not message.isascii():
+            return self._earliest_regex(self._unicode_regex, message, None)
+
+        best = None
+        for end, (index, length, lead, trail) in self._literals.scan(message):
+            if best is not None and index >= best:
+                continue
+            start = end - length + 1
+            if lead and _is_word(message, start - 1) == _is_word(message, start):
+                continue
+            if trail and _is_word(message, end) == _is_word(message, end + 1):
+                continue
+            best = index
+            if best == 0:
+                return best
+        return self._earliest_regex(self._residual_regex, message, best)
+
+    def _earliest_keyword(self, message: str) -> Optional[int]:
+        best = None
+        for _, index in self._keywords.scan(message):
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return best
+
+    def match(self, message: str) -> Tuple[Optional[int], Optional[int]]:
+        """(intent index from the pattern pass, intent index from the keyword pass)"""
+        message = message.lower()
+
+        index = self._earliest_pattern(message)
+        if index is not None:
+            return index, None
+        return None, self._earliest_keyword(message)
+
+    def classify(self, message: str) -> Tuple[str, float]:
+        pattern_index, keyword_index = self.match(message)
+        if pattern_index is not None:
+            return self.intent_names[pattern_index], 0.9
+        if keyword_index is not None:
+            return self.intent_names[keyword_index], 0.6
+        return "general", 0.3
+
+
+intent_matcher = IntentMatcher(CHATBOT_INTENTS)
+
+
+def load_intent_classifier(path: str) -> Optional["IntentClassifier"]:
+    from services.intent_classifier import IntentClassifier
+    try:
+        classifier = IntentClassifier.load(path, intent_matcher)
+    except (OSError, KeyError, ValueError) as e:
+        print(f"⚠️  Intent model unavailable ({e}); using keyword matching only")
+        return None
+    if classifier.match_intents != intent_matcher.intent_names:
+        print("⚠️  Intent model was trained on a different CHATBOT_INTENTS; retrain it "
+              "(python -m services.intent_classifier train). Using keyword matching only")
+        return None
+    return classifier
+
+
+_NOT_LOADED = object()
+_intent_classifier = _NOT_LOADED
+_intent_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier() -> Optional["IntentClassifier"]:
+    """
+    The intent model, loaded on first use (None if it is unavailable).
+    Loading imports NumPy, which is kept off the import path of the app.
+    """
+    global _intent_classifier
+    if _intent_classifier is _NOT_LOADED:
+        with _intent_classifier_lock:
+            if _intent_classifier is _NOT_LOADED:
+                from services.intent_classifier import DEFAULT_MODEL_PATH
+                _intent_classifier = load_intent_classifier(settings.INTENT_MODEL_PATH or DEFAULT_MODEL_PATH)
+    return _intent_classifier
+
+
+def classify_chatbot_intents(messages: List[str]) -> List[Tuple[str, float]]:
+    """
+    Classify a batch of messages with one pass of the intent model. The
+    keyword matcher's hits are model features, and confidences are the
+    model's calibrated probabilities. Without a model the matcher's fixed
+    0.9/0.6/0.3 confidences are used.
+    """
+    classifier = get_intent_classifier()
+    if classifier is None:
+        return [intent_matcher.classify(message) for message in messages]
+    return [(intent, round(confidence, 4)) for intent, confidence in classifier.classify_batch(messages)]
+
+
+def classify_chatbot_intent(message: str) -> Tuple[str, float]:
+    """Intent and calibrated confidence for one message"""
+    return classify_chatbot_intents([message])[0]
+
+
+def generate_chatbot_reply(intent: str, user_message: str) -> str:
+    """Generate response based on intent"""
+    if intent in CHATBOT_INTENTS:
+        return random.choice(CHATBOT_INTENTS[intent]["responses"])
+    
+    fallback_responses = [
+        "I understand... please tell me more about how you're feeling.",
+        "Thank you for sharing that with me. Would you like to explore this further?",
+        "I'm listening carefully. Could you tell me more about what's on your mind?",
+    ]
+    return random.choice(fallback_responses)
+
+
+def triage_messages(messages: List[str]) -> List[Tuple[str, float, str]]:
+    """(intent, confidence, reply) for each message, classified as one batch"""
+    return [
+        (intent, confidence, generate_chatbot_reply(intent, message))
+        for message, (intent, confidence) in zip(messages, classify_chatbot_intents(messages))
+    ]
@@ -0,0 +1,167 @@
+import asyncio
+import csv
+import io
+import json
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from database import get_users, save_mood_logs_bulk
+from services.mood_service import normalize_answers, resolve_mood, serialize_answers
+from utils.config import settings
+from utils.executor import run_db
+
+# Bulk questionnaire ingestion for partner clinics. Rows carry a username
+# and answers shaped like "input for mood detection.json". Identical answer
+# sets are resolved once, mood detection runs with bounded concurrency, and
+# every mood_logs row of the batch is written in one transaction.
+
+
+def parse_row(row) -> Tuple[Optional[str], Optional[Dict[str, str]], Optional[str]]:
+    """
+    Validate one row: {"username": ..., "answers": {...}} or a flat
+    {"username": ..., "q1": ..., ...} mapping (CSV rows).
+    Returns (username, answers, error).
+    """
+    if isinstance(row, ValueError):
+        return None, None, str(row)
+    if not isinstance(row, dict):
+        return None, None, "Expected an object with username and answers"
+
+    username = row.get("username")
+    if not isinstance(username, str) or not username.strip():
+        return None, None, "Missing username"
+
+    answers = row.get("answers")
+    if answers is None:
+        answers = {k: v for k, v in row.items() if k != "username" and v not in (None, "")}
+    if not isinstance(answers, dict) or not answers:
+        return username.strip(), None, "Missing answers"
+    if not all(isinstance(v, str) for v in answers.values()):
+        return username.strip(), None, "Answers must be strings"
+    return username.strip(), normalize_answers(answers), None
+
+
+def parse_jsonl(lines: Iterable) -> List:
+    """Parse JSONL lines; invalid lines become ValueError rows."""
+    rows = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            rows.append(ValueError(f"Invalid JSON line: {e}"))
+    return rows
+
+
+def parse_csv(text: str) -> List[Dict]:
+    """Parse CSV with a username column and one column per question."""
+    return [
+        {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+        for row in csv.DictReader(io.StringIO(text))
+    ]
+
+
+def answers_key(answers: Dict[str, str]) -> str:
+    return json.dumps(answers, sort_keys=True)
+
+
+async def ingest_questionnaires(rows: List, concurrency: Optional[int] = None,
+                                dry_run: bool = False) -> AsyncIterator[Dict]:
+    """
+    Resolve moods for many questionnaire rows and store them.
+
+    Yields one {"row": i, ...} result per row as its answer set resolves
+    (rows sharing an answer set finish together), then a final
+    {"summary": ...} once the batch's mood logs are committed. Rows with bad
+    input or an unknown user get an "error" and are not saved.
+    """
+    concurrency = concurrency or settings.MOOD_BATCH_CONCURRENCY
+    parsed = [parse_row(row) for row in rows]
+    users = await run_db(get_users, [username for username, answers, error in parsed if error is None])
+
+    groups: Dict[str, List[int]] = {}  # answers key -> row indexes
+    answer_sets: Dict[str, Dict[str, str]] = {}
+    failed = 0
+    for index, (username, answers, error) in enumerate(parsed):
+        if error is None and username not in users:
+            error = "User not found"
+        if error is not None:
+            failed += 1
+            yield {"row": index, "username": username, "error": error}
+            continue
+        key = answers_key(answers)
+        groups.setdefault(key, []).append(index)
+        answer_sets[key] = answers
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def resolve(key: str):
+        async with semaphore:
+            try:
+                mood, source = await resolve_mood(answer_sets[key])
+            except Exception as e:
+                return key, None, str(e)
+        return key, (mood or "Neutral", source), None
+
+    entries = []   # (user_id, mood, answers) for the bulk insert
+    sources = {}
+    for done in asyncio.as_completed([resolve(key) for key in groups]):
+        key, resolved, error = await done
+        for index in groups[key]:
+            username = parsed[index][0]
+            if error is not None:
+                failed += 1
+                yield {"row": index, "username": username, "error": f"Mood detection error: {error}"}
+                continue
+            mood, source = resolved
+            sources[source] = sources.get(source, 0) + 1
+            entries.append((users[username]["id"], mood, serialize_answers(answer_sets[key])))
+            yield {"row": index, "username": username, "mood": mood, "source": source}
+
+    summary = {
+        "rows": len(rows),
+        "unique_answer_sets": len(groups),
+        "resolved": len(entries),
+        "failed": failed,
+        "sources": sources,
+        "saved": 0,
+    }
+    if entries and not dry_run:
+        try:
+            summary["saved"] = len(await run_db(save_mood_logs_bulk, entries))
+        except Exception as e:
+            summary["error"] = f"Saving mood logs failed, nothing was stored: {e}"
+    yield {"summary": summary}
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    # python -m services.mood_batch questionnaires.jsonl [--concurrency 8] [--dry-run]
+    # python -m services.mood_batch questionnaires.csv
+    parser = argparse.ArgumentParser(description="Ingest completed questionnaires from JSONL or CSV")
+    parser.add_argument("path", help="JSONL or CSV file, or - for JSONL on stdin")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None,
+                        help="input format (default: from the file extension)")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="resolve moods without saving")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.lower().endswith(".csv") else "jsonl")
+    if args.path == "-":
+        text = sys.stdin.read()
+    else:
+        with open(args.path, encoding="utf-8-sig", newline="") as f:
+            text = f.read()
+    rows = parse_csv(text) if fmt == "csv" else parse_jsonl(text.splitlines())
+
+    async def main():
+        from utils.ollama_client import close_client
+        try:
+            async for result in ingest_questionnaires(rows, args.concurrency, args.dry_run):
+                print(json.dumps(result), flush=True)
+        finally:
+            await close_client()
+
+    asyncio.run(main())
@@ -0,0 +1,270 @@
+import functools
+import json
+from typing import Dict, List, Optional, Tuple
+
+from LLM_logic_for_mood_detection import query_mood_model
+from prompt_for_mood_detection import system_prompt
+from utils.admission import AdmissionRejected
+from utils.config import settings
+
+# Native implementation of the scoring table, decision tree and override
+# rules spelled out in prompt_for_mood_detection.system_prompt.
+
+MOODS = ["Happy/Calm", "Neutral", "Stressed", "Depressed/Low", "Tired/Exhausted"]
+QUESTIONS = [f"q{i}" for i in range(1, 11)]
+LETTERS = "ABCDEF"
+
+MODE_RULES = "rules"
+MODE_HYBRID = "hybrid"
+MODE_LLM = "llm"
+MODES = (MODE_RULES, MODE_HYBRID, MODE_LLM)
+
+# Points per answer letter, per question
+Q1_POINTS = {"F": 2, "A": 2, "B": 0, "C": -2, "D": -2, "E": -2}
+Q2_POINTS = {"F": 2, "D": 2, "B": 0, "A": -2, "C": -2, "E": -2}
+SCALE_POINTS = {"A": 2, "B": 1, "C": -1, "D": -2, "E": -3}
+QUESTION_POINTS = [Q1_POINTS, Q2_POINTS] + [SCALE_POINTS] * 8
+
+# Decision tree thresholds, checked top to bottom: score >= threshold -> mood
+SCORE_THRESHOLDS = [(3, "Happy/Calm"), (0, "Neutral"), (-5, "Stressed"), (-10, "Depressed/Low")]
+LOWEST_MOOD = "Tired/Exhausted"
+
+# Override rules from SPECIAL CASES. The prompt lists them in increasing
+# priority (the last matching rule is the one the model is told to apply),
+# so they are evaluated from the bottom up. "Multiple E answers" counts E
+# on any of the ten questions, Q1/Q2 included.
+STRESS_OVERRIDE = {"q3": "DE", "q4": "DE"}
+LOW_OVERRIDE = {"q5": "E", "q6": "E", "q7": "E", "q10": "E"}
+TIRED_OVERRIDE = {"q7": "E"}
+
+
+class MoodDecision:
+    """Outcome of scoring one answer set."""
+
+    def __init__(self, mood: str, score: int, rule: str, ambiguous: bool):
+        self.mood = mood
+        self.score = score
+        self.rule = rule
+        self.ambiguous = ambiguous
+
+    def to_dict(self) -> Dict:
+        return {"mood": self.mood, "score": self.score, "rule": self.rule, "ambiguous": self.ambiguous}
+
+
+def normalize_answers(answers: Dict[str, str]) -> Dict[str, str]:
+    """Lowercase question keys and uppercase answer letters."""
+    return {str(k).strip().lower(): str(v).strip().upper()[:1] for k, v in answers.items()}
+
+
+def serialize_answers(answers: Dict[str, str]) -> str:
+    """
+    The stored form of an answer set (mood_logs.answers): normalized, with
+    q1..q10 in question order and anything else after them, sorted.
+    """
+    answers = normalize_answers(answers)
+    ordered = {q: answers[q] for q in QUESTIONS if q in answers}
+    ordered.update(sorted((k, v) for k, v in answers.items() if k not in ordered))
+    return json.dumps(ordered)
+
+
+def score_answers(answers: Dict[str, str]) -> int:
+    """Total score as defined in the SCORING SYSTEM section."""
+    answers = normalize_answers(answers)
+    return sum(points.get(answers.get(q, ""), 0) for q, points in zip(QUESTIONS, QUESTION_POINTS))
+
+
+def _matches(answers: Dict[str, str], rule: Dict[str, str]) -> bool:
+    return any(answers.get(q, "") and answers.get(q, "") in letters for q, letters in rule.items())
+
+
+def classify_answers(answers: Dict[str, str]) -> MoodDecision:
+    """
+    Apply the decision tree and override rules to one answer set.
+
+    The decision is flagged ambiguous when answers are missing or invalid,
+    or when override rules pointing at different moods fire together; those
+    are the cases where the prompt does not pin down a single answer.
+    """
+    answers = normalize_answers(answers)
+    score = score_answers(answers)
+
+    complete = all(answers.get(q, "") in points for q, points in zip(QUESTIONS, QUESTION_POINTS))
+    e_count = sum(1 for q in QUESTIONS if answers.get(q) == "E")
+
+    fired = []
+    if _matches(answers, TIRED_OVERRIDE) or e_count > 1:
+        fired.append(("Tired/Exhausted", "override:tired"))
+    if _matches(answers, LOW_OVERRIDE):
+        fired.append(("Depressed/Low", "override:low"))
+    if _matches(answers, STRESS_OVERRIDE):
+        fired.append(("Stressed", "override:stress"))
+
+    if fired:
+        mood, rule = fired[0]
+    else:
+        mood, rule = LOWEST_MOOD, "score"
+        for threshold, threshold_mood in SCORE_THRESHOLDS:
+            if score >= threshold:
+                mood = threshold_mood
+                break
+
+    ambiguous = not complete or len({m for m, _ in fired}) > 1
+    return MoodDecision(mood, score, rule, ambiguous)
+
+
+# ============== BATCH SCORING ==============
+
+_CODE_E = LETTERS.index("E")
+_CODE_D = LETTERS.index("D")
+
+
+@functools.lru_cache(maxsize=None)
+def _score_tables():
+    """
+    (points, valid) lookup tables indexed [question, letter_code]; code
+    len(LETTERS) is "missing/invalid". Built on first batch so importing this
+    module does not pull in NumPy.
+    """
+    import numpy as np
+
+    points = np.zeros((len(QUESTIONS), len(LETTERS) + 1), dtype=np.int16)
+    valid = np.zeros((len(QUESTIONS), len(LETTERS) + 1), dtype=bool)
+    for qi, question_points in enumerate(QUESTION_POINTS):
+        for letter, value in question_points.items():
+            points[qi, LETTERS.index(letter)] = value
+            valid[qi, LETTERS.index(letter)] = True
+    return points, valid
+
+
+def encode_answers(answer_sets: List[Dict[str, str]]):
+    """Encode answer sets into an (n, 10) matrix of letter codes."""
+    import numpy as np
+
+    codes = np.full((len(answer_sets), len(QUESTIONS)), len(LETTERS), dtype=np.int8)
+    for row, answers in enumerate(answer_sets):
+        answers = normalize_answers(answers)
+        for qi, q in enumerate(QUESTIONS):
+            letter = answers.get(q, "")
+            if letter and letter in LETTERS:
+                codes[row, qi] = LETTERS.index(letter)
+    return codes
+
+
+def classify_batch(answer_sets: List[Dict[str, str]]) -> List[MoodDecision]:
+    """Vectorized equivalent of classify_answers over many answer sets."""
+    if not answer_sets:
+        return []
+    import numpy as np
+
+    points_table, valid_table = _score_tables()
+    codes = encode_answers(answer_sets)
+    q_index = np.arange(len(QUESTIONS))
+    scores = points_table[q_index, codes].sum(axis=1)
+    complete = valid_table[q_index, codes].all(axis=1)
+
+    is_e = codes == _CODE_E
+    is_d = codes == _CODE_D
+    tired = is_e[:, 6] | (is_e.sum(axis=1) > 1)
+    low = is_e[:, [4, 5, 6, 9]].any(axis=1)
+    stress = (is_d | is_e)[:, [2, 3]].any(axis=1)
+    distinct_overrides = tired.astype(np.int8) + low + stress
+
+    score_mood = np.select(
+        [scores >= threshold for threshold, _ in SCORE_THRESHOLDS],
+        [MOODS.index(mood) for _, mood in SCORE_THRESHOLDS],
+        default=MOODS.index(LOWEST_MOOD),
+    )
+    mood_index = np.select(
+        [tired, low, stress],
+        [MOODS.index("Tired/Exhausted"), MOODS.index("Depressed/Low"), MOODS.index("Stressed")],
+        default=score_mood,
+    )
+    rule_index = np.select([tired, low, stress], [0, 1, 2], default=3)
+    rules = ["override:tired", "override:low", "override:stress", "score"]
+    ambiguous = ~complete | (distinct_overrides > 1)
+
+    return [
+        MoodDecision(MOODS[m], int(s), rules[r], bool(a))
+        for m, s, r, a in zip(mood_index, scores, rule_index, ambiguous)
+    ]
+
+
+# ============== MODE SWITCH ==============
+
+async def resolve_mood(answers: Dict[str, str], mode: Optional[str] = None,
+                       user_key: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Resolve a mood for one answer set according to the detection mode.
+    user_key names the caller of any LLM call, for per-user fair scheduling.
+
+    Returns (mood, source) where source is "rules" or "llm". In hybrid mode
+    a saturated model (AdmissionRejected) falls back to the rules answer.
+    """
+    mode = mode or settings.MOOD_DETECTION_MODE
+    if mode not in MODES:
+        raise ValueError(f"Unknown mood detection mode: {mode}")
+
+    if mode == MODE_LLM:
+        mood = await query_mood_model(answers, system_prompt, user_key)
+        if mood is not None:
+            return mood, "llm"
+        return classify_answers(answers).mood, "rules"
+
+    decision = classify_answers(answers)
+    if mode == MODE_HYBRID and decision.ambiguous:
+        try:
+            mood = await query_mood_model(answers, system_prompt, user_key)
+        except AdmissionRejected:
+            mood = None  # the LLM only refines; a busy model still leaves the rules answer
+        if mood is not None:
+            return mood, "llm"
+    return decision.mood, "rules"
+
+
+# ============== AGREEMENT REPORT ==============
+
+async def agreement_report(answer_sets: List[Dict[str, str]]) -> Dict:
+    """
+    Compare the rules engine against the LLM on the same answer sets.
+
+    Answer sets the LLM fails on are counted under "llm_errors" and left out
+    of the agreement rate.
+    """
+    decisions = classify_batch(answer_sets)
+    confusion = {rules_mood: {} for rules_mood in MOODS}
+    disagreements = []
+    compared = agreed = llm_errors = 0
+
+    for answers, decision in zip(answer_sets, decisions):
+        llm_mood = await query_mood_model(answers, system_prompt)
+        if llm_mood is None:
+            llm_errors += 1
+            continue
+
+        compared += 1
+        row = confusion[decision.mood]
+        row[llm_mood] = row.get(llm_mood, 0) + 1
+        if llm_mood == decision.mood:
+            agreed += 1
+        else:
+            disagreements.append({"answers": answers, "llm": llm_mood, **decision.to_dict()})
+
+    return {
+        "total": len(answer_sets),
+        "compared": compared,
+        "agreed": agreed,
+        "agreement_rate": round(agreed / compared, 4) if compared else None,
+        "llm_errors": llm_errors,
+        "confusion": confusion,
+        "disagreements": disagreements,
+    }
+
+
+if __name__ == "__main__":
+    import asyncio
+    import sys
+
+    # Usage: python -m services.mood_service answers.jsonl
+    with open(sys.argv[1], encoding="utf-8") as f:
+        sets = [json.loads(line) for line in f if line.strip()]
+    print(json.dumps(asyncio.run(agreement_report(sets)), indent=2))
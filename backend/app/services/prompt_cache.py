@@ -0,0 +1,92 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from database import get_chat_session, get_mood_history_page, get_session_latest_mood_log_id
+from prompt_for_psychiatrist import get_psychiatrist_prompt
+from utils.executor import run_db
+
+# get_psychiatrist_prompt() only looks at the latest 10 mood logs
+PROMPT_HISTORY_ENTRIES = 10
+
+
+class SessionPromptCache:
+    """
+    Psychiatrist system prompts per chat session, keyed by (session_id,
+    latest mood_log id). A session keeps sending a byte-identical system
+    prompt until its user logs a new mood, so the model server can reuse
+    the cached prefix instead of re-evaluating it every turn. Every lookup
+    reads the user's latest mood_log id first (one index probe), so a mood
+    logged by another worker process or the mood_batch CLI is seen too.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+        self._log_by_session: Dict[int, int] = {}  # session_id -> latest_log_id of its entry
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, session_id: int) -> Optional[str]:
+        """System prompt for a session, built from the DB on a miss (sync)."""
+        latest_log_id = get_session_latest_mood_log_id(session_id)
+        if latest_log_id is None:
+            return None
+        key = (session_id, latest_log_id)
+        with self._lock:
+            prompt = self._entries.get(key)
+            if prompt is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return prompt
+
+        session = get_chat_session(session_id)
+        if session is None:
+            return None
+        history = get_mood_history_page(session["user_id"], PROMPT_HISTORY_ENTRIES)
+        if history and history[0]["id"] != latest_log_id:
+            latest_log_id = history[0]["id"]  # another mood log landed in between
+        prompt = get_psychiatrist_prompt(session["mood"], history)
+
+        with self._lock:
+            self.misses += 1
+            self._store(session_id, latest_log_id, prompt)
+        return prompt
+
+    async def aget(self, session_id: int) -> Optional[str]:
+        """get() for async callers, on the DB thread pool."""
+        return await run_db(self.get, session_id)
+
+    def _store(self, session_id: int, latest_log_id: int, prompt: str):
+        previous = self._log_by_session.get(session_id)
+        if previous is not None and previous != latest_log_id:
+            if previous > latest_log_id:
+                return  # built from an older history than the entry already stored
+            del self._entries[(session_id, previous)]
+            self.invalidations += 1
+        self._entries[(session_id, latest_log_id)] = prompt
+        self._entries.move_to_end((session_id, latest_log_id))
+        self._log_by_session[session_id] = latest_log_id
+        while len(self._entries) > self.max_entries:
+            (old_session, _), _ = self._entries.popitem(last=False)
+            del self._log_by_session[old_session]
+
+    def stats(self) -> Dict:
+        # Lookups in this process only; whether Ollama then reused its KV
+        # cache shows in the prompt_eval token counts on /metrics
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+session_prompts = SessionPromptCache()
+
+
+def prompt_cache_stats() -> Dict:
+    return session_prompts.stats()
@@ -1,10 +1,22 @@
-from database import get_user_mood_history, get_user
-from typing import Dict, List
-import json
+from database import (
+    get_user, get_latest_mood_log, get_mood_daily_counts,
+    rebuild_mood_daily_agg, check_mood_daily_agg, PKT
+)
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 
-def generate_weekly_report(username: str) -> Dict:
+DEFAULT_REPORT_DAYS = 7
+
+def report_window(days: int, today: Optional[str] = None) -> (str, str):
+    """First and last day (YYYY-MM-DD, PKT) of a window ending today."""
+    end = datetime.strptime(today, "%Y-%m-%d") if today else datetime.now(PKT)
+    start = end - timedelta(days=days - 1)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+def generate_weekly_report(username: str, days: int = DEFAULT_REPORT_DAYS) -> Dict:
     """
-    Generate a simple weekly report using available mood data
+    Generate a report for the last `days` days from the daily mood aggregates.
+    Only the rows inside the window are read, however long the user's history.
     """
     print(f"Generating report for: {username}")
     
@@ -12,45 +24,48 @@ def generate_weekly_report(username: str) -> Dict:
     if not user:
         raise ValueError("User not found")
     
-    # Get all mood history
-    mood_history = get_user_mood_history(username)
-    print(f"Found {len(mood_history)} mood entries")
-    
-    # Use all available data for the report
-    recent_mood_history = mood_history
+    since_day, until_day = report_window(days)
+    daily_counts = get_mood_daily_counts(user["id"], since_day, until_day)
+    total_entries = sum(row["count"] for row in daily_counts)
+    print(f"Found {total_entries} mood entries between {since_day} and {until_day}")
     
-    # Calculate mood distribution
+    # Calculate mood distribution, most frequent first
     mood_distribution = {}
-    for entry in recent_mood_history:
-        mood = entry['mood']
-        mood_distribution[mood] = mood_distribution.get(mood, 0) + 1
+    for row in daily_counts:
+        mood_distribution[row["mood"]] = mood_distribution.get(row["mood"], 0) + row["count"]
+    mood_distribution = dict(sorted(mood_distribution.items(), key=lambda item: -item[1]))
+    
+    # The latest mood leads the distribution so recommendations follow it
+    latest = get_latest_mood_log(username) if total_entries else None
+    if latest and latest["mood"] in mood_distribution:
+        mood_distribution = {latest["mood"]: mood_distribution.pop(latest["mood"]), **mood_distribution}
     
     # Generate insights based on current mood
     insights = []
-    if recent_mood_history:
-        latest_mood = recent_mood_history[0]['mood']  # Most recent mood
+    if total_entries:
+        latest_mood = next(iter(mood_distribution))
         insights.append(f"Based on your recent assessment, you're feeling {latest_mood}.")
-        insights.append(f"You've completed {len(recent_mood_history)} mood assessment(s) total.")
+        insights.append(f"You've completed {total_entries} mood assessment(s) in the last {days} days.")
         
-        if len(recent_mood_history) > 1:
+        if total_entries > 1:
             insights.append("Regular tracking helps identify patterns in your mental wellbeing.")
         else:
             insights.append("Consider tracking your mood regularly to see patterns over time.")
     else:
-        insights.append("No mood data available yet. Complete an assessment to get insights.")
+        insights.append(f"No mood data in the last {days} days. Complete an assessment to get insights.")
     
     # Generate recommendations based on mood
     recommendations = generate_recommendations(mood_distribution)
     
     # Simple trend calculation
     mood_trend = "New user - establish baseline"
-    if len(recent_mood_history) > 1:
+    if total_entries > 1:
         mood_trend = "Building your mood history"
     
     return {
         "username": username,
-        "period": "Current Session",
-        "total_entries": len(recent_mood_history),
+        "period": f"Last {days} days ({since_day} to {until_day})",
+        "total_entries": total_entries,
         "mood_distribution": mood_distribution,
         "insights": insights,
         "recommendations": recommendations,
@@ -116,4 +131,37 @@ def generate_recommendations(mood_distribution: Dict) -> List[str]:
         "Limit screen time before bed"
     ])
     
-    return recommendations[:4]  # Return top 4 recommendations
\ No newline at end of file
+    return recommendations[:4]  # Return top 4 recommendations
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    import sys
+
+    # python -m services.report_service backfill [--user-id N]
+    # python -m services.report_service check
+    # python -m services.report_service report USERNAME [--days 7]
+    parser = argparse.ArgumentParser(description="Daily mood aggregate maintenance and reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill", help="rebuild mood_daily_agg from mood_logs")
+    backfill.add_argument("--user-id", type=int, default=None)
+    commands.add_parser("check", help="compare mood_daily_agg with mood_logs")
+    report = commands.add_parser("report", help="print a user's report")
+    report.add_argument("username")
+    report.add_argument("--days", type=int, default=DEFAULT_REPORT_DAYS)
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        rows = rebuild_mood_daily_agg(args.user_id)
+        print(f"Rebuilt {rows} aggregate rows")
+    elif args.command == "check":
+        mismatches = check_mood_daily_agg()
+        for mismatch in mismatches:
+            print(json.dumps(mismatch))
+        if mismatches:
+            print(f"{len(mismatches)} aggregate rows disagree with mood_logs; run backfill to repair")
+            sys.exit(1)
+        print("Aggregates match mood_logs.")
+    else:
+        print(json.dumps(generate_weekly_report(args.username, args.days), indent=2))
@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+import threading
+
+import pytest
+
+# Tests import the app modules the way main.py does (flat, from backend/app),
+# and run against a throwaway database rather than the tracked mood_tracker.db.
+# Ollama is the stub from benchmarks/stub_ollama.py, served in-process for the
+# whole session. Settings are read at import time, so the environment is set
+# up before any app module is imported.
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from benchmarks.stub_ollama import StubConfig, StubOllamaHandler, make_server  # noqa: E402
+
+_tmp = tempfile.mkdtemp(prefix="mental-health-tests-")
+_stub = make_server(StubConfig(latency_ms=0, tokens=4, tokens_per_sec=0))
+threading.Thread(target=_stub.serve_forever, daemon=True).start()
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'test.db')}"
+os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{_stub.server_address[1]}/api/chat"
+os.environ.pop("OLLAMA_URLS", None)
+os.environ.setdefault("MOOD_CACHE_PERSIST", "false")
+
+
+@pytest.fixture
+def stub():
+    """Reconfigure the stub Ollama for one test: stub(latency_ms=..., drop_after=...)."""
+    default = StubOllamaHandler.config
+
+    def configure(**kwargs):
+        StubOllamaHandler.config = StubConfig(**{"latency_ms": 0, "tokens": 4, "tokens_per_sec": 0, **kwargs})
+        StubOllamaHandler.stats.reset()
+        return StubOllamaHandler.stats
+
+    yield configure
+    StubOllamaHandler.config = default
+
+
+@pytest.fixture
+def client():
+    """TestClient with the app's lifespan running."""
+    from fastapi.testclient import TestClient
+
+    import main
+
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def start_chat(client):
+    """start_chat(username): sign up, log a mood and open a chat session; returns the session id."""
+
+    def start(username: str) -> int:
+        client.post("/signup", json={"username": username})
+        answers = {"q1": "A"}
+        log_id = client.post("/detect-mood", json={"username": username, "answers": answers}).json()["log_id"]
+        return client.post("/chat/start", json={"username": username, "mood_log_id": log_id}).json()["session_id"]
+
+    return start
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from utils.admission import HIGH, LOW, NORMAL, AdmissionController, AdmissionRejected
+
+# Callers hold their slot until their release event is set, so each test
+# decides exactly when a slot frees up.
+
+
+class Caller:
+    def __init__(self, controller: AdmissionController, name: str, priority: int = NORMAL,
+                 user: str = None, log: list = None):
+        self.name = name
+        self.release = asyncio.Event()
+        self.log = log if log is not None else []
+        self.task = asyncio.get_running_loop().create_task(self._run(controller, priority, user))
+
+    async def _run(self, controller, priority, user):
+        async with controller.slot(priority, user_key=user):
+            self.log.append(self.name)
+            await self.release.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_freed_slot_goes_to_most_urgent_waiter():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=8, queue_timeout=5)
+        log = []
+        holder = Caller(controller, "holder", log=log)
+        await settle()
+        low = Caller(controller, "low", LOW, log=log)
+        normal = Caller(controller, "normal", NORMAL, log=log)
+        high = Caller(controller, "high", HIGH, log=log)
+        await settle()
+        assert controller.stats()["queued_now"] == 3
+
+        for caller in (holder, high, normal, low):
+            caller.release.set()
+            await settle()
+            assert controller.in_flight == (0 if caller is low else 1)
+        await asyncio.gather(holder.task, low.task, normal.task, high.task)
+        return log, controller.stats()
+
+    log, stats = asyncio.run(scenario())
+    assert log == ["holder", "high", "normal", "low"]
+    assert stats["admitted"] == 4
+    assert stats["in_flight"] == 0 and stats["queued_now"] == 0
+
+
+def test_full_queue_sheds_less_urgent_work():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+        holder = Caller(controller, "holder")
+        await settle()
+        low = Caller(controller, "low", LOW)
+        await settle()
+        high = Caller(controller, "high", HIGH)
+        await settle()
+
+        with pytest.raises(AdmissionRejected) as shed:
+            await low.task
+        with pytest.raises(AdmissionRejected) as full:
+            async with controller.slot(NORMAL):
+                pass
+
+        holder.release.set()
+        high.release.set()
+        await asyncio.gather(holder.task, high.task)
+        return shed.value, full.value, controller.stats()
+
+    shed, full, stats = asyncio.run(scenario())
+    assert shed.reason == "shed for other work" and shed.status_code == 503
+    assert full.reason == "queue full" and full.status_code == 503
+    assert stats["shed"] == 1 and stats["rejected_full"] == 1
+    assert stats["in_flight"] == 0 and stats["queued_now"] == 0
+
+
+def test_queue_timeout_rejects_with_retry_after():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+        holder = Caller(controller, "holder")
+        await settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.slot(NORMAL):
+                pass
+        holder.release.set()
+        await holder.task
+        return rejected.value, controller.stats()
+
+    rejected, stats = asyncio.run(scenario())
+    assert rejected.status_code == 503 and rejected.reason == "queue timeout"
+    assert int(rejected.headers["Retry-After"]) >= 1
+    assert stats["rejected_timeout"] == 1
+    assert stats["in_flight"] == 0 and stats["queued_now"] == 0
+
+
+def test_slot_handed_over_at_timeout_is_given_back(monkeypatch):
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=5)
+        holder = Caller(controller, "holder")
+        await settle()
+
+        async def slot_arrives_as_timeout_fires(future, timeout):
+            holder.release.set()
+            await holder.task  # the holder's exit hands its slot to `future`
+            assert future.done() and future.exception() is None
+            raise asyncio.TimeoutError
+
+        monkeypatch.setattr(asyncio, "wait_for", slot_arrives_as_timeout_fires)
+        with pytest.raises(AdmissionRejected):
+            async with controller.slot(NORMAL):
+                pass
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rejected_timeout"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_user_over_rate_limit_gets_429():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=4, max_queue=4, queue_timeout=5,
+                                         user_rate=0.5, user_burst=1)
+        async with controller.slot(NORMAL, user_key="alice"):
+            pass
+        with pytest.raises(AdmissionRejected) as limited:
+            async with controller.slot(NORMAL, user_key="alice"):
+                pass
+        async with controller.slot(NORMAL, user_key="bob"):
+            pass
+        return limited.value, controller.stats()
+
+    limited, stats = asyncio.run(scenario())
+    assert limited.status_code == 429
+    assert limited.headers["Retry-After"] == "2"
+    assert stats["rate_limited"] == 1 and stats["admitted"] == 2
@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from utils import backend_pool
+from utils.backend_pool import CLOSED, HALF_OPEN, OPEN, Backend, BackendPool
+
+
+class Clock:
+    """Stands in for time.monotonic() in backend_pool."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(backend_pool.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_half_opens_and_closes(clock):
+    backend = Backend("http://a", failure_threshold=3, cooldown=10)
+    for _ in range(2):
+        backend.record_failure()
+    assert backend.state == CLOSED and backend.available(clock.now)
+
+    backend.record_failure()
+    assert backend.state == OPEN
+    clock.now += 9.9
+    assert not backend.available(clock.now)
+
+    clock.now += 0.1
+    assert backend.available(clock.now)
+    assert backend.state == HALF_OPEN
+    backend.outstanding = 1
+    assert not backend.available(clock.now)  # one trial request at a time
+    backend.outstanding = 0
+
+    backend.record_success(0.01)
+    assert backend.state == CLOSED and backend.consecutive_failures == 0
+
+
+def test_failed_trial_reopens_breaker(clock):
+    backend = Backend("http://a", failure_threshold=1, cooldown=10)
+    backend.record_failure()
+    clock.now += 10
+    assert backend.available(clock.now) and backend.state == HALF_OPEN
+
+    backend.record_failure()
+    assert backend.state == OPEN and backend.opened_at == clock.now
+    assert not backend.available(clock.now)
+
+
+def test_routing_skips_open_backends_until_all_are_open(clock):
+    pool = BackendPool(["http://a", "http://b"], failure_threshold=1, cooldown=10)
+    a, b = pool.backends
+    a.record_failure()
+    assert all(pool.pick() is b for _ in range(10))
+
+    b.record_failure()
+    b.outstanding = 1
+    assert pool.pick() is a  # nothing available: least loaded anyway
+
+
+def test_failed_call_fails_over_to_another_backend():
+    async def scenario():
+        pool = BackendPool(["http://a", "http://b"], failure_threshold=5)
+        tried = []
+
+        async def fn(backend):
+            tried.append(backend.url)
+            if len(tried) == 1:
+                raise ConnectionError("refused")
+            return backend.url
+
+        return await pool.call(fn), tried, pool
+
+    result, tried, pool = asyncio.run(scenario())
+    assert result == tried[1] != tried[0]
+    assert pool.stats()["failovers"] == 1
+    assert sorted(b.failures for b in pool.backends) == [0, 1]
+
+
+def test_slow_backend_is_hedged_and_loser_cancelled():
+    async def scenario():
+        pool = BackendPool(["http://slow", "http://fast"], hedge_after=0.01)
+        slow, fast = pool.backends
+        slow.latency_ewma, fast.latency_ewma = 0.001, 0.002  # route to the slow one first
+        cancelled = []
+
+        async def fn(backend):
+            if backend is slow:
+                try:
+                    await asyncio.sleep(10)
+                except asyncio.CancelledError:
+                    cancelled.append(backend.url)
+                    raise
+            return backend.url
+
+        result = await pool.call(fn)
+        await asyncio.sleep(0)
+        return result, cancelled, pool
+
+    result, cancelled, pool = asyncio.run(scenario())
+    slow, fast = pool.backends
+    assert result == "http://fast"
+    assert cancelled == ["http://slow"]
+    stats = pool.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    assert slow.failures == 0 and slow.outstanding == 0  # a lost hedge is not a failure
+    assert fast.requests == 1
+
+
+def test_all_attempts_failing_raises_last_error():
+    async def scenario():
+        pool = BackendPool(["http://a", "http://b"])
+
+        async def fn(backend):
+            raise ConnectionError(backend.url)
+
+        await pool.call(fn)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(scenario())
@@ -0,0 +1,42 @@
+import json
+
+import LLM_logic_for_psychiatrist
+from utils.config import settings
+
+
+def capture_payloads(monkeypatch):
+    payloads = []
+
+    async def post_chat(payload, **kwargs):
+        payloads.append(payload)
+        return json.dumps({"message": {"role": "assistant", "content": "Hello there"}, "done": True})
+
+    monkeypatch.setattr(LLM_logic_for_psychiatrist, "post_chat", post_chat)
+    return payloads
+
+
+def test_session_keep_alive_is_sent_on_every_call(client, monkeypatch):
+    payloads = capture_payloads(monkeypatch)
+    client.post("/signup", json={"username": "keeper"})
+    log_id = client.post("/detect-mood", json={"username": "keeper", "answers": {"q1": "A"}}).json()["log_id"]
+
+    started = client.post("/chat/start", json={"username": "keeper", "mood_log_id": log_id, "keep_alive": "2h"})
+    client.post("/chat/message", json={"session_id": started.json()["session_id"], "message": "hi"})
+
+    assert [p["keep_alive"] for p in payloads] == ["2h", "2h"]  # greeting, then the chat turn
+
+
+def test_sessions_without_keep_alive_use_the_default(client, monkeypatch):
+    payloads = capture_payloads(monkeypatch)
+    client.post("/signup", json={"username": "default-keeper"})
+    log_id = client.post("/detect-mood", json={"username": "default-keeper", "answers": {"q1": "A"}}).json()["log_id"]
+
+    started = client.post("/chat/start", json={"username": "default-keeper", "mood_log_id": log_id})
+    client.post("/chat/message", json={"session_id": started.json()["session_id"], "message": "hi"})
+
+    assert [p["keep_alive"] for p in payloads] == [settings.CHAT_KEEP_ALIVE] * 2
+
+
+def test_invalid_keep_alive_is_rejected(client):
+    response = client.post("/chat/start", json={"username": "x", "mood_log_id": 1, "keep_alive": "forever"})
+    assert response.status_code == 422
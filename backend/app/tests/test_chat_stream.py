@@ -0,0 +1,84 @@
+import json
+
+from database import get_session_messages
+
+
+def sse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = "message", None
+        for line in block.splitlines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
+
+def test_complete_stream_is_saved(client, stub, start_chat):
+    session_id = start_chat("stream-ok")
+    stub(tokens=3)
+
+    events = sse_events(client.post("/chat/message/stream", json={"session_id": session_id, "message": "hi"}).text)
+
+    assert [e for e, _ in events] == ["message"] * 3 + ["done"]
+    assert get_session_messages(session_id)[-1]["content"] == events[-1][1]["response"]
+
+
+def test_interrupted_stream_is_an_error_and_not_saved(client, stub, start_chat):
+    session_id = start_chat("stream-cut")
+    before = len(get_session_messages(session_id))
+    stub(tokens=6, drop_after=2)
+
+    events = sse_events(client.post("/chat/message/stream", json={"session_id": session_id, "message": "hi"}).text)
+
+    assert [e for e, _ in events] == ["message", "message", "error"]
+    assert "interrupted" in events[-1][1]["detail"]
+    saved = get_session_messages(session_id)
+    assert [m["role"] for m in saved[before:]] == ["user"]
+
+
+def test_stream_without_done_frame_is_an_error_and_not_saved(client, stub, start_chat):
+    session_id = start_chat("stream-no-done")
+    before = len(get_session_messages(session_id))
+    stub(tokens=3, omit_done=True)
+
+    events = sse_events(client.post("/chat/message/stream", json={"session_id": session_id, "message": "hi"}).text)
+
+    assert [e for e, _ in events] == ["message"] * 3 + ["error"]
+    assert "interrupted" in events[-1][1]["detail"]
+    saved = get_session_messages(session_id)
+    assert [m["role"] for m in saved[before:]] == ["user"]
+
+
+def rate_limit_user(monkeypatch, username):
+    """Leave username with an empty token bucket, so its next LLM call gets a 429."""
+    from utils import ollama_client
+    from utils.fair_scheduler import UserRateLimiter
+
+    limiter = UserRateLimiter(rate=0.001, burst=1)
+    limiter.try_acquire(username)
+    monkeypatch.setattr(ollama_client._admission, "_limiter", limiter)
+
+
+def test_rejected_turn_leaves_no_user_message(client, start_chat, monkeypatch):
+    session_id = start_chat("turn-429")
+    before = get_session_messages(session_id)
+    rate_limit_user(monkeypatch, "turn-429")
+
+    response = client.post("/chat/message", json={"session_id": session_id, "message": "hi"})
+
+    assert response.status_code == 429 and "retry-after" in response.headers
+    assert get_session_messages(session_id) == before
+
+
+def test_rejected_stream_leaves_no_user_message(client, start_chat, monkeypatch):
+    session_id = start_chat("stream-429")
+    before = get_session_messages(session_id)
+    rate_limit_user(monkeypatch, "stream-429")
+
+    events = sse_events(client.post("/chat/message/stream", json={"session_id": session_id, "message": "hi"}).text)
+
+    assert [e for e, _ in events] == ["error"] and events[0][1]["retry_after"] >= 1
+    assert get_session_messages(session_id) == before
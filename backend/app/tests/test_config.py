@@ -0,0 +1,16 @@
+import pytest
+
+from utils import config
+
+
+@pytest.mark.parametrize("name, parse", [
+    ("LLM_QUEUE_TIMEOUT", config._positive_float),
+    ("OLLAMA_READ_TIMEOUT", config._positive_float),
+    ("DB_THREADS", config._positive_int),
+    ("MOOD_BATCH_CONCURRENCY", config._positive_int),
+])
+def test_positive_only_settings_reject_zero(monkeypatch, name, parse):
+    assert parse(name, "3") == 3
+    monkeypatch.setenv(name, "0")
+    with pytest.raises(ValueError, match=name):
+        parse(name, "3")
@@ -0,0 +1,40 @@
+import pytest
+
+import database
+
+
+def test_failed_write_rolls_back_the_shared_connection():
+    user_id = database.create_user("rollback-user")
+
+    def insert_then_fail(cursor):
+        cursor.execute("INSERT INTO mood_logs (user_id, mood, answers) VALUES (?, 'Neutral', '{}')", (user_id,))
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        database._write(insert_then_fail)
+
+    conn = database.get_connection()
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM mood_logs WHERE user_id = ?", (user_id,)).fetchone()[0] == 0
+
+
+def test_session_and_appointment_writes_commit():
+    user_id = database.create_user("session-user")
+    log_id = database.save_mood_log(user_id, "Neutral", "{}")
+
+    session_id = database.create_chat_session(user_id, log_id)
+    database.end_chat_session(session_id)
+    appointment_id = database.create_appointment(user_id, "2026-01-01", "10:00")
+
+    assert not database.get_connection().in_transaction
+    assert database.get_chat_session(session_id)["ended_at"] is not None
+    assert [a["id"] for a in database.get_user_appointments("session-user")] == [appointment_id]
+
+
+def test_only_queries_are_timed():
+    def is_timed(fn):
+        return fn.__code__.co_qualname == "timed.<locals>.wrapper"
+
+    assert is_timed(database.get_user)
+    for name in ("init_db", "close_all_connections", "flush_writes", "open_writes", "use_database_file"):
+        assert not is_timed(getattr(database, name)), name
@@ -0,0 +1,23 @@
+import asyncio
+
+from utils.executor import run_blocking, run_db, shutdown_executors
+
+
+def test_pools_restart_after_shutdown():
+    async def use_pools():
+        return await run_db(lambda: "db"), await run_blocking(lambda: "worker")
+
+    assert asyncio.run(use_pools()) == ("db", "worker")
+    shutdown_executors()
+    assert asyncio.run(use_pools()) == ("db", "worker")  # a second lifespan in the same process
+    shutdown_executors()
+
+
+def test_app_lifespan_runs_twice():
+    from fastapi.testclient import TestClient
+
+    import main
+
+    for attempt in range(2):
+        with TestClient(main.app) as client:
+            assert client.post("/signup", json={"username": f"twice-{attempt}"}).status_code == 200
@@ -0,0 +1,97 @@
+import pytest
+
+from utils import config, fair_scheduler
+from utils.fair_scheduler import FairQueue, UserRateLimiter, parse_weights
+
+
+def drain(queue: FairQueue):
+    order = []
+    while len(queue):
+        order.append(queue.pop().item)
+    return order
+
+
+def test_users_take_turns_within_a_class():
+    queue = FairQueue(quantum=1)
+    for i in range(3):
+        queue.push(1, "heavy", 1, f"heavy{i}")
+    queue.push(1, "light", 1, "light0")
+    assert drain(queue) == ["heavy0", "light0", "heavy1", "heavy2"]
+
+
+def test_priority_classes_are_served_strictly_in_order():
+    queue = FairQueue(quantum=1)
+    queue.push(2, "a", 1, "low")
+    queue.push(1, "a", 1, "normal")
+    queue.push(0, "b", 1, "high")
+    assert drain(queue) == ["high", "normal", "low"]
+
+
+def test_costly_calls_use_up_a_users_share():
+    queue = FairQueue(quantum=100)
+    queue.push(1, "long", 300, "long0")
+    queue.push(1, "long", 300, "long1")
+    for i in range(4):
+        queue.push(1, "short", 100, f"short{i}")
+    # "long" needs three visits' credit per call; "short" is served once per visit
+    assert drain(queue) == ["short0", "short1", "long0", "short2", "short3", "long1"]
+
+
+def test_weights_scale_the_share():
+    queue = FairQueue(quantum=1, weights={"gold": 2})
+    for i in range(4):
+        queue.push(1, "gold", 1, f"gold{i}")
+        queue.push(1, "basic", 1, f"basic{i}")
+    assert drain(queue)[:6] == ["gold0", "gold1", "basic0", "gold2", "gold3", "basic1"]
+
+
+def test_removed_and_shed_entries():
+    queue = FairQueue(quantum=1)
+    a0 = queue.push(1, "a", 1, "a0")
+    queue.push(1, "a", 1, "a1")
+    queue.push(2, "b", 1, "b0")
+    queue.push(2, "c", 1, "c0")
+    queue.push(2, "c", 1, "c1")
+
+    assert queue.shed_candidate().item == "c1"  # least urgent class, heaviest user, newest call
+    assert queue.remove(a0) and not queue.remove(a0)
+    assert queue.waiting_by_user() == {"a": 1, "b": 1, "c": 2}
+    assert drain(queue) == ["a1", "b0", "c0", "c1"]
+
+
+def test_token_bucket_refills_over_time(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(fair_scheduler.time, "monotonic", lambda: now[0])
+    limiter = UserRateLimiter(rate=2, burst=2)
+
+    assert limiter.try_acquire("alice") == 0
+    assert limiter.try_acquire("alice") == 0
+    assert limiter.try_acquire("alice") == pytest.approx(0.5)
+    assert limiter.try_acquire("bob") == 0  # buckets are per user
+
+    now[0] += 0.25
+    assert limiter.try_acquire("alice") == pytest.approx(0.25)
+    now[0] += 0.25
+    assert limiter.try_acquire("alice") == 0
+
+    now[0] += 60  # refill is capped at the burst size
+    assert [limiter.try_acquire("alice") for _ in range(3)] == [0, 0, pytest.approx(0.5)]
+
+
+def test_disabled_limiter_always_admits():
+    limiter = UserRateLimiter(rate=0, burst=10)
+    assert not limiter.enabled
+    assert all(limiter.try_acquire("alice") == 0 for _ in range(100))
+
+
+def test_parse_weights_skips_malformed_pairs():
+    assert parse_weights("alice=2, bob=0.5,carol,dave=x,erin=0") == {"alice": 2.0, "bob": 0.5}
+
+
+@pytest.mark.parametrize("quantum", ["0", "-1"])
+def test_non_positive_quantum_is_rejected_at_config_parse(monkeypatch, quantum):
+    monkeypatch.setenv("LLM_FAIR_QUANTUM", quantum)
+    with pytest.raises(ValueError, match="LLM_FAIR_QUANTUM"):
+        config._positive_float("LLM_FAIR_QUANTUM", "512")
+    with pytest.raises(ValueError):
+        FairQueue(quantum=float(quantum))
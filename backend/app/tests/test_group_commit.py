@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database
+from utils import group_commit
+from utils.config import settings
+from utils.group_commit import GroupCommitWriter, WriterStopped
+
+
+def make_writer(tmp_path):
+    path = str(tmp_path / "writes.db")
+    setup = sqlite3.connect(path)
+    setup.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT)")
+    setup.close()
+    return GroupCommitWriter(lambda: sqlite3.connect(path, check_same_thread=False), window_ms=1), path
+
+
+def insert(value):
+    def op(cursor):
+        cursor.execute("INSERT INTO t (v) VALUES (?)", (value,))
+        return cursor.lastrowid
+    return op
+
+
+def submit_in_thread(writer, op, timeout=5):
+    """submit() from another thread; fails the test instead of hanging if it never returns."""
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = writer.submit(op)
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "submit() never returned"
+    return outcome
+
+
+def test_concurrent_writes_are_committed(tmp_path):
+    writer, path = make_writer(tmp_path)
+    writer.start()
+    ids = []
+    threads = [threading.Thread(target=lambda i=i: ids.append(writer.submit(insert(str(i))))) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.stop()
+
+    assert sorted(ids) == list(range(1, 21))
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM t").fetchone()[0] == 20
+
+
+def test_submit_after_stop_is_rejected(tmp_path):
+    writer, _ = make_writer(tmp_path)
+    writer.start()
+    writer.stop()
+    with pytest.raises(WriterStopped):
+        writer.submit(insert("late"))
+
+
+def test_restarting_registers_one_exit_hook(tmp_path, monkeypatch):
+    hooks = []
+    monkeypatch.setattr(group_commit.atexit, "register", hooks.append)
+    writer, _ = make_writer(tmp_path)
+    for _ in range(3):
+        writer.start()
+        writer.stop()
+    assert hooks == [writer.stop]
+
+
+def test_connect_failure_fails_callers_instead_of_hanging():
+    def connect():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    writer = GroupCommitWriter(connect)
+    writer.start()
+    outcome = submit_in_thread(writer, insert("x"))
+    assert isinstance(outcome["error"], WriterStopped)
+    assert isinstance(writer.error, sqlite3.OperationalError)
+
+
+def test_writes_after_flush_commit_directly(monkeypatch):
+    monkeypatch.setattr(settings, "DB_WRITE_BEHIND", True)
+    database.open_writes()
+    user_id = database.create_user("write-behind-user")
+    log_id = database.save_mood_log(user_id, "Neutral", "{}")
+    assert database.write_stats()["operations"] >= 1
+
+    database.flush_writes()
+    session_id = database.create_chat_session(user_id, log_id)
+    assert database._writer is None  # no writer silently started after shutdown
+    assert database.get_chat_session(session_id) is not None
+
+    database.open_writes()
+    database.save_chat_message(session_id, "user", "hello")
+    assert database._writer is not None
+    database.flush_writes()
+    database.open_writes()
@@ -0,0 +1,20 @@
+import threading
+
+from services import intent_service
+
+
+def test_first_chatbot_message_loads_the_model_off_the_event_loop(client, monkeypatch):
+    loaded_on = []
+    load = intent_service.load_intent_classifier
+
+    def recording_load(path):
+        loaded_on.append(threading.current_thread().name)
+        return load(path)
+
+    monkeypatch.setattr(intent_service, "_intent_classifier", intent_service._NOT_LOADED)
+    monkeypatch.setattr(intent_service, "load_intent_classifier", recording_load)
+
+    response = client.post("/chatbot/message", json={"message": "I feel stressed about my exams"})
+
+    assert response.status_code == 200
+    assert len(loaded_on) == 1 and loaded_on[0].startswith("worker")
@@ -0,0 +1,45 @@
+import asyncio
+import random
+
+import httpx
+
+MAX_LAG = 0.1  # seconds; the app's default LOOP_LAG_WARN_MS
+
+
+def random_answers(rng):
+    return {f"q{i}": rng.choice("ABCDE") for i in range(1, 11)}
+
+
+def test_detect_mood_load_does_not_block_the_loop(stub, monkeypatch):
+    import main
+    from utils.config import settings
+    from utils.executor import LoopLagMonitor
+
+    monkeypatch.setattr(settings, "MOOD_DETECTION_MODE", "llm")  # every request goes to the model
+    stats = stub(latency_ms=50, tokens=1, stream="never")
+    rng = random.Random(7)
+    monitor = LoopLagMonitor(interval=0.005, warn_threshold=MAX_LAG)
+
+    async def load():
+        async with main.app.router.lifespan_context(main.app):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                await client.post("/signup", json={"username": "lag-test"})
+                semaphore = asyncio.Semaphore(25)
+
+                async def one():
+                    async with semaphore:
+                        r = await client.post(
+                            "/detect-mood", json={"username": "lag-test", "answers": random_answers(rng)}
+                        )
+                        r.raise_for_status()
+
+                monitor.start()
+                await asyncio.gather(*(one() for _ in range(100)))
+                await monitor.stop()
+
+    asyncio.run(load())
+
+    assert stats.snapshot()["requests"] > 0
+    assert monitor.samples > 0
+    assert monitor.max_lag < MAX_LAG, monitor.stats()
@@ -0,0 +1,63 @@
+import sqlite3
+
+import pytest
+
+import migrations
+from migrations import current_version, run_migrations
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "migrations.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE chat_sessions (id INTEGER PRIMARY KEY)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def test_failed_migration_is_rolled_back_including_ddl(db_path, monkeypatch):
+    conn = sqlite3.connect(db_path)
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        (1, "two columns", ["ALTER TABLE chat_sessions ADD COLUMN summary TEXT",
+                            "ALTER TABLE no_such_table ADD COLUMN summary TEXT"]),
+    ])
+    with pytest.raises(sqlite3.OperationalError):
+        run_migrations(conn)
+    assert columns(conn, "chat_sessions") == ["id"]
+    assert current_version(conn) == 0
+
+    # Fixed and retried on the next startup, it applies cleanly
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        (1, "two columns", ["ALTER TABLE chat_sessions ADD COLUMN summary TEXT",
+                            "ALTER TABLE chat_sessions ADD COLUMN upto INTEGER"]),
+    ])
+    assert run_migrations(conn) == [1]
+    assert columns(conn, "chat_sessions") == ["id", "summary", "upto"]
+    assert conn.isolation_level == ""  # the caller's transaction mode is restored
+
+
+def test_migration_applied_by_another_worker_is_skipped(db_path, monkeypatch):
+    monkeypatch.setattr(migrations, "MIGRATIONS", [
+        (1, "add a column", ["ALTER TABLE chat_sessions ADD COLUMN summary TEXT"]),
+    ])
+    first, second = sqlite3.connect(db_path), sqlite3.connect(db_path)
+    read_version = migrations.current_version
+    other_worker = []
+
+    def other_worker_wins_after_our_first_read(conn):
+        version = read_version(conn)
+        if conn is second and not other_worker:
+            other_worker.append(run_migrations(first))  # runs between our read and our lock
+        return version
+
+    monkeypatch.setattr(migrations, "current_version", other_worker_wins_after_our_first_read)
+
+    assert run_migrations(second) == []
+    assert other_worker == [[1]]
+    assert columns(second, "chat_sessions") == ["id", "summary"]
+    assert read_version(second) == 1
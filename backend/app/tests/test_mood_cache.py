@@ -0,0 +1,26 @@
+from utils.mood_cache import MoodResultCache
+
+ANSWERS = {"q1": "A", "q2": "b"}
+
+
+def test_stats_count_hits_and_misses():
+    cache = MoodResultCache(max_entries=8)
+    assert cache.get(ANSWERS, "prompt", "model") is None
+    cache.set(ANSWERS, "prompt", "model", "Neutral")
+    assert cache.get({"Q1": "a", "q2": "B"}, "prompt", "model") == "Neutral"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_close_releases_persistent_tier_and_reopens(tmp_path):
+    path = str(tmp_path / "mood_cache.db")
+    cache = MoodResultCache(db_path=path)
+    cache.set(ANSWERS, "prompt", "model", "Stressed")
+    cache.close()
+    assert cache._conn is None
+
+    restarted = MoodResultCache(db_path=path)
+    assert restarted.get(ANSWERS, "prompt", "model") == "Stressed"
+    assert restarted.stats()["persistent_hits"] == 1
+    restarted.close()
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+from services import mood_service
+from services.mood_service import MODE_HYBRID, MODES, classify_answers, classify_batch, resolve_mood
+from utils import config
+from utils.admission import AdmissionRejected
+
+AMBIGUOUS = {"q1": "A"}  # incomplete answers are always ambiguous
+
+
+def test_hybrid_falls_back_to_rules_when_model_is_busy(monkeypatch):
+    async def busy(*args, **kwargs):
+        raise AdmissionRejected("queue full", 3)
+
+    monkeypatch.setattr(mood_service, "query_mood_model", busy)
+    assert classify_answers(AMBIGUOUS).ambiguous
+
+    mood, source = asyncio.run(resolve_mood(AMBIGUOUS, mode=MODE_HYBRID))
+    assert (mood, source) == (classify_answers(AMBIGUOUS).mood, "rules")
+
+
+def test_hybrid_uses_model_answer_when_admitted(monkeypatch):
+    async def model(*args, **kwargs):
+        return "Stressed"
+
+    monkeypatch.setattr(mood_service, "query_mood_model", model)
+    assert asyncio.run(resolve_mood(AMBIGUOUS, mode=MODE_HYBRID)) == ("Stressed", "llm")
+
+
+def test_both_mood_endpoints_store_the_same_answers(client, monkeypatch):
+    from database import get_user_mood_history
+    from utils.config import settings
+
+    monkeypatch.setattr(settings, "MOOD_DETECTION_MODE", "rules")
+    messy = {"Q2": "b", "q10": "c", "q1": " a"}
+    for username in ("single-user", "batch-user"):
+        client.post("/signup", json={"username": username})
+
+    client.post("/detect-mood", json={"username": "single-user", "answers": messy})
+    client.post("/detect-mood/batch", json=[{"username": "batch-user", "answers": messy}])
+
+    single = get_user_mood_history("single-user")[0]["answers"]
+    batch = get_user_mood_history("batch-user")[0]["answers"]
+    assert single == batch == '{"q1": "A", "q2": "B", "q10": "C"}'
+
+
+def test_e_answers_to_q1_and_q2_count_towards_multiple_e():
+    answers = {"q1": "E", "q2": "E", **{f"q{i}": "B" for i in range(3, 11)}}  # score +4
+    decision = classify_answers(answers)
+    assert (decision.mood, decision.rule) == ("Tired/Exhausted", "override:tired")
+    assert classify_batch([answers])[0].to_dict() == decision.to_dict()
+
+
+def test_detection_mode_is_validated_when_settings_are_parsed(monkeypatch):
+    assert config._choice("MOOD_DETECTION_MODE", "hybrid", MODES) == "hybrid"
+    monkeypatch.setenv("MOOD_DETECTION_MODE", "hybird")
+    with pytest.raises(ValueError, match="MOOD_DETECTION_MODE"):
+        config._choice("MOOD_DETECTION_MODE", "hybrid", MODES)
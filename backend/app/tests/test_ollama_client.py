@@ -0,0 +1,33 @@
+import asyncio
+import gc
+import warnings
+
+from utils import ollama_client
+from utils.config import settings
+
+
+async def use_client():
+    client = await ollama_client.get_client()
+    await client.get(settings.OLLAMA_URL.rsplit("/api/", 1)[0] + "/stats")  # opens a pooled connection
+    return client
+
+
+def test_client_is_closed_when_its_loop_ends():
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ResourceWarning)
+        first = asyncio.run(use_client())
+        second = asyncio.run(use_client())
+        gc.collect()
+
+    assert first is not second
+    assert first.is_closed and second.is_closed
+    assert not [w for w in caught if issubclass(w.category, ResourceWarning)]
+
+
+def test_close_client_closes_it_in_its_own_loop():
+    async def scenario():
+        client = await use_client()
+        await ollama_client.close_client()
+        return client
+
+    assert asyncio.run(scenario()).is_closed
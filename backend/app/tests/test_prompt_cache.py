@@ -0,0 +1,53 @@
+import sqlite3
+
+import database
+from services.prompt_cache import SessionPromptCache
+
+
+def session_with_log(username: str):
+    user_id = database.create_user(username)
+    log_id = database.save_mood_log(user_id, "Neutral", "{}")
+    return user_id, database.create_chat_session(user_id, log_id)
+
+
+def test_prompt_is_reused_until_the_user_logs_a_new_mood():
+    cache = SessionPromptCache()
+    user_id, session_id = session_with_log("prompt-reuse")
+
+    first = cache.get(session_id)
+    assert cache.get(session_id) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    database.save_mood_log(user_id, "Stressed", "{}")
+    assert cache.get(session_id) != first
+    assert cache.misses == 2 and cache.invalidations == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_mood_logged_by_another_process_is_seen():
+    cache = SessionPromptCache()
+    user_id, session_id = session_with_log("prompt-other-worker")
+    first = cache.get(session_id)
+
+    # Another worker (or the mood_batch CLI) writes through its own connection
+    other = sqlite3.connect(database.DB_PATH)
+    other.execute("INSERT INTO mood_logs (user_id, mood, answers, created_at) "
+                  "VALUES (?, 'Depressed/Low', '{}', '2999-01-01 00:00:00')", (user_id,))
+    other.commit()
+    other.close()
+
+    assert cache.get(session_id) != first
+    assert "Depressed/Low" in cache.get(session_id)
+
+
+def test_cache_is_bounded():
+    cache = SessionPromptCache(max_entries=2)
+    sessions = [session_with_log(f"prompt-bounded-{i}")[1] for i in range(3)]
+    for session_id in sessions:
+        cache.get(session_id)
+    assert cache.stats()["entries"] == 2
+    assert len(cache._log_by_session) == 2
+
+
+def test_unknown_session_has_no_prompt():
+    assert SessionPromptCache().get(10 ** 9) is None
@@ -0,0 +1,16 @@
+import database
+from migrations import check_query_plans
+
+
+def test_hot_path_queries_use_indexes():
+    assert check_query_plans() == {}
+
+
+def test_plan_check_can_rerun_on_the_same_file(tmp_path):
+    db_path = str(tmp_path / "plans.db")
+    app_db = database.DB_PATH
+
+    assert check_query_plans(db_path) == {}
+    assert check_query_plans(db_path) == {}
+    assert database.DB_PATH == app_db
+    assert database.get_user("plan-check") is None  # the fixture rows stayed in the scratch file
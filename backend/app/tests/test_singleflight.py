@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from utils import ollama_client
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.singleflight import SingleFlight, deterministic_payload_key
+
+
+def test_concurrent_callers_share_one_call():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await release.wait()
+            return "answer"
+
+        waiters = [asyncio.ensure_future(flight.do("k", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*waiters), calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == [("answer", False), ("answer", True), ("answer", True)]
+    assert len(calls) == 1
+    assert stats["calls"] == 1 and stats["coalesced"] == 2 and stats["in_flight"] == 0
+
+
+def test_error_reaches_every_sharer_and_is_not_kept():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def failing():
+            await release.wait()
+            raise RuntimeError("backend down")
+
+        waiters = [asyncio.ensure_future(flight.do("k", failing)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        async def ok():
+            return "recovered"
+
+        return results, await flight.do("k", ok)
+
+    results, retry = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) and str(r) == "backend down" for r in results)
+    assert retry == ("recovered", False)
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return "answer"
+
+        first = asyncio.ensure_future(flight.do("k", work))
+        second = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == ("answer", True)
+
+
+def test_only_deterministic_payloads_are_keyed():
+    payload = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+    assert deterministic_payload_key(payload) is None
+    assert deterministic_payload_key({**payload, "options": {"temperature": 0.7}}) is None
+    seeded = deterministic_payload_key({**payload, "options": {"seed": 1}})
+    assert seeded == deterministic_payload_key({"options": {"seed": 1}, **payload})
+    assert seeded != deterministic_payload_key({**payload, "options": {"seed": 2}})
+
+
+def test_coalesced_callers_are_each_admitted_under_their_own_key(monkeypatch):
+    controller = AdmissionController(max_concurrent=4, max_queue=4, queue_timeout=5,
+                                     user_rate=0.001, user_burst=1)
+    controller._limiter.try_acquire("alice")  # alice has used up her burst
+    monkeypatch.setattr(ollama_client, "_admission", controller)
+    sent = []
+
+    async def send_chat(payload, kind):
+        sent.append(payload)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    monkeypatch.setattr(ollama_client, "_send_chat", send_chat)
+    payload = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "options": {"seed": 1}}
+
+    async def scenario():
+        return await asyncio.gather(
+            *(ollama_client.post_chat(payload, user_key=user) for user in ("alice", "bob", "carol")),
+            return_exceptions=True
+        )
+
+    alice, bob, carol = asyncio.run(scenario())
+    assert isinstance(alice, AdmissionRejected) and alice.status_code == 429
+    assert bob == carol == "answer"  # alice's rejection is hers alone
+    assert len(sent) == 1
+    assert controller.stats()["admitted"] == 2
@@ -0,0 +1,24 @@
+import asyncio
+
+from utils.static_cache import StaticFileCache
+
+
+def test_get_does_not_load_inline(tmp_path):
+    (tmp_path / "index.html").write_text("<html>hello</html>")
+    cache = StaticFileCache(str(tmp_path), ["index.html"])
+
+    assert cache.get("index.html") is None
+    assert cache.reloads == 0
+
+    asyncio.run(cache.ensure_loaded())
+    assert cache.get("index.html").body == b"<html>hello</html>"
+    assert cache.reloads == 1
+
+    asyncio.run(cache.ensure_loaded())
+    assert cache.reloads == 1
+
+
+def test_index_served_from_cache(client):
+    response = client.get("/")
+    assert response.status_code == 200
+    assert "etag" in response.headers
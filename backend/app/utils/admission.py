@@ -0,0 +1,234 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from utils.fair_scheduler import Entry, FairQueue, UserRateLimiter
+from utils.metrics import llm_admission_rejected, llm_in_flight, llm_queue_depth, llm_queue_wait_seconds
+
+# Admission control in front of the Ollama backend. At most
+# `max_concurrent` calls run at once; the rest wait in a bounded FairQueue:
+# strictly by priority class, and by weighted deficit round-robin across
+# users within a class, so one user's backlog cannot starve everyone else.
+# A freed slot goes straight to the next waiter. Callers are turned away
+# quickly, instead of piling onto the backend and timing out together, when:
+#   - their user is over its token-bucket rate limit (429)
+#   - the queue is full and nothing queued is less deserving to shed (503)
+#   - they waited longer than `queue_timeout` seconds (503)
+# Rejections are raised as AdmissionRejected, carrying Retry-After, so
+# handlers that re-raise HTTPException pass them straight through.
+
+HIGH = 0    # short, user-blocking calls: mood detection, session greetings
+NORMAL = 1  # chat turns
+LOW = 2     # background work: conversation summaries
+
+PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+ANONYMOUS = ""  # calls without a user key share one fair-queue flow and are not rate limited
+
+
+class AdmissionRejected(HTTPException):
+    """The LLM backend (or this user's share of it) is saturated; retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int, status_code: int = 503):
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=status_code,
+            detail=f"Model is busy ({reason}), please retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class AdmissionController:
+    """Concurrency cap with a bounded, per-user fair priority queue in front of it."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 user_rate: float = 0.0, user_burst: int = 0, quantum: float = 512,
+                 weights: Optional[Dict[str, float]] = None, max_tracked_users: int = 1000):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._queue = FairQueue(quantum=quantum, weights=weights)
+        self._limiter = UserRateLimiter(user_rate, user_burst)
+        self._service_time = 1.0  # EWMA of slot hold time, seeds Retry-After
+        self._stats = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_timeout": 0,
+                       "shed": 0, "rate_limited": 0}
+        self._users: "OrderedDict[str, Dict]" = OrderedDict()
+        self._max_tracked_users = max_tracked_users
+
+    @asynccontextmanager
+    async def slot(self, priority: int = NORMAL, user_key: Optional[str] = None, cost: float = 1.0):
+        """
+        Hold one admission slot for the body of the block. user_key names the
+        caller for rate limiting and fair sharing; cost (roughly, tokens of
+        work) sets how much of the user's round-robin share the call uses.
+        """
+        user = user_key or ANONYMOUS
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        if user_key:
+            wait = self._limiter.try_acquire(user_key)
+            if wait:
+                self._stats["rate_limited"] += 1
+                self._user(user)["rate_limited"] += 1
+                llm_admission_rejected.labels(name, "rate_limited").inc()
+                raise AdmissionRejected("too many requests", max(1, math.ceil(wait)), status_code=429)
+
+        if self.max_concurrent <= 0:
+            yield
+            return
+
+        await self._acquire(priority, name, user, cost)
+        stats = self._user(user)
+        stats["in_flight"] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._service_time = 0.9 * self._service_time + 0.1 * (time.perf_counter() - start)
+            stats["in_flight"] -= 1
+            self._release()
+
+    def retry_after(self) -> int:
+        """Rough seconds until the current queue drains."""
+        rounds = (len(self._queue) + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(rounds * self._service_time))
+
+    async def _acquire(self, priority: int, name: str, user: str, cost: float):
+        if self.in_flight < self.max_concurrent and not len(self._queue):
+            self._admit(user)
+            llm_queue_wait_seconds.labels(name).observe(0.0)
+            return
+
+        if len(self._queue) >= self.max_queue:
+            self._shed_for(priority, name, user)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = self._queue.push(priority, user, cost, future)
+        self._stats["queued"] += 1
+        self._user(user)["queued"] += 1
+        llm_queue_depth.set(len(self._queue))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._dequeue(entry)
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()  # the slot was handed over just as we timed out
+            self._reject(name, user, "timeout", "rejected_timeout")
+        except asyncio.CancelledError:
+            self._dequeue(entry)
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()  # the slot was handed over just as we were cancelled
+            raise
+        except AdmissionRejected:
+            self._user(user)["rejected"] += 1  # shed; already dequeued
+            raise
+        waited = time.perf_counter() - start
+        self._user(user)["wait_s"] += waited
+        llm_queue_wait_seconds.labels(name).observe(waited)
+
+    def _shed_for(self, priority: int, name: str, user: str):
+        """
+        Make room for a new call in a full queue by rejecting the newest call
+        of the heaviest user in the least urgent class, if that is less
+        deserving than the newcomer; otherwise reject the newcomer.
+        """
+        victim = self._queue.shed_candidate()
+        waiting = self._queue.waiting_by_user()
+        less_deserving = victim is not None and (
+            victim.priority > priority
+            or (victim.priority == priority and waiting.get(victim.user, 0) > waiting.get(user, 0) + 1)
+        )
+        if not less_deserving:
+            self._reject(name, user, "full", "rejected_full")
+        self._dequeue(victim)
+        self._stats["shed"] += 1
+        llm_admission_rejected.labels(PRIORITY_NAMES.get(victim.priority, str(victim.priority)), "shed").inc()
+        victim.item.set_exception(AdmissionRejected("shed for other work", self.retry_after()))
+
+    def _admit(self, user: str):
+        self.in_flight += 1
+        self._stats["admitted"] += 1
+        self._user(user)["admitted"] += 1
+        llm_in_flight.set(self.in_flight)
+
+    def _release(self):
+        # Hand the slot to the next live waiter, or give it back
+        while len(self._queue):
+            entry = self._queue.pop()
+            self._user(entry.user)["queued"] -= 1
+            llm_queue_depth.set(len(self._queue))
+            if not entry.item.done():
+                self._stats["admitted"] += 1
+                self._user(entry.user)["admitted"] += 1
+                entry.item.set_result(None)
+                return
+        self.in_flight -= 1
+        llm_in_flight.set(self.in_flight)
+
+    def _dequeue(self, entry: Entry):
+        if self._queue.remove(entry):
+            self._user(entry.user)["queued"] -= 1
+            llm_queue_depth.set(len(self._queue))
+
+    def _reject(self, priority_name: str, user: str, reason: str, stat: str):
+        self._stats[stat] += 1
+        self._user(user)["rejected"] += 1
+        llm_admission_rejected.labels(priority_name, reason).inc()
+        raise AdmissionRejected("queue full" if reason == "full" else "queue timeout", self.retry_after())
+
+    def _user(self, user: str) -> Dict:
+        stats = self._users.get(user)
+        if stats is None:
+            stats = self._users[user] = {"admitted": 0, "queued": 0, "in_flight": 0,
+                                         "rejected": 0, "rate_limited": 0, "wait_s": 0.0}
+            if len(self._users) > self._max_tracked_users:
+                self._forget_idle_user()
+        else:
+            self._users.move_to_end(user)
+        return stats
+
+    def _forget_idle_user(self):
+        # Least recently seen user with nothing queued or running
+        for user, stats in self._users.items():
+            if not stats["queued"] and not stats["in_flight"]:
+                del self._users[user]
+                return
+
+    def user_stats(self, limit: int = 20) -> Dict[str, Dict]:
+        """Busiest users: most work waiting or running, then most admitted."""
+        busiest = sorted(
+            self._users.items(),
+            key=lambda item: (item[1]["queued"] + item[1]["in_flight"], item[1]["admitted"]),
+            reverse=True
+        )[:limit]
+        return {
+            user or "(anonymous)": {
+                **{k: v for k, v in stats.items() if k != "wait_s"},
+                "avg_wait_ms": round(stats["wait_s"] / stats["admitted"] * 1000, 1) if stats["admitted"] else 0.0,
+            }
+            for user, stats in busiest
+        }
+
+    def stats(self) -> Dict:
+        return {
+            **self._stats,
+            "in_flight": self.in_flight,
+            "queued_now": len(self._queue),
+            "queued_by_priority": {
+                PRIORITY_NAMES.get(p, str(p)): n for p, n in self._queue.waiting_by_priority().items()
+            },
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "avg_service_ms": round(self._service_time * 1000, 1),
+            "user_rate_limit": {"rate_per_s": self._limiter.rate, "burst": self._limiter.burst}
+            if self._limiter.enabled else None,
+            "users": self.user_stats(),
+        }
@@ -0,0 +1,228 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+
+from utils.metrics import ollama_backend_requests, ollama_hedged_requests
+
+# Routing across several Ollama nodes. Each request goes to the available
+# backend with the fewest requests outstanding from this process. A
+# backend is unavailable while its circuit breaker is open (after
+# `failure_threshold` consecutive failures, for `cooldown` seconds) or while
+# the last health probe failed. After the cooldown the breaker is half-open
+# and lets one trial request through: success closes it, failure re-opens
+# it. When every backend is unavailable requests still go to the least
+# loaded one rather than failing outright.
+#
+# Calls made through BackendPool.call() can be hedged: if the first backend
+# has not answered after `hedge_after` seconds, the same request is sent to
+# a second backend and whichever answers first wins. A call that fails
+# outright is retried once on another backend.
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class Backend:
+    """One Ollama node: load, breaker state and health as seen from this process."""
+
+    def __init__(self, url: str, failure_threshold: int, cooldown: float):
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.outstanding = 0
+        self.healthy = True
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.latency_ewma: Optional[float] = None
+
+    def available(self, now: float) -> bool:
+        if not self.healthy:
+            return False
+        if self.state == OPEN:
+            if now - self.opened_at < self.cooldown:
+                return False
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            return self.outstanding == 0  # one trial request at a time
+        return True
+
+    def observe_latency(self, elapsed: float):
+        self.latency_ewma = elapsed if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * elapsed
+
+    def record_success(self, elapsed: float):
+        self.requests += 1
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.observe_latency(elapsed)
+        ollama_backend_requests.labels(self.url, "ok").inc()
+
+    def record_failure(self):
+        self.requests += 1
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state == CLOSED:
+                print(f"⚠️  Ollama backend {self.url} marked down after {self.consecutive_failures} failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+        ollama_backend_requests.labels(self.url, "error").inc()
+
+    def stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "state": self.state,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+        }
+
+
+class BackendPool:
+    """Least-outstanding-requests routing with circuit breaking, health probes and hedging."""
+
+    def __init__(self, urls: Sequence[str], failure_threshold: int = 5, cooldown: float = 30.0,
+                 hedge_after: float = 0.0, max_attempts: int = 2):
+        if not urls:
+            raise ValueError("BackendPool needs at least one URL")
+        self.backends = [Backend(url, failure_threshold, cooldown) for url in urls]
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self._probe_task: Optional[asyncio.Task] = None
+        self._stats = {"hedged": 0, "hedge_wins": 0, "failovers": 0}
+
+    def pick(self, exclude: Iterable[Backend] = ()) -> Optional[Backend]:
+        """
+        Available backend with the fewest outstanding requests; ties go to
+        the lowest recent latency (unmeasured backends first), then at random.
+        """
+        exclude = set(exclude)
+        candidates = [b for b in self.backends if b not in exclude]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        available = [b for b in candidates if b.available(now)]
+        pool = available or candidates
+        fewest = min(b.outstanding for b in pool)
+        least_loaded = [b for b in pool if b.outstanding == fewest]
+        fastest = min(b.latency_ewma or 0.0 for b in least_loaded)
+        return random.choice([b for b in least_loaded if (b.latency_ewma or 0.0) == fastest])
+
+    @asynccontextmanager
+    async def lease(self, backend: Optional[Backend] = None):
+        """
+        Use one backend for the body of the block, counting it as outstanding.
+        Leaving the block normally records a success, raising records a
+        failure; cancellation (a losing hedge, a closed stream) records neither.
+        """
+        backend = backend or self.pick()
+        backend.outstanding += 1
+        start = time.perf_counter()
+        try:
+            yield backend
+        except asyncio.CancelledError:
+            # A losing hedge took at least this long; remember that when routing
+            backend.observe_latency(time.perf_counter() - start)
+            raise
+        except GeneratorExit:
+            raise
+        except BaseException:
+            backend.record_failure()
+            raise
+        else:
+            backend.record_success(time.perf_counter() - start)
+        finally:
+            backend.outstanding -= 1
+
+    async def _attempt(self, backend: Backend, fn: Callable[[Backend], Awaitable[T]]) -> T:
+        async with self.lease(backend):
+            return await fn(backend)
+
+    async def call(self, fn: Callable[[Backend], Awaitable[T]]) -> T:
+        """
+        Await fn(backend) on the best backend, hedging to a second one after
+        hedge_after seconds and failing over once if it raises. Returns the
+        first successful result; raises the last error if every attempt failed.
+        """
+        loop = asyncio.get_running_loop()
+        tried: List[Backend] = []
+        pending = set()
+        last_error: Optional[BaseException] = None
+        limit = min(self.max_attempts, len(self.backends))
+
+        def launch() -> bool:
+            backend = self.pick(exclude=tried)
+            if backend is None:
+                return False
+            tried.append(backend)
+            pending.add(loop.create_task(self._attempt(backend, fn)))
+            return True
+
+        launch()
+        first_task = next(iter(pending))
+        hedged = False
+        try:
+            while pending:
+                can_hedge = self.hedge_after > 0 and len(tried) < limit
+                done, _ = await asyncio.wait(
+                    pending, timeout=self.hedge_after if can_hedge else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if launch():
+                        hedged = True
+                        self._stats["hedged"] += 1
+                        ollama_hedged_requests.inc()
+                    continue
+                pending -= done
+                for task in done:
+                    if task.exception() is None:
+                        if hedged and task is not first_task:
+                            self._stats["hedge_wins"] += 1
+                        return task.result()
+                    last_error = task.exception()
+                if not pending and len(tried) < limit and launch():
+                    self._stats["failovers"] += 1
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    # ============== HEALTH PROBES ==============
+
+    def start_probes(self, probe: Callable[[Backend], Awaitable[bool]], interval: float):
+        """Probe every backend every `interval` seconds; only worthwhile with more than one."""
+        if self._probe_task is None and len(self.backends) > 1 and interval > 0:
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_loop(probe, interval))
+
+    async def stop_probes(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+
+    async def _probe_loop(self, probe: Callable[[Backend], Awaitable[bool]], interval: float):
+        while True:
+            results = await asyncio.gather(*(probe(b) for b in self.backends), return_exceptions=True)
+            for backend, ok in zip(self.backends, results):
+                ok = ok is True
+                if ok != backend.healthy:
+                    print(f"{'✅' if ok else '⚠️ '} Ollama backend {backend.url} is {'up' if ok else 'not answering'}")
+                backend.healthy = ok
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict:
+        return {**self._stats, "hedge_after_ms": self.hedge_after * 1000,
+                "backends": [b.stats() for b in self.backends]}
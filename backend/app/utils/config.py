@@ -1,12 +1,110 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+# Settings that only make sense above zero (sizes, timeouts, quanta) are
+# checked here, so a bad value stops startup instead of failing requests
+def _positive_float(name: str, default: str) -> float:
+    value = float(os.getenv(name, default))
+    if value <= 0:
+        raise ValueError(f"{name} must be greater than 0, got {value:g}")
+    return value
+
+
+def _positive_int(name: str, default: str) -> int:
+    value = int(os.getenv(name, default))
+    if value <= 0:
+        raise ValueError(f"{name} must be greater than 0, got {value}")
+    return value
+
+
+def _choice(name: str, default: str, choices) -> str:
+    value = os.getenv(name, default)
+    if value not in choices:
+        raise ValueError(f"{name} must be one of {', '.join(choices)}, got {value!r}")
+    return value
+
+
 class Settings:
     OLLAMA_API_KEY = os.getenv("OLLAMA_API_KEY")
     OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/chat")
+    # Several Ollama nodes (comma-separated /api/chat URLs); defaults to OLLAMA_URL alone
+    OLLAMA_URLS = [u.strip() for u in os.getenv("OLLAMA_URLS", "").split(",") if u.strip()] or [OLLAMA_URL]
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///mood_tracker.db")
     MODEL_NAME = os.getenv("MODEL_NAME", "gpt-oss:20b-cloud")
+    OLLAMA_POOL_SIZE = _positive_int("OLLAMA_POOL_SIZE", "20")
+    OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "20"))
+    OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "30"))
+    OLLAMA_CONNECT_TIMEOUT = _positive_float("OLLAMA_CONNECT_TIMEOUT", "5")
+    OLLAMA_READ_TIMEOUT = _positive_float("OLLAMA_READ_TIMEOUT", "60")
+    # A backend is skipped for OLLAMA_BREAKER_COOLDOWN seconds after this many failures in a row
+    OLLAMA_BREAKER_FAILURES = _positive_int("OLLAMA_BREAKER_FAILURES", "5")
+    OLLAMA_BREAKER_COOLDOWN = float(os.getenv("OLLAMA_BREAKER_COOLDOWN", "30"))
+    OLLAMA_PROBE_INTERVAL = float(os.getenv("OLLAMA_PROBE_INTERVAL", "10"))  # 0 disables health probes
+    OLLAMA_PROBE_TIMEOUT = _positive_float("OLLAMA_PROBE_TIMEOUT", "2")
+    # Re-send a non-streaming request to a second backend if the first has not answered (0 = off)
+    OLLAMA_HEDGE_AFTER_MS = float(os.getenv("OLLAMA_HEDGE_AFTER_MS", "0"))
+    # Admission control: at most LLM_MAX_CONCURRENCY Ollama calls at once (0 = no limit),
+    # up to LLM_QUEUE_SIZE more waiting by priority, each for at most LLM_QUEUE_TIMEOUT seconds
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "64"))
+    LLM_QUEUE_TIMEOUT = _positive_float("LLM_QUEUE_TIMEOUT", "10")
+    # Per-user fairness: queued calls take turns across users, LLM_FAIR_QUANTUM tokens of work
+    # per turn, scaled by LLM_USER_WEIGHTS ("alice=2,bob=0.5"); each user may start
+    # LLM_USER_BURST calls at once, refilled at LLM_USER_RATE per second (0 = no rate limit)
+    LLM_FAIR_QUANTUM = _positive_float("LLM_FAIR_QUANTUM", "512")
+    LLM_USER_WEIGHTS = os.getenv("LLM_USER_WEIGHTS", "")
+    LLM_USER_RATE = float(os.getenv("LLM_USER_RATE", "0"))
+    LLM_USER_BURST = int(os.getenv("LLM_USER_BURST", "10"))
+    # Identical deterministic requests in flight together share one upstream call
+    OLLAMA_SINGLE_FLIGHT = os.getenv("OLLAMA_SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+    DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")  # NORMAL is durable enough under WAL
+    DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+    DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "128"))
+    # Batch chat message / mood log inserts into shared transactions
+    DB_WRITE_BEHIND = os.getenv("DB_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+    DB_WRITE_BATCH_SIZE = _positive_int("DB_WRITE_BATCH_SIZE", "128")
+    DB_WRITE_WINDOW_MS = float(os.getenv("DB_WRITE_WINDOW_MS", "5"))
+    DB_THREADS = _positive_int("DB_THREADS", "8")
+    WORKER_THREADS = _positive_int("WORKER_THREADS", "4")
+    LOOP_LAG_WARN_MS = _positive_float("LOOP_LAG_WARN_MS", "100")
+    # Psychiatrist chat context: recent turns verbatim within a token budget,
+    # older turns folded into a rolling per-session summary
+    CHAT_CONTEXT_TOKEN_BUDGET = _positive_int("CHAT_CONTEXT_TOKEN_BUDGET", "1500")
+    CHAT_RECENT_TURNS = int(os.getenv("CHAT_RECENT_TURNS", "6"))
+    # How long Ollama keeps the model (and its prompt cache) loaded between chat turns;
+    # /chat/start can override it per session
+    CHAT_KEEP_ALIVE = os.getenv("CHAT_KEEP_ALIVE", "30m")
+    CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "200"))
+    # Chatbot intent classifier (empty = data/intent_model.npz)
+    INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "")
+    CHATBOT_CLASSIFY_BATCH = _positive_int("CHATBOT_CLASSIFY_BATCH", "256")
+    # "rules" | "hybrid" (rules, LLM only when ambiguous) | "llm"
+    MOOD_DETECTION_MODE = _choice("MOOD_DETECTION_MODE", "hybrid", ("rules", "hybrid", "llm"))
+    MOOD_BATCH_CONCURRENCY = _positive_int("MOOD_BATCH_CONCURRENCY", "4")
+    MOOD_CACHE_SIZE = int(os.getenv("MOOD_CACHE_SIZE", "1024"))
+    MOOD_CACHE_TTL = _positive_float("MOOD_CACHE_TTL", "86400")
+    MOOD_CACHE_PERSIST = os.getenv("MOOD_CACHE_PERSIST", "false").lower() in ("1", "true", "yes")
+
+    # Static front-end files served from memory; HTML revalidates on every
+    # navigation (max-age 0 -> no-cache), JS/CSS/assets are cached for STATIC_MAX_AGE
+    STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+    STATIC_HTML_MAX_AGE = int(os.getenv("STATIC_HTML_MAX_AGE", "0"))
+    STATIC_WATCH = os.getenv("STATIC_WATCH", "false").lower() in ("1", "true", "yes")  # dev: reload on change
+    # Sampling profiler (off unless PROFILE_ENABLED). Profiles PROFILE_SAMPLE_RATE
+    # of requests, paths starting with a PROFILE_PATHS prefix, and requests
+    # sending "X-Profile: <ADMIN_TOKEN>". ADMIN_TOKEN also guards /admin/profiles.
+    PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "false").lower() in ("1", "true", "yes")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    PROFILE_PATHS = [p.strip() for p in os.getenv("PROFILE_PATHS", "").split(",") if p.strip()]
+    PROFILE_INTERVAL_MS = _positive_float("PROFILE_INTERVAL_MS", "5")
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "mental-health-profiles"))
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
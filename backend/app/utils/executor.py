@@ -0,0 +1,131 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from utils.config import settings
+
+# Bounded thread pools for synchronous work called from async handlers.
+# sqlite3 calls go to the DB pool; any other blocking call (file I/O, CPU
+# heavy helpers) goes to the worker pool. Nothing blocking runs on the loop.
+# The pools start on first use and again after shutdown_executors(), so the
+# app can go through its lifespan more than once in a process (tests, reloads).
+
+_db_executor: Optional[ThreadPoolExecutor] = None
+_worker_executor: Optional[ThreadPoolExecutor] = None
+_executors_lock = threading.Lock()
+
+# Optional wrapper applied to every submitted call (the sampling profiler
+# uses it to follow a request onto pool threads); None costs one check.
+_call_wrapper: Optional[Callable[[Callable], Callable]] = None
+
+
+def set_call_wrapper(wrapper: Optional[Callable[[Callable], Callable]]):
+    global _call_wrapper
+    _call_wrapper = wrapper
+
+
+def _db_pool() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        with _executors_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(max_workers=settings.DB_THREADS, thread_name_prefix="db")
+    return _db_executor
+
+
+def _worker_pool() -> ThreadPoolExecutor:
+    global _worker_executor
+    if _worker_executor is None:
+        with _executors_lock:
+            if _worker_executor is None:
+                _worker_executor = ThreadPoolExecutor(
+                    max_workers=settings.WORKER_THREADS, thread_name_prefix="worker"
+                )
+    return _worker_executor
+
+
+async def run_db(fn: Callable, *args, **kwargs):
+    """Run a synchronous database function on the DB thread pool."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, **kwargs)
+    if _call_wrapper is not None:
+        call = _call_wrapper(call)
+    return await loop.run_in_executor(_db_pool(), call)
+
+
+async def run_blocking(fn: Callable, *args, **kwargs):
+    """Run any other blocking function on the worker thread pool."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(fn, *args, **kwargs)
+    if _call_wrapper is not None:
+        call = _call_wrapper(call)
+    return await loop.run_in_executor(_worker_pool(), call)
+
+
+def shutdown_executors():
+    """Wait for queued work to finish and stop both pools; the next call starts fresh ones."""
+    global _db_executor, _worker_executor
+    with _executors_lock:
+        pools = (_db_executor, _worker_executor)
+        _db_executor = _worker_executor = None
+    for pool in pools:
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag by sleeping for a fixed interval and recording
+    how late each wake-up is. Anything that blocks the loop shows up as lag.
+    """
+
+    def __init__(self, interval: float = 0.05, warn_threshold: float = 0.1):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.stalls = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - start - self.interval, 0.0)
+
+            self.samples += 1
+            self.total_lag += lag
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warn_threshold:
+                self.stalls += 1
+                print(f"⚠️  Event loop blocked for {lag * 1000:.0f}ms")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict:
+        return {
+            "samples": self.samples,
+            "avg_lag_ms": round(self.total_lag / self.samples * 1000, 3) if self.samples else 0.0,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "stalls": self.stalls,
+        }
+
+
+loop_lag_monitor = LoopLagMonitor(warn_threshold=settings.LOOP_LAG_WARN_MS / 1000)
@@ -0,0 +1,225 @@
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+# Per-user fairness for queued LLM work.
+#
+# FairQueue holds waiting calls in one queue per (priority, user). Higher
+# priority classes are always served first. Within a class, users take
+# turns by deficit round-robin: each visit credits a user quantum * weight
+# units of work, and a call is dispatched once the user's credit covers its
+# cost. A user firing many long chat turns therefore gets the same share of
+# slots as everyone else, and a user with one short turn waits at most about
+# one round rather than behind the heavy user's whole backlog.
+#
+# UserRateLimiter adds a token bucket per user on top: up to `burst` calls
+# at once, refilled at `rate` per second, so one client cannot flood the
+# queue in the first place.
+
+
+class Entry:
+    """One waiting call."""
+
+    __slots__ = ("priority", "user", "cost", "item", "enqueued", "flow")
+
+    def __init__(self, priority: int, user: str, cost: float, item: Any):
+        self.priority = priority
+        self.user = user
+        self.cost = cost
+        self.item = item
+        self.enqueued = time.monotonic()
+        self.flow: Optional["_Flow"] = None
+
+
+class _Flow:
+    __slots__ = ("user", "weight", "deficit", "credited", "entries")
+
+    def __init__(self, user: str, weight: float):
+        self.user = user
+        self.weight = weight
+        self.deficit = 0.0
+        self.credited = False  # got its quantum for the current visit
+        self.entries: Deque[Entry] = deque()
+
+
+class _DeficitRoundRobin:
+    """Deficit round-robin over the users of one priority class."""
+
+    def __init__(self, quantum: float):
+        self.quantum = quantum
+        self.flows: Dict[str, _Flow] = {}
+        self.active: Deque[_Flow] = deque()  # flows with waiting entries, in visiting order
+        self.size = 0
+
+    def push(self, entry: Entry, weight: float):
+        flow = self.flows.get(entry.user)
+        if flow is None:
+            flow = self.flows[entry.user] = _Flow(entry.user, weight)
+            self.active.append(flow)
+        entry.flow = flow
+        flow.entries.append(entry)
+        self.size += 1
+
+    def pop(self) -> Entry:
+        skipped = 0
+        while True:
+            flow = self.active[0]
+            if not flow.credited:
+                flow.deficit += self.quantum * flow.weight
+                flow.credited = True
+            head = flow.entries[0]
+            if flow.deficit >= head.cost:
+                # Served; the flow keeps its turn while its credit lasts
+                flow.deficit -= head.cost
+                flow.entries.popleft()
+                self.size -= 1
+                if not flow.entries:
+                    self._drop(flow)
+                return head
+            flow.credited = False
+            self.active.rotate(-1)
+            skipped += 1
+            if skipped == len(self.active):
+                self._skip_rounds()
+                skipped = 0
+
+    def _skip_rounds(self):
+        """A whole round served nothing: credit every flow the rounds before the first one can go."""
+        rounds = min(
+            math.ceil((f.entries[0].cost - f.deficit) / (self.quantum * f.weight)) for f in self.active
+        ) - 1
+        if rounds > 0:
+            for f in self.active:
+                f.deficit += rounds * self.quantum * f.weight
+
+    def remove(self, entry: Entry) -> bool:
+        flow = entry.flow
+        if flow is None or self.flows.get(flow.user) is not flow:
+            return False
+        try:
+            flow.entries.remove(entry)
+        except ValueError:
+            return False
+        self.size -= 1
+        if not flow.entries:
+            self._drop(flow)
+        return True
+
+    def _drop(self, flow: _Flow):
+        # An idle user keeps no credit (standard DRR), so it cannot bank a burst
+        del self.flows[flow.user]
+        self.active.remove(flow)
+
+    def newest_of_heaviest(self) -> Entry:
+        """Shedding candidate: the latest call of the user with the most waiting."""
+        return max(self.flows.values(), key=lambda f: len(f.entries)).entries[-1]
+
+
+class FairQueue:
+    """Priority classes served strictly in order; deficit round-robin across users within each."""
+
+    def __init__(self, quantum: float = 512, weights: Optional[Dict[str, float]] = None):
+        if quantum <= 0:
+            raise ValueError("FairQueue quantum must be greater than 0")
+        self.quantum = quantum
+        self.weights = weights or {}
+        self._classes: Dict[int, _DeficitRoundRobin] = {}
+
+    def __len__(self) -> int:
+        return sum(c.size for c in self._classes.values())
+
+    def push(self, priority: int, user: str, cost: float, item: Any) -> Entry:
+        entry = Entry(priority, user, cost, item)
+        drr = self._classes.get(priority)
+        if drr is None:
+            drr = self._classes[priority] = _DeficitRoundRobin(self.quantum)
+        drr.push(entry, self.weights.get(user, 1.0))
+        return entry
+
+    def pop(self) -> Optional[Entry]:
+        for priority in sorted(self._classes):
+            drr = self._classes[priority]
+            if drr.size:
+                return drr.pop()
+        return None
+
+    def remove(self, entry: Entry) -> bool:
+        drr = self._classes.get(entry.priority)
+        return drr.remove(entry) if drr is not None else False
+
+    def lowest_priority(self) -> Optional[int]:
+        """Least urgent priority class with anything waiting."""
+        waiting = [p for p, drr in self._classes.items() if drr.size]
+        return max(waiting) if waiting else None
+
+    def shed_candidate(self) -> Optional[Entry]:
+        priority = self.lowest_priority()
+        return self._classes[priority].newest_of_heaviest() if priority is not None else None
+
+    def waiting_by_user(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for drr in self._classes.values():
+            for user, flow in drr.flows.items():
+                counts[user] = counts.get(user, 0) + len(flow.entries)
+        return counts
+
+    def waiting_by_priority(self) -> Dict[int, int]:
+        return {p: drr.size for p, drr in self._classes.items() if drr.size}
+
+
+class UserRateLimiter:
+    """Token bucket per user: `burst` calls at once, refilled at `rate` per second (rate <= 0 disables)."""
+
+    def __init__(self, rate: float, burst: int, max_users: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()  # user -> (tokens, updated)
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0 and self.burst > 0
+
+    def try_acquire(self, user: str) -> float:
+        """Take one token for user. Returns 0 on success, else seconds until a token is available."""
+        if not self.enabled:
+            return 0.0
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(user, (float(self.burst), now))
+        tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            self._buckets[user] = (tokens - 1, now)
+            self._prune()
+            return 0.0
+        self._buckets[user] = (tokens, now)
+        return (1 - tokens) / self.rate
+
+    def _prune(self):
+        # Least recently used first; a dropped user simply starts again with a full bucket
+        while len(self._buckets) > self.max_users:
+            self._buckets.popitem(last=False)
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Parse "alice=2,bob=0.5" into {"alice": 2.0, "bob": 0.5}; malformed pairs are skipped."""
+    weights = {}
+    for pair in spec.split(","):
+        user, sep, value = pair.partition("=")
+        if not sep:
+            continue
+        try:
+            weight = float(value)
+        except ValueError:
+            continue
+        if weight > 0:
+            weights[user.strip()] = weight
+    return weights
+
+
+def estimate_cost(payload: Dict, default_completion: int = 128) -> float:
+    """Rough work units (tokens) of an Ollama chat payload: prompt chars / 4 plus the completion budget."""
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in payload.get("messages", []))
+    completion = (payload.get("options") or {}).get("num_predict") or default_completion
+    return prompt_chars / 4 + completion
+
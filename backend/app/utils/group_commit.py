@@ -0,0 +1,202 @@
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# A write operation receives a cursor inside the shared transaction and
+# returns whatever the caller should get back (usually cursor.lastrowid).
+WriteOp = Callable[[sqlite3.Cursor], Any]
+
+_STOP = object()
+
+
+class WriterStopped(RuntimeError):
+    """The writer is stopped, stopping or failed to start; the operation was not run."""
+
+
+class GroupCommitWriter:
+    """
+    Write-behind writer thread for SQLite.
+
+    Callers submit write operations from any thread and block until their
+    operation is committed. The writer takes everything already queued and,
+    while other writers are active (the previous batch had more than one
+    operation), keeps collecting for up to window_ms or until the batch is as
+    large as the previous one, then commits them in one transaction so concurrent requests
+    share a single fsync. A lone writer is committed immediately. Each
+    operation runs under its own savepoint, so one failing insert does not
+    roll back the rest of the batch.
+
+    Once stop() is called, or the writer thread fails (e.g. it cannot open
+    the database), submit() raises WriterStopped, and so does every
+    operation still queued, so no caller waits forever.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection],
+                 max_batch: int = 128, window_ms: float = 5):
+        self.connect = connect
+        self.max_batch = max_batch
+        self.window = window_ms / 1000
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._accepting = False
+        self._exit_hook = False
+        self.error: Optional[BaseException] = None
+        self.batches = 0
+        self.operations = 0
+        self.failures = 0
+        self._last_batch_size = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._accepting = True
+                self.error = None
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+                if not self._exit_hook:  # start() runs again after every stop()
+                    atexit.register(self.stop)
+                    self._exit_hook = True
+
+    def submit(self, op: WriteOp) -> Any:
+        """Queue a write and wait for it to be committed. Returns the op's result."""
+        future: Future = Future()
+        with self._lock:
+            if not self._accepting:
+                raise WriterStopped("write-behind writer is not running") from self.error
+            self._queue.put((op, future))
+        return future.result()
+
+    def flush(self):
+        """Block until everything queued so far has been committed."""
+        self.submit(lambda cursor: None)
+
+    def stop(self):
+        """Commit everything still queued and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+            self._accepting = False
+            if thread is not None and thread.is_alive():
+                self._queue.put(_STOP)  # under the lock, so nothing can be queued behind it
+        if thread is not None:
+            thread.join()
+
+    def _collect(self, first) -> Tuple[List, bool]:
+        batch = [first]
+        # Only wait when there is concurrent write traffic, and only until the
+        # batch is as large as the previous one; anything already queued is
+        # always taken (up to max_batch).
+        window = self.window if self._last_batch_size > 1 else 0
+        target = min(max(self._last_batch_size, 1), self.max_batch)
+        deadline = time.monotonic() + window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic() if len(batch) < target else 0
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        try:
+            conn = self.connect()
+        except Exception as e:
+            print(f"⚠️  Write-behind writer could not open the database: {e}")
+            self.error = e
+            self._fail_queued()
+            return
+        try:
+            self._serve(conn)
+        except BaseException as e:
+            self.error = e
+            raise
+        finally:
+            conn.close()
+            self._fail_queued()
+
+    def _fail_queued(self):
+        """Stop taking writes and fail whatever is still queued; none of it has run."""
+        with self._lock:
+            self._accepting = False
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                error = WriterStopped("write-behind writer stopped before running this write")
+                error.__cause__ = self.error
+                item[1].set_exception(error)
+
+    def _serve(self, conn: sqlite3.Connection):
+        conn.isolation_level = None  # explicit BEGIN/COMMIT below
+        cursor = conn.cursor()
+        stopping = False
+
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch, stopping = self._collect(item)
+            self._last_batch_size = len(batch)
+            self._commit_batch(conn, cursor, batch)
+
+        # Drain anything submitted while stopping
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._commit_batch(conn, cursor, leftover)
+
+    def _commit_batch(self, conn: sqlite3.Connection, cursor: sqlite3.Cursor, batch: List):
+        results = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for op, future in batch:
+                cursor.execute("SAVEPOINT op")
+                try:
+                    results.append((future, op(cursor), None))
+                    cursor.execute("RELEASE op")
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO op")
+                    cursor.execute("RELEASE op")
+                    results.append((future, None, e))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            self.failures += len(batch)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.operations += len(batch)
+        for future, result, error in results:
+            if error is not None:
+                self.failures += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "operations": self.operations,
+            "failures": self.failures,
+            "avg_batch_size": round(self.operations / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+        }
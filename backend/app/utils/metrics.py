@@ -0,0 +1,312 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Counters, gauges and latency histograms exported on /metrics in the
+# Prometheus text format. Counter and histogram children keep one shard per
+# thread, so recording a value is a plain list update with no lock: only the
+# owning thread ever writes its shard (the event loop is one thread, and each
+# DB / worker pool thread has its own). A scrape sums the shards. Locks are
+# taken only when a thread or label set is seen for the first time. Gauges
+# hold one value and are only set from the event loop.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class _Sharded:
+    """Per-thread list of floats, summed on read."""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._shards: List[List[float]] = []
+        self._lock = threading.Lock()
+
+    def shard(self) -> List[float]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = [0.0] * self._size
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            shards = list(self._shards)
+        totals = [0.0] * self._size
+        for shard in shards:
+            for i, value in enumerate(shard):
+                totals[i] += value
+        return totals
+
+
+class CounterChild(_Sharded):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1):
+        self.shard()[0] += amount
+
+    def value(self) -> float:
+        return self.totals()[0]
+
+
+class HistogramChild(_Sharded):
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # One slot per bucket, one for +Inf, then the sum
+        super().__init__(len(self.buckets) + 2)
+
+    def observe(self, value: float):
+        shard = self.shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Child for one label set; callers on hot paths should keep the result."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def _render_child(self, key, child: CounterChild) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {_number(child.value())}"]
+
+
+class GaugeChild:
+    """A single current value; set only from the event loop thread."""
+
+    def __init__(self):
+        self._value = 0.0
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        self._value += amount
+
+    def dec(self, amount: float = 1):
+        self._value -= amount
+
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> GaugeChild:
+        return GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def _render_child(self, key, child: GaugeChild) -> List[str]:
+        return [f"{self.name}{self._label_text(key)} {_number(child.value())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_child(self, key, child: HistogramChild) -> List[str]:
+        totals = child.totals()
+        lines = []
+        cumulative = 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), totals):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            labels = self._label_text(key, f'le="{le}"')
+            lines.append(f"{self.name}_bucket{labels} {_number(cumulative)}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_number(totals[-1])}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {_number(cumulative)}")
+        return lines
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ============== APP METRICS ==============
+
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Whole request handling time, until the last body byte is sent",
+    ["method", "route", "status"]
+)
+db_call_seconds = Histogram(
+    "db_call_duration_seconds", "Time spent in each database.py function", ["function"], buckets=DB_BUCKETS
+)
+prompt_build_seconds = Histogram(
+    "llm_prompt_build_duration_seconds", "Time to assemble the messages for an Ollama request", ["kind"]
+)
+ollama_request_seconds = Histogram(
+    "ollama_request_duration_seconds", "Ollama /api/chat round trip, until the last frame for streams",
+    ["kind", "outcome"]
+)
+response_parse_seconds = Histogram(
+    "llm_response_parse_duration_seconds", "Time to parse an Ollama response into text", ["kind"]
+)
+ollama_coalesced_requests = Counter(
+    "ollama_coalesced_requests_total", "Requests answered by joining an identical in-flight Ollama call", ["kind"]
+)
+ollama_backend_requests = Counter(
+    "ollama_backend_requests_total", "Requests per Ollama backend by outcome", ["backend", "outcome"]
+)
+ollama_hedged_requests = Counter(
+    "ollama_hedged_requests_total", "Requests re-sent to a second backend after OLLAMA_HEDGE_AFTER_MS"
+)
+llm_queue_wait_seconds = Histogram(
+    "llm_queue_wait_seconds", "Time an Ollama call waited for an admission slot", ["priority"]
+)
+llm_admission_rejected = Counter(
+    "llm_admission_rejected_total", "Ollama calls turned away by admission control", ["priority", "reason"]
+)
+llm_queue_depth = Gauge("llm_queue_depth", "Ollama calls waiting for an admission slot")
+llm_in_flight = Gauge("llm_in_flight", "Ollama calls holding an admission slot")
+ollama_tokens = Counter(
+    "ollama_tokens_total", "Prompt and completion tokens reported in Ollama's final frame", ["kind", "type"]
+)
+
+
+def record_token_counts(kind: str, frame: Dict):
+    """Count prompt_eval_count / eval_count from a frame marked done."""
+    prompt_tokens = frame.get("prompt_eval_count")
+    if prompt_tokens:
+        ollama_tokens.labels(kind, "prompt").inc(prompt_tokens)
+    completion_tokens = frame.get("eval_count")
+    if completion_tokens:
+        ollama_tokens.labels(kind, "completion").inc(completion_tokens)
+
+
+def timed(histogram_child: HistogramChild, fn: Callable) -> Callable:
+    """Wrap a synchronous function so each call is observed in histogram_child."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            histogram_child.observe(time.perf_counter() - start)
+    return wrapper
+
+
+def instrument_db_functions(namespace: Dict, module_name: str, exclude: Sequence[str] = ()):
+    """Replace every public function defined in module_name with a timed wrapper."""
+    for name, fn in list(namespace.items()):
+        if (callable(fn) and not name.startswith("_") and name not in exclude
+                and getattr(fn, "__module__", None) == module_name and not isinstance(fn, type)):
+            namespace[name] = timed(db_call_seconds.labels(name), fn)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording http_request_duration_seconds per route
+    template (e.g. /mood-history/{username}), so path parameters do not
+    create a label set per user.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_seconds.labels(scope["method"], path, status).observe(time.perf_counter() - start)
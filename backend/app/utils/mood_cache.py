@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from utils.executor import run_db
+
+
+def prompt_hash(system_prompt: str) -> str:
+    """Stable hash of a system prompt, used to invalidate results on prompt edits."""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+
+def canonical_answers(answers: Dict[str, str]) -> str:
+    """Canonical JSON for an answer set: lowercase keys, uppercase letters, sorted."""
+    normalized = {str(k).strip().lower(): str(v).strip().upper() for k, v in answers.items()}
+    return json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+
+
+class MoodResultCache:
+    """
+    Content-addressed cache for mood model results.
+
+    Entries are keyed by (canonical answers, system prompt hash, model name).
+    The first tier is an in-process LRU with a TTL; an optional SQLite file
+    keeps results across restarts. Seeing a new prompt hash drops every entry
+    produced under a different prompt.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400,
+                 db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._current_prompt_hash = None
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS mood_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    prompt_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    mood TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def make_key(answers: Dict[str, str], system_prompt_hash: str, model: str) -> str:
+        raw = f"{model}\n{system_prompt_hash}\n{canonical_answers(answers)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _check_prompt(self, system_prompt_hash: str):
+        """Invalidate entries from older prompts the first time a new hash is seen."""
+        if system_prompt_hash == self._current_prompt_hash:
+            return
+        self._current_prompt_hash = system_prompt_hash
+
+        stale = [key for key, (hash_, _, _) in self._entries.items() if hash_ != system_prompt_hash]
+        for key in stale:
+            del self._entries[key]
+        removed = len(stale)
+
+        if self.db_path:
+            conn = self._get_conn()
+            cursor = conn.execute("DELETE FROM mood_cache WHERE prompt_hash != ?", (system_prompt_hash,))
+            conn.commit()
+            removed += cursor.rowcount
+
+        if removed:
+            self.invalidations += removed
+            print(f"Mood cache: dropped {removed} entries from a previous system prompt")
+
+    def get(self, answers: Dict[str, str], system_prompt: str, model: str) -> Optional[str]:
+        hash_ = prompt_hash(system_prompt)
+        key = self.make_key(answers, hash_, model)
+        now = time.time()
+
+        with self._lock:
+            self._check_prompt(hash_)
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                _, mood, stored_at = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return mood
+                del self._entries[key]
+
+            if self.db_path:
+                row = self._get_conn().execute(
+                    "SELECT mood, stored_at FROM mood_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    self._store_memory(key, hash_, row[0], row[1])
+                    self.hits += 1
+                    self.persistent_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def set(self, answers: Dict[str, str], system_prompt: str, model: str, mood: str):
+        hash_ = prompt_hash(system_prompt)
+        key = self.make_key(answers, hash_, model)
+        now = time.time()
+
+        with self._lock:
+            self._check_prompt(hash_)
+            self._store_memory(key, hash_, mood, now)
+
+            if self.db_path:
+                conn = self._get_conn()
+                conn.execute(
+                    "INSERT OR REPLACE INTO mood_cache (cache_key, prompt_hash, model, mood, stored_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, hash_, model, mood, now)
+                )
+                conn.commit()
+
+    async def aget(self, answers: Dict[str, str], system_prompt: str, model: str) -> Optional[str]:
+        """get() for async callers; SQLite lookups run on the DB thread pool."""
+        if self.db_path:
+            return await run_db(self.get, answers, system_prompt, model)
+        return self.get(answers, system_prompt, model)
+
+    async def aset(self, answers: Dict[str, str], system_prompt: str, model: str, mood: str):
+        """set() for async callers; SQLite writes run on the DB thread pool."""
+        if self.db_path:
+            await run_db(self.set, answers, system_prompt, model, mood)
+        else:
+            self.set(answers, system_prompt, model, mood)
+
+    def _store_memory(self, key: str, hash_: str, mood: str, stored_at: float):
+        self._entries[key] = (hash_, mood, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            if self.db_path:
+                conn = self._get_conn()
+                conn.execute("DELETE FROM mood_cache")
+                conn.commit()
+
+    def close(self):
+        """Close the persistent tier's connection; it reopens on next use."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "persistent": bool(self.db_path),
+        }
+
+
+def cache_db_path(main_db_path: str) -> Optional[str]:
+    """Path of the persistent cache tier, next to the main database file."""
+    if main_db_path == ":memory:":
+        return None
+    return os.path.join(os.path.dirname(main_db_path), "mood_cache.db")
@@ -0,0 +1,312 @@
+import asyncio
+import json
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Dict, Optional
+from utils.admission import NORMAL, AdmissionController
+from utils.backend_pool import Backend, BackendPool
+from utils.config import settings
+from utils.executor import run_blocking
+from utils.fair_scheduler import estimate_cost, parse_weights
+from utils.metrics import ollama_coalesced_requests, ollama_request_seconds, record_token_counts
+from utils.singleflight import SingleFlight, deterministic_payload_key
+
+if TYPE_CHECKING:
+    import httpx
+
+# One keep-alive connection pool shared by every Ollama call in the process.
+# The client is created lazily inside the running event loop, and recreated
+# if it is used from a different loop (e.g. test clients that spin up a loop
+# per request), since pooled connections cannot cross loops. A guard task in
+# the client's loop closes it when that loop shuts down (asyncio.run cancels
+# leftover tasks before closing the loop), so a replaced client never leaks
+# its sockets. httpx itself is imported on first use to keep it off the
+# cold-start path.
+
+_client: Optional["httpx.AsyncClient"] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_client_guard: Optional[asyncio.Task] = None
+_pending_client: Optional[asyncio.Task] = None
+
+# Every request is routed to one of the configured Ollama nodes
+_pool = BackendPool(
+    settings.OLLAMA_URLS,
+    failure_threshold=settings.OLLAMA_BREAKER_FAILURES,
+    cooldown=settings.OLLAMA_BREAKER_COOLDOWN,
+    hedge_after=settings.OLLAMA_HEDGE_AFTER_MS / 1000,
+)
+
+# Caps concurrent calls and queues the rest by priority, fairly across users
+_admission = AdmissionController(
+    max_concurrent=settings.LLM_MAX_CONCURRENCY,
+    max_queue=settings.LLM_QUEUE_SIZE,
+    queue_timeout=settings.LLM_QUEUE_TIMEOUT,
+    user_rate=settings.LLM_USER_RATE,
+    user_burst=settings.LLM_USER_BURST,
+    quantum=settings.LLM_FAIR_QUANTUM,
+    weights=parse_weights(settings.LLM_USER_WEIGHTS),
+)
+
+# Identical deterministic requests in flight at the same time share one call
+_flights = SingleFlight()
+
+
+class StreamInterrupted(Exception):
+    """A streamed reply broke off after some frames were yielded; what arrived is incomplete."""
+
+
+_stats = {
+    "requests": 0,
+    "connections_opened": 0,
+    "errors": 0,
+}
+
+
+def _headers() -> Dict[str, str]:
+    headers = {"Content-Type": "application/json"}
+    if settings.OLLAMA_API_KEY:
+        headers["Authorization"] = f"Bearer {settings.OLLAMA_API_KEY}"
+    return headers
+
+
+def _build_client() -> "httpx.AsyncClient":
+    import httpx
+
+    return httpx.AsyncClient(
+        headers=_headers(),
+        limits=httpx.Limits(
+            max_connections=settings.OLLAMA_POOL_SIZE,
+            max_keepalive_connections=settings.OLLAMA_MAX_KEEPALIVE,
+            keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            settings.OLLAMA_READ_TIMEOUT,
+            connect=settings.OLLAMA_CONNECT_TIMEOUT,
+        ),
+    )
+
+
+async def get_client() -> "httpx.AsyncClient":
+    """
+    Return the shared AsyncClient, creating it on first use. Construction
+    loads the TLS trust store, so it runs once on the worker pool, and
+    concurrent first callers wait for that single build.
+    """
+    global _client, _client_loop, _client_guard, _pending_client
+    loop = asyncio.get_running_loop()
+    if _client is not None and not _client.is_closed and _client_loop is loop:
+        return _client
+
+    if _pending_client is None or _pending_client.get_loop() is not loop:
+        _pending_client = loop.create_task(run_blocking(_build_client))
+    client = await asyncio.shield(_pending_client)
+    if _client is not client:
+        _retire_client_guard()
+        _client, _client_loop, _pending_client = client, loop, None
+        _client_guard = loop.create_task(_close_with_loop(client))
+    return _client
+
+
+async def _close_with_loop(client: "httpx.AsyncClient"):
+    """Wait until cancelled (by close_client, a replacement or loop shutdown), then close client."""
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await client.aclose()
+
+
+def _retire_client_guard():
+    """Have the current client closed in its own loop, which may belong to another thread."""
+    global _client_guard
+    guard, _client_guard = _client_guard, None
+    if guard is None or guard.done():
+        return
+    guard_loop = guard.get_loop()
+    if guard_loop.is_closed():
+        return
+    if guard_loop is asyncio.get_running_loop():
+        guard.cancel()
+    elif guard_loop.is_running():
+        guard_loop.call_soon_threadsafe(guard.cancel)
+
+
+async def _trace(event_name: str, info: Dict):
+    """httpcore trace hook; counts fresh TCP connections to measure reuse."""
+    if event_name == "connection.connect_tcp.complete":
+        _stats["connections_opened"] += 1
+
+
+def _record_final_frame(kind: str, response_text: str):
+    """Token counts from the last JSON line of a response, if it is the done frame."""
+    last_line = response_text.rstrip().rpartition("\n")[2]
+    try:
+        frame = json.loads(last_line)
+    except json.JSONDecodeError:
+        return
+    if isinstance(frame, dict) and frame.get("done"):
+        record_token_counts(kind, frame)
+
+
+async def post_chat(payload: Dict, kind: str = "chat", priority: int = NORMAL,
+                    user_key: Optional[str] = None) -> Optional[str]:
+    """
+    POST a payload to Ollama's /api/chat and return the raw response body.
+    kind labels the request in the latency and token metrics; priority
+    orders it in the admission queue (utils.admission HIGH / NORMAL / LOW)
+    and user_key shares the queue fairly between users and rate-limits each.
+
+    Deterministic payloads (fixed seed or temperature 0) identical to one
+    already in flight wait for that request's answer instead of sending
+    their own (OLLAMA_SINGLE_FLIGHT). Each caller is still admitted under
+    its own priority and user_key first; only the upstream POST is shared.
+
+    Returns None if the request could not be completed. Raises
+    AdmissionRejected (a 503 with Retry-After) when the backend is saturated,
+    or a 429 when user_key is over its rate limit.
+    """
+    key = deterministic_payload_key(payload) if settings.OLLAMA_SINGLE_FLIGHT else None
+    async with _admission.slot(priority, user_key, estimate_cost(payload)):
+        if key is None:
+            return await _send_chat(payload, kind)
+        response_text, shared = await _flights.do(key, lambda: _send_chat(payload, kind))
+    if shared:
+        ollama_coalesced_requests.labels(kind).inc()
+    return response_text
+
+
+async def _send_chat(payload: Dict, kind: str) -> Optional[str]:
+    _stats["requests"] += 1
+    start = time.perf_counter()
+    try:
+        client = await get_client()
+
+        async def send(backend: Backend):
+            response = await client.post(backend.url, json=payload, extensions={"trace": _trace})
+            if response.status_code >= 500:
+                response.raise_for_status()  # counts against the backend; 4xx is the request's fault
+            return response
+
+        response = await _pool.call(send)
+    except Exception as e:
+        _stats["errors"] += 1
+        ollama_request_seconds.labels(kind, "error").observe(time.perf_counter() - start)
+        print(f"Error connecting to Ollama: {e}")
+        return None
+    ollama_request_seconds.labels(kind, "ok").observe(time.perf_counter() - start)
+    _record_final_frame(kind, response.text)
+    return response.text
+
+
+async def stream_chat(payload: Dict, kind: str = "chat", priority: int = NORMAL,
+                      user_key: Optional[str] = None) -> AsyncIterator[Dict]:
+    """
+    POST a payload to /api/chat in stream mode and yield each JSON frame
+    as it arrives. Stops after the frame marked "done". A backend that
+    fails before sending any frame is swapped for another one once; one
+    that fails after that, or ends the body without a done frame, raises
+    StreamInterrupted, so callers do not mistake a cut-off reply for a
+    complete one. The admission slot is held until the stream ends.
+    """
+    async with _admission.slot(priority, user_key, estimate_cost(payload)):
+        async for frame in _stream_chat(payload, kind):
+            yield frame
+
+
+async def _stream_chat(payload: Dict, kind: str) -> AsyncIterator[Dict]:
+    import httpx
+
+    _stats["requests"] += 1
+    start = time.perf_counter()
+    outcome = "ok"
+    tried = []
+    started = False
+    try:
+        client = await get_client()
+        while True:
+            backend = _pool.pick(exclude=tried)
+            tried.append(backend)
+            started = False
+            try:
+                async with _pool.lease(backend), client.stream(
+                    "POST",
+                    backend.url,
+                    json={**payload, "stream": True},
+                    extensions={"trace": _trace},
+                ) as response:
+                    if response.status_code >= 500:
+                        response.raise_for_status()
+                    done = False
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        try:
+                            data = json.loads(line)
+                        except json.JSONDecodeError:
+                            continue
+                        started = True
+                        if data.get("done", False):
+                            done = True
+                            record_token_counts(kind, data)
+                            yield data
+                            break
+                        yield data
+                    if started and not done:
+                        raise StreamInterrupted("Ollama stream ended without a done frame")
+                return
+            except httpx.HTTPError:
+                if started or len(tried) >= min(_pool.max_attempts, len(_pool.backends)):
+                    raise
+    except httpx.HTTPError as e:
+        outcome = "error"
+        _stats["errors"] += 1
+        print(f"Error streaming from Ollama: {e}")
+        if started:
+            raise StreamInterrupted(f"Ollama stream broke off: {e}") from e
+    except StreamInterrupted as e:
+        outcome = "error"
+        _stats["errors"] += 1
+        print(f"Error streaming from Ollama: {e}")
+        raise
+    finally:
+        ollama_request_seconds.labels(kind, outcome).observe(time.perf_counter() - start)
+
+
+async def _probe(backend: Backend) -> bool:
+    """Health probe: the node answers GET /api/version (any non-5xx reply counts)."""
+    client = await get_client()
+    root = backend.url.rsplit("/api/", 1)[0]
+    try:
+        response = await client.get(root + "/api/version", timeout=settings.OLLAMA_PROBE_TIMEOUT)
+    except Exception:
+        return False
+    return response.status_code < 500
+
+
+def start_backend_probes():
+    """Start periodic health probes of the Ollama nodes (needs a running loop)."""
+    _pool.start_probes(_probe, settings.OLLAMA_PROBE_INTERVAL)
+
+
+async def close_client():
+    """Stop health probes and close the shared client and its pooled connections."""
+    global _client
+    await _pool.stop_probes()
+    client, _client = _client, None
+    _retire_client_guard()
+    if client is not None:
+        await client.aclose()
+
+
+def connection_stats() -> Dict:
+    """Request and connection counters for the shared pool."""
+    requests = _stats["requests"]
+    opened = _stats["connections_opened"]
+    return {
+        **_stats,
+        "reused_connections": max(requests - _stats["errors"] - opened, 0),
+        "reuse_rate": round(1 - opened / requests, 4) if requests else 0.0,
+        "pool_size": settings.OLLAMA_POOL_SIZE,
+        "max_keepalive": settings.OLLAMA_MAX_KEEPALIVE,
+        "single_flight": _flights.stats(),
+        "backend_pool": _pool.stats(),
+        "admission": _admission.stats(),
+    }
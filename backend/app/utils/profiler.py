@@ -0,0 +1,309 @@
+import asyncio
+import contextvars
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from utils.executor import run_blocking, set_call_wrapper
+
+# Opt-in wall-clock sampling profiler for individual requests. A background
+# thread wakes every interval and, for each request being profiled, records
+# what that request is doing right now:
+#   [request] / [task]  its handler (or a task it spawned, e.g. a streaming
+#                       body) running on the event-loop thread
+#   [db] / [worker]     a call it handed to run_db / run_blocking, running
+#                       on a pool thread
+#   [awaiting]          the coroutine chain it is suspended in, when none of
+#                       the above is running (Ollama, queueing, etc.)
+# Each request's samples are written as a collapsed-stack file
+# ("frame;frame;frame count" per line), which flamegraph.pl and
+# speedscope.app open directly. The middleware is only installed when
+# PROFILE_ENABLED is set; otherwise nothing here runs.
+
+AWAITING = "[awaiting]"
+_UNSAFE_NAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+# Profile of the request the current task belongs to
+_current_profile: contextvars.ContextVar = contextvars.ContextVar("current_profile", default=None)
+
+
+def _frame_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack_below(frame, root) -> Optional[List[str]]:
+    """Labels from root down to frame (outermost first), or None if root is not on frame's stack."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        if frame is root:
+            labels.reverse()
+            return labels
+        frame = frame.f_back
+    return None
+
+
+class RequestProfile:
+    """Samples collected for one request."""
+
+    def __init__(self, task: asyncio.Task, root_frame, loop_thread_id: int):
+        self.task = task
+        self.root_frame = root_frame
+        self.loop_thread_id = loop_thread_id
+        # Tasks created while handling the request (appended on the loop thread)
+        self.tasks: List[asyncio.Task] = []
+        # Pool threads currently running a call for the request: ident -> (label, wrapper frame)
+        self.threads: Dict[int, Tuple[str, object]] = {}
+        self.samples: Counter = Counter()
+        self.started = time.time()
+
+    def sample(self, frames: Dict[int, object]):
+        stacks = []
+
+        loop_stack = self._loop_stack(frames.get(self.loop_thread_id))
+        if loop_stack:
+            stacks.append(loop_stack)
+
+        for ident, (label, root) in list(self.threads.items()):
+            stack = _stack_below(frames.get(ident), root)
+            if stack:
+                stacks.append([label] + stack[1:])  # drop the wrapper frame itself
+
+        if not stacks:
+            stacks.append(self._awaiting_stack())
+
+        for stack in stacks:
+            self.samples[";".join(stack)] += 1
+
+    def _loop_stack(self, frame) -> Optional[List[str]]:
+        """The request's (or one of its tasks') stack on the loop thread, if it is running now."""
+        if frame is None:
+            return None
+        stack = _stack_below(frame, self.root_frame)
+        if stack is not None:
+            return ["[request]"] + stack
+        for task in list(self.tasks):
+            if task.done():
+                continue
+            root = getattr(task.get_coro(), "cr_frame", None)
+            if root is not None:
+                stack = _stack_below(frame, root)
+                if stack is not None:
+                    return ["[task]"] + stack
+        return None
+
+    def _awaiting_stack(self) -> List[str]:
+        """Where the suspended request is waiting: its coroutine chain, outermost first."""
+        labels = [AWAITING]
+        awaitable = self.task.get_coro()
+        while awaitable is not None:
+            frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+            if frame is None:
+                if not hasattr(awaitable, "cr_await") and not hasattr(awaitable, "gi_yieldfrom"):
+                    labels.append(f"<{type(awaitable).__name__}>")  # a Future, etc.
+                break
+            labels.append(_frame_label(frame.f_code))
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(awaitable, "gi_yieldfrom", None)
+        return labels
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class _Sampler:
+    """One background thread sampling every active RequestProfile; runs only while any exist."""
+
+    def __init__(self):
+        self.interval = 0.005
+        self._active: List[RequestProfile] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: RequestProfile):
+        with self._lock:
+            self._active.remove(profile)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active)
+                if not active:
+                    self._thread = None
+                    return
+            frames = sys._current_frames()
+            for profile in active:
+                try:
+                    profile.sample(frames)
+                except Exception:
+                    pass  # a thread moved on mid-walk; skip this sample
+            del frames
+
+
+_sampler = _Sampler()
+
+
+# ============== FOLLOWING A REQUEST ==============
+
+def _bind_to_profile(call: Callable) -> Callable:
+    """Executor call wrapper: attribute the pool thread running call to the submitting request."""
+    profile = _current_profile.get()
+    if profile is None:
+        return call
+
+    def bound():
+        ident = threading.get_ident()
+        label = "[db]" if threading.current_thread().name.startswith("db") else "[worker]"
+        profile.threads[ident] = (label, sys._getframe())
+        try:
+            return call()
+        finally:
+            profile.threads.pop(ident, None)
+
+    return bound
+
+
+def _install_task_factory(loop: asyncio.AbstractEventLoop):
+    """Register tasks created during a profiled request with its profile; chains any existing factory."""
+    previous = loop.get_task_factory()
+    if getattr(previous, "_profiler_factory", False):
+        return
+
+    def factory(loop, coro, **kwargs):
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.tasks.append(task)
+        return task
+
+    factory._profiler_factory = True
+    loop.set_task_factory(factory)
+
+
+class ProfileStore:
+    """Rotating directory of collapsed-stack files, newest kept."""
+
+    SUFFIX = ".collapsed"
+
+    def __init__(self, directory: str, max_files: int = 50):
+        self.directory = directory
+        self.max_files = max_files
+
+    def write(self, name: str, content: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, name + self.SUFFIX)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        for old in self.list()[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, old["name"]))
+            except OSError:
+                pass
+        return path
+
+    def list(self) -> List[Dict]:
+        """Profiles newest first."""
+        try:
+            names = [n for n in os.listdir(self.directory) if n.endswith(self.SUFFIX)]
+        except FileNotFoundError:
+            return []
+        profiles = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            profiles.append({"name": name, "bytes": st.st_size, "modified": st.st_mtime})
+        profiles.sort(key=lambda p: p["modified"], reverse=True)
+        return profiles
+
+    def path(self, name: str) -> Optional[str]:
+        """Path of a stored profile, or None if name is not one of ours."""
+        if os.path.basename(name) != name or not name.endswith(self.SUFFIX):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+class SamplingProfilerMiddleware:
+    """
+    ASGI middleware profiling a sample of requests: sample_rate of all
+    requests, every request whose path starts with one of paths, and every
+    request carrying header_name set to header_token.
+    """
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0, paths: Sequence[str] = (),
+                 header_name: str = "x-profile", header_token: str = "", interval_ms: float = 5.0):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.paths = tuple(p for p in paths if p)
+        self.header_name = header_name.lower().encode("latin-1")
+        self.header_token = header_token.encode("latin-1")
+        _sampler.interval = interval_ms / 1000
+        set_call_wrapper(_bind_to_profile)
+
+    def _selected(self, scope) -> bool:
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        if self.paths and scope["path"].startswith(self.paths):
+            return True
+        if self.header_token:
+            for name, value in scope["headers"]:
+                if name == self.header_name:
+                    return value == self.header_token
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        _install_task_factory(asyncio.get_running_loop())
+        profile = RequestProfile(asyncio.current_task(), sys._getframe(), threading.get_ident())
+        token = _current_profile.set(profile)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        _sampler.add(profile)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _sampler.remove(profile)
+            _current_profile.reset(token)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if profile.samples:
+                name = "{}-{}-{}-{}-{}ms-{:04x}".format(
+                    time.strftime("%Y%m%dT%H%M%S", time.gmtime(profile.started)),
+                    scope["method"],
+                    _UNSAFE_NAME.sub("_", scope["path"]).strip("_")[:60] or "root",
+                    status,
+                    int(elapsed_ms),
+                    random.getrandbits(16)
+                )
+                try:
+                    await run_blocking(self.store.write, name, profile.collapsed())
+                except Exception as e:
+                    print(f"⚠️  Could not write profile {name}: {e}")
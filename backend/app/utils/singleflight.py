@@ -0,0 +1,63 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+# Single-flight: while a call for a key is in flight, later callers with the
+# same key wait for that call instead of starting their own, and all of them
+# get its result. Nothing is kept after the call finishes, so this only
+# collapses bursts of identical concurrent work; it is not a cache.
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]) -> Tuple[Any, bool]:
+        """
+        Await fn() for key, or join the call already running for it.
+        Returns (result, shared), shared being True for callers that joined.
+
+        The call runs in its own task, so a caller that is cancelled (e.g. a
+        client that disconnects) does not cancel it for the others.
+        """
+        loop = asyncio.get_running_loop()
+        task = self._calls.get(key)
+        shared = task is not None and task.get_loop() is loop
+        if shared:
+            self._stats["coalesced"] += 1
+        else:
+            task = loop.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._stats["calls"] += 1
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def stats(self) -> Dict:
+        calls = self._stats["calls"]
+        coalesced = self._stats["coalesced"]
+        return {
+            **self._stats,
+            "in_flight": len(self._calls),
+            "coalesced_rate": round(coalesced / (calls + coalesced), 4) if calls + coalesced else 0.0,
+        }
+
+
+def deterministic_payload_key(payload: Dict) -> Optional[str]:
+    """
+    Key for an Ollama /api/chat payload whose answer depends only on its
+    content (a fixed seed or temperature 0), else None. Payloads with equal
+    keys have the same model, messages and options.
+    """
+    options = payload.get("options") or {}
+    if "seed" not in options and options.get("temperature") != 0:
+        return None
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
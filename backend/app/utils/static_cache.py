@@ -0,0 +1,235 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+from starlette.responses import Response
+
+from utils.executor import run_blocking
+
+try:
+    import brotli  # in requirements.txt
+except ImportError:  # without it only gzip variants are built
+    brotli = None
+
+# Static front-end files (HTML, JS, CSS, assets) read once into memory with
+# precompressed gzip/brotli variants, a strong ETag and Last-Modified.
+# Requests are answered from memory, with 304 Not Modified for conditional
+# GETs. Reading and compressing happen off the event loop: in the lifespan,
+# or in ensure_loaded() on the worker pool if a request comes first. A
+# reload builds a new set of entries and swaps it in whole; entries are
+# never modified in place.
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_BYTES = 256
+
+
+class StaticAsset:
+    """One cached file: its bytes, encoded variants and validators."""
+
+    def __init__(self, path: str, body: bytes, mtime: float):
+        self.path = path
+        self.body = body
+        self.mtime = mtime
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.last_modified = formatdate(mtime, usegmt=True)
+
+        # Content-coding -> body; each coding is a separate representation
+        # and gets its own ETag
+        self.variants: Dict[str, bytes] = {}
+        if self.compressible:
+            gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gzipped) < len(body):
+                self.variants["gzip"] = gzipped
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants["br"] = compressed
+
+    @property
+    def compressible(self) -> bool:
+        return len(self.body) >= MIN_COMPRESS_BYTES and self.media_type.startswith(COMPRESSIBLE_TYPES)
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    def matches(self, if_none_match: str) -> bool:
+        """If-None-Match check (weak comparison, as RFC 9110 requires for GET)."""
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if "*" in tags:
+            return True
+        return any(self.variant_etag(encoding) in tags for encoding in (None, *self.variants))
+
+
+def choose_encoding(accept_encoding: str, available) -> Optional[str]:
+    """Best available content-coding the client accepts (br over gzip), or None."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class StaticFileCache:
+    """
+    In-memory cache of the front-end files under root. files are paths
+    relative to root; every file below each of dirs is included too.
+    """
+
+    def __init__(self, root: str, files: List[str], dirs: List[str] = (),
+                 max_age: int = 3600, html_max_age: int = 0):
+        self.root = root
+        self.files = list(files)
+        self.dirs = list(dirs)
+        self.max_age = max_age
+        self.html_max_age = html_max_age
+        self._entries: Optional[Dict[str, StaticAsset]] = None
+        self._signature: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.reloads = 0
+        self.responses = 0
+        self.not_modified = 0
+
+    def _paths(self) -> List[str]:
+        paths = list(self.files)
+        for directory in self.dirs:
+            top = os.path.join(self.root, directory)
+            for dirpath, _, filenames in os.walk(top):
+                for name in filenames:
+                    paths.append(os.path.relpath(os.path.join(dirpath, name), self.root).replace(os.sep, "/"))
+        return paths
+
+    def _scan(self) -> Dict[str, Tuple[float, int]]:
+        """(mtime, size) of every file that currently exists."""
+        signature = {}
+        for rel_path in self._paths():
+            try:
+                st = os.stat(os.path.join(self.root, rel_path))
+            except OSError:
+                continue
+            signature[rel_path] = (st.st_mtime, st.st_size)
+        return signature
+
+    def load(self) -> int:
+        """(Re)read every file and swap in the new entries. Returns the file count."""
+        with self._lock:
+            signature = self._scan()
+            entries = {}
+            for rel_path, (mtime, _) in signature.items():
+                try:
+                    with open(os.path.join(self.root, rel_path), "rb") as f:
+                        entries[rel_path] = StaticAsset(rel_path, f.read(), mtime)
+                except OSError as e:
+                    print(f"⚠️  Could not cache {rel_path}: {e}")
+            self._entries = entries
+            self._signature = signature
+            self.reloads += 1
+            return len(entries)
+
+    async def ensure_loaded(self):
+        """Load on first use, on the worker pool; a no-op once loaded (normally by the lifespan)."""
+        if self._entries is None:
+            await run_blocking(self.load)
+
+    def get(self, rel_path: str) -> Optional[StaticAsset]:
+        """Cached file, or None if it is not cached or nothing is loaded yet."""
+        entries = self._entries
+        return entries.get(rel_path) if entries is not None else None
+
+    def response(self, rel_path: str, headers) -> Optional[Response]:
+        """200 or 304 Response for a cached file, or None if it is not cached."""
+        asset = self.get(rel_path)
+        if asset is None:
+            return None
+
+        encoding = choose_encoding(headers.get("accept-encoding", ""), asset.variants)
+        max_age = self.html_max_age if asset.media_type == "text/html" else self.max_age
+        response_headers = {
+            "ETag": asset.variant_etag(encoding),
+            "Last-Modified": asset.last_modified,
+            "Cache-Control": f"public, max-age={max_age}" if max_age else "no-cache",
+        }
+        if asset.compressible:
+            response_headers["Vary"] = "Accept-Encoding"
+
+        self.responses += 1
+        if self._not_modified(asset, headers):
+            self.not_modified += 1
+            return Response(status_code=304, headers=response_headers)
+
+        if encoding is not None:
+            response_headers["Content-Encoding"] = encoding
+        body = asset.variants[encoding] if encoding is not None else asset.body
+        return Response(content=body, headers=response_headers, media_type=asset.media_type)
+
+    @staticmethod
+    def _not_modified(asset: StaticAsset, headers) -> bool:
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            return asset.matches(if_none_match)
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(asset.mtime) <= since
+        return False
+
+    # ============== DEV WATCHER ==============
+
+    def watch(self, interval: float = 1.0):
+        """Poll the files in a daemon thread and reload when any of them changes (dev mode)."""
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    if self._scan() != self._signature:
+                        count = self.load()
+                        print(f"🔄 Static files changed, reloaded {count} files")
+                except Exception as e:
+                    print(f"⚠️  Static file watcher error: {e}")
+
+        self._watcher = threading.Thread(target=run, name="static-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+    def stats(self) -> Dict:
+        entries = self._entries or {}
+        return {
+            "files": len(entries),
+            "bytes": sum(len(a.body) for a in entries.values()),
+            "compressed_bytes": {
+                encoding: sum(len(a.variants.get(encoding, a.body)) for a in entries.values())
+                for encoding in ("gzip", "br") if encoding == "gzip" or brotli is not None
+            },
+            "reloads": self.reloads,
+            "responses": self.responses,
+            "not_modified": self.not_modified,
+            "watching": self._watcher is not None,
+        }